@@ -0,0 +1,223 @@
+import itertools
+from typing import Any, Dict, Mapping, Sequence, Tuple
+import numpy as np
+from models import SimulationInput
+from batch import INPUT_FIELDS, columns_from_input, evaluate_batch
+
+# Utdata som styrer forfiningen og lagres i nettet
+ADAPTIVE_OUTPUTS = ("effectiveness", "delta_p_1", "delta_p_2")
+
+# Regimekoder (se FLOW_REGIMES) og hvilken side som har C_min. Resultatene har knekker der
+# disse skifter, så celler der de ikke er like i alle punktene forfines helt ned til max_level.
+REGIME_OUTPUTS = ("flow_regime_1", "flow_regime_2", "c_min_side_1")
+
+
+def _corner_offsets(n_dimensions: int) -> np.ndarray:
+    """Hjørnene i enhetskuben, form (2^d, d)."""
+    return np.array(list(itertools.product((0, 1), repeat=n_dimensions)), dtype=np.int64)
+
+
+class AdaptiveMesh:
+    """
+    Resultatnett fra adaptive_sample. Området er delt i celler (2^d-tre) på et heltallsgitter
+    med 2^max_level intervaller per akse; verdiene er lagret i cellehjørnene (vertices), og
+    innenfor hver celle interpoleres det multilineært i skalerte koordinater (log-rom for
+    strengt positive felter, som i Surrogate). Utdata som er strengt positive i alle
+    hjørnene interpoleres også i log-rom (log_outputs).
+    """
+
+    def __init__(
+        self,
+        fields: Sequence[str],
+        lower: Sequence[float],
+        upper: Sequence[float],
+        log_inputs: Sequence[bool],
+        max_level: int,
+        outputs: Sequence[str],
+        vertices: np.ndarray,
+        values: Mapping[str, Sequence[float]],
+        leaf_levels: np.ndarray,
+        leaf_indices: np.ndarray
+    ) -> None:
+        self.fields = list(fields)
+        self.lower = np.asarray(lower, dtype=float)
+        self.upper = np.asarray(upper, dtype=float)
+        self.log_inputs = np.asarray(log_inputs, dtype=bool)
+        self.max_level = max_level
+        self.outputs = list(outputs)
+        self.vertices = np.asarray(vertices, dtype=np.int64)
+        self.values = {k: np.asarray(v, dtype=float) for k, v in values.items()}
+        self.leaf_levels = np.asarray(leaf_levels, dtype=np.int64)
+        self.leaf_indices = np.asarray(leaf_indices, dtype=np.int64)
+        self.log_outputs = [name for name in self.outputs if np.all(self.values[name] > 0)]
+        self._lo = np.where(self.log_inputs, np.log(np.where(self.log_inputs, self.lower, 1.0)), self.lower)
+        self._hi = np.where(self.log_inputs, np.log(np.where(self.log_inputs, self.upper, 1.0)), self.upper)
+        vertex_keys = self._vertex_keys(self.vertices)
+        self._vertex_order = np.argsort(vertex_keys)
+        self._vertex_sorted = vertex_keys[self._vertex_order]
+        leaf_keys = self._leaf_keys(self.leaf_levels, self.leaf_indices)
+        self._leaf_order = np.argsort(leaf_keys)
+        self._leaf_sorted = leaf_keys[self._leaf_order]
+
+    @property
+    def resolution(self) -> int:
+        return 2 ** self.max_level
+
+    @property
+    def n_evaluations(self) -> int:
+        return len(self.vertices)
+
+    def _vertex_keys(self, lattice: np.ndarray) -> np.ndarray:
+        return lattice @ (self.resolution + 1) ** np.arange(lattice.shape[-1], dtype=np.int64)
+
+    def _leaf_keys(self, levels: np.ndarray, indices: np.ndarray) -> np.ndarray:
+        n_dimensions = indices.shape[-1]
+        return levels * self.resolution ** n_dimensions + indices @ self.resolution ** np.arange(n_dimensions, dtype=np.int64)
+
+    def to_unit(self, values: np.ndarray) -> np.ndarray:
+        """Skalerer inndata med form (n, n_fields) til [0, 1]."""
+        values = np.where(self.log_inputs, np.log(np.where(self.log_inputs, values, 1.0)), values)
+        return (values - self._lo) / (self._hi - self._lo)
+
+    def from_unit(self, unit: np.ndarray) -> np.ndarray:
+        """Motsatt av to_unit."""
+        values = self._lo + unit * (self._hi - self._lo)
+        return np.where(self.log_inputs, np.exp(values), values)
+
+    def vertex_values(self, lattice: np.ndarray) -> Dict[str, np.ndarray]:
+        """Lagrede verdier i gitterpunktene lattice (form (..., d)); alle må finnes i nettet."""
+        keys = self._vertex_keys(lattice)
+        position = np.searchsorted(self._vertex_sorted, keys)
+        rows = self._vertex_order[np.minimum(position, len(self._vertex_sorted) - 1)]
+        return {name: values[rows] for name, values in self.values.items()}
+
+    def interpolate_array(self, values) -> Dict[str, np.ndarray]:
+        """Interpolerer i nettet for en matrise med form (n, n_fields) i rekkefølgen self.fields."""
+        unit = np.clip(self.to_unit(np.atleast_2d(np.asarray(values, dtype=float))), 0.0, 1.0)
+        n_points, n_dimensions = unit.shape
+        levels = np.full(n_points, -1, dtype=np.int64)
+        indices = np.zeros((n_points, n_dimensions), dtype=np.int64)
+        # Bladcellene dekker området uten overlapp; finn nivået der punktets celle er et blad
+        for level in np.unique(self.leaf_levels):
+            candidate = np.minimum(np.floor(unit * 2 ** level).astype(np.int64), 2 ** level - 1)
+            keys = self._leaf_keys(np.full(n_points, level), candidate)
+            position = np.minimum(np.searchsorted(self._leaf_sorted, keys), len(self._leaf_sorted) - 1)
+            found = self._leaf_sorted[position] == keys
+            levels = np.where(found, level, levels)
+            indices = np.where(found[:, None], candidate, indices)
+        size = 2 ** (self.max_level - levels)[:, None]
+        origin = indices * size
+        local = unit * self.resolution - origin
+        local = local / size
+        result = {name: np.zeros(n_points) for name in self.outputs}
+        for offset in _corner_offsets(n_dimensions):
+            weight = np.prod(np.where(offset == 1, local, 1 - local), axis=1)
+            corner = self.vertex_values(origin + offset * size)
+            for name in result:
+                result[name] += weight * (np.log(corner[name]) if name in self.log_outputs else corner[name])
+        return {name: np.exp(value) if name in self.log_outputs else value for name, value in result.items()}
+
+    def interpolate(self, columns: Mapping[str, Any]) -> Dict[str, np.ndarray]:
+        """Som interpolate_array, men med {"seksjon.felt": array} for feltene i nettet."""
+        missing = [name for name in self.fields if name not in columns]
+        if missing:
+            raise ValueError(f"Mangler inndatafelter: {', '.join(missing)}")
+        arrays = np.broadcast_arrays(*[np.asarray(columns[name], dtype=float) for name in self.fields])
+        shape = arrays[0].shape
+        result = self.interpolate_array(np.stack([a.reshape(-1) for a in arrays], axis=1))
+        return {name: value.reshape(shape) for name, value in result.items()}
+
+
+def adaptive_sample(
+    base: SimulationInput,
+    bounds: Mapping[str, Tuple[float, float]],
+    outputs: Sequence[str] = ADAPTIVE_OUTPUTS,
+    tolerance: float = 1e-3,
+    initial_level: int = 2,
+    max_level: int = 7
+) -> AdaptiveMesh:
+    """
+    Adaptivt utvalg av designrommet rundt base.
+    bounds: {"seksjon.felt": (nedre, øvre)} for feltene som varieres; resten holdes som i base.
+    Starter med 2^initial_level celler per akse. Hver ny celle får evaluert midtpunktet,
+    og deles i 2^d barn når interpolasjonen fra hjørnene (som i AdaptiveMesh) bommer på
+    midtpunktet med mer enn tolerance (relativt) for noen av outputs, eller når strømningsregimet
+    eller C_min-siden (REGIME_OUTPUTS) ikke er det samme i alle hjørnene og midtpunktet. Alle punktene i en runde
+    evalueres samlet med evaluate_batch, og punkter som deles av flere celler evalueres én gang.
+    Celler på max_level deles ikke videre.
+    """
+    unknown = [name for name in bounds if name not in INPUT_FIELDS]
+    if unknown:
+        raise ValueError(f"Ukjente inndatafelter: {', '.join(unknown)}")
+    if not 0 <= initial_level <= max_level:
+        raise ValueError("Krever 0 <= initial_level <= max_level")
+    fields = list(bounds)
+    n_dimensions = len(fields)
+    lower = np.array([bounds[name][0] for name in fields], dtype=float)
+    upper = np.array([bounds[name][1] for name in fields], dtype=float)
+    if np.any(upper <= lower):
+        raise ValueError("Øvre grense må være større enn nedre grense for alle felter")
+    stored = tuple(outputs) + REGIME_OUTPUTS
+    mesh = AdaptiveMesh(
+        fields, lower, upper, lower > 0, max_level, outputs, np.zeros((0, n_dimensions), dtype=np.int64),
+        {name: [] for name in stored}, np.zeros(0, dtype=np.int64), np.zeros((0, n_dimensions), dtype=np.int64)
+    )
+    columns = columns_from_input(base)
+    vertices = np.zeros((0, n_dimensions), dtype=np.int64)
+    values = {name: np.zeros(0) for name in stored}
+
+    def evaluate(lattice: np.ndarray) -> Dict[str, np.ndarray]:
+        # Evaluerer punktene som ikke er evaluert fra før, og returnerer verdiene for alle
+        nonlocal mesh, vertices, values
+        lattice = lattice.reshape(-1, n_dimensions)
+        new = np.unique(lattice, axis=0)
+        if len(vertices):
+            known = np.isin(mesh._vertex_keys(new), mesh._vertex_sorted)
+            new = new[~known]
+        if len(new):
+            physical = mesh.from_unit(new / mesh.resolution)
+            evaluated = evaluate_batch(
+                {**columns, **{name: physical[:, i] for i, name in enumerate(fields)}},
+                base.flow_arrangement, base.effectiveness_backend, base.number_of_passes
+            )
+            evaluated["c_min_side_1"] = (evaluated["c_1"] <= evaluated["c_2"]).astype(float)
+            vertices = np.concatenate([vertices, new])
+            values = {name: np.concatenate([values[name], np.broadcast_to(evaluated[name], len(new))]) for name in stored}
+            mesh = AdaptiveMesh(fields, lower, upper, lower > 0, max_level, outputs, vertices, values, mesh.leaf_levels, mesh.leaf_indices)
+        return mesh.vertex_values(lattice)
+
+    corners = _corner_offsets(n_dimensions)
+    grid = np.arange(2 ** initial_level)
+    indices = np.stack(np.meshgrid(*[grid] * n_dimensions, indexing="ij"), axis=-1).reshape(-1, n_dimensions)
+    levels = np.full(len(indices), initial_level, dtype=np.int64)
+    leaf_levels, leaf_indices = [], []
+    while len(indices):
+        size = 2 ** (max_level - levels)[:, None]
+        origin = indices * size
+        corner_values = evaluate(origin[:, None, :] + corners[None, :, :] * size[:, None, :])
+        divisible = levels < max_level
+        refine = np.zeros(len(indices), dtype=bool)
+        if np.any(divisible):
+            center = evaluate(origin[divisible] + size[divisible] // 2)
+            for name in outputs:
+                at_corners = corner_values[name].reshape(len(indices), -1)[divisible]
+                estimate = np.mean(at_corners, axis=1)
+                positive = np.all(at_corners > 0, axis=1) & (center[name] > 0)
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    # Positive utdata interpoleres i log-rom; avviket der er et relativt avvik
+                    log_error = np.abs(np.log(center[name]) - np.mean(np.log(at_corners), axis=1))
+                    error = np.abs(center[name] - estimate) / np.maximum(np.abs(center[name]), np.abs(estimate))
+                refine[divisible] |= np.nan_to_num(np.where(positive, log_error, error)) > tolerance
+            for name in REGIME_OUTPUTS:
+                at_corners = corner_values[name].reshape(len(indices), -1)[divisible]
+                regimes = np.concatenate([at_corners, center[name][:, None]], axis=1)
+                refine[divisible] |= np.any(regimes != regimes[:, :1], axis=1)
+        leaf_levels.append(levels[~refine])
+        leaf_indices.append(indices[~refine])
+        parents = indices[refine]
+        indices = (2 * parents[:, None, :] + corners[None, :, :]).reshape(-1, n_dimensions)
+        levels = np.repeat(levels[refine] + 1, len(corners))
+    return AdaptiveMesh(
+        fields, lower, upper, lower > 0, max_level, outputs, vertices, values,
+        np.concatenate(leaf_levels), np.concatenate(leaf_indices)
+    )
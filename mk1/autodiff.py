@@ -0,0 +1,292 @@
+from typing import Any, Dict, Mapping, Optional, Sequence
+import numpy as np
+from definitions import EffectivenessBackend, FlowArrangement
+from flowcorrelations import RE_LAMINAR, RE_TURBULENT
+from models import SimulationInput
+from batch import INPUT_FIELDS, columns_from_input, evaluate_batch
+
+# Utdata det beregnes deriverte for
+DIFFERENTIATED_OUTPUTS = ("u_value", "effectiveness", "q_actual", "delta_p_1", "delta_p_2")
+
+
+def _split(x: Any):
+    if isinstance(x, Dual):
+        return x.value, x.deriv
+    return np.asarray(x, dtype=float), None
+
+
+def _sum(*terms):
+    """Summerer deriverte der None betyr null."""
+    present = [t for t in terms if t is not None]
+    if not present:
+        return None
+    total = present[0]
+    for t in present[1:]:
+        total = total + t
+    return total
+
+
+def _make(value, deriv):
+    return value if deriv is None else Dual(value, deriv)
+
+
+class Dual:
+    """
+    Dualtall for foroverderivering med mange retninger samtidig.
+    value har batchformen S, deriv har formen (N,) + S der N er antall inndata det deriveres
+    med hensyn på. Støtter aritmetikk, numpy-ufuncs (exp, log, log1p, sqrt, abs, minimum, maximum,
+    sammenligninger), np.where og np.clip, som er det de vektoriserte funksjonene i batch bruker.
+    """
+    __array_priority__ = 1000
+
+    def __init__(self, value: Any, deriv: Any) -> None:
+        self.value = np.asarray(value, dtype=float)
+        self.deriv = np.asarray(deriv, dtype=float)
+
+    @property
+    def shape(self):
+        return self.value.shape
+
+    def __getitem__(self, index: Any) -> "Dual":
+        index = index if isinstance(index, tuple) else (index,)
+        return Dual(self.value[index], self.deriv[(slice(None),) + index])
+
+    def __repr__(self) -> str:
+        return f"Dual(value={self.value!r}, deriv={self.deriv!r})"
+
+    # --- aritmetikk ---
+    @staticmethod
+    def _add(a, b):
+        (av, ad), (bv, bd) = _split(a), _split(b)
+        return _make(av + bv, _sum(ad, bd))
+
+    @staticmethod
+    def _subtract(a, b):
+        (av, ad), (bv, bd) = _split(a), _split(b)
+        return _make(av - bv, _sum(ad, None if bd is None else -bd))
+
+    @staticmethod
+    def _multiply(a, b):
+        (av, ad), (bv, bd) = _split(a), _split(b)
+        return _make(av * bv, _sum(None if ad is None else ad * bv, None if bd is None else av * bd))
+
+    @staticmethod
+    def _divide(a, b):
+        (av, ad), (bv, bd) = _split(a), _split(b)
+        value = av / bv
+        return _make(value, _sum(None if ad is None else ad / bv, None if bd is None else -value * bd / bv))
+
+    @staticmethod
+    def _floor_divide(a, b):
+        # Kontinuerlig relaksasjon: deriverte som for vanlig divisjon (brukes for antall kanaler)
+        (av, ad), (bv, bd) = _split(a), _split(b)
+        return _make(av // bv, _sum(None if ad is None else ad / bv, None if bd is None else -(av / bv) * bd / bv))
+
+    @staticmethod
+    def _power(a, b):
+        (av, ad), (bv, bd) = _split(a), _split(b)
+        value = av ** bv
+        return _make(value, _sum(
+            None if ad is None else bv * av ** (bv - 1) * ad,
+            None if bd is None else value * np.log(np.where(av > 0, av, 1.0)) * bd
+        ))
+
+    __add__ = lambda self, other: Dual._add(self, other)
+    __radd__ = lambda self, other: Dual._add(other, self)
+    __sub__ = lambda self, other: Dual._subtract(self, other)
+    __rsub__ = lambda self, other: Dual._subtract(other, self)
+    __mul__ = lambda self, other: Dual._multiply(self, other)
+    __rmul__ = lambda self, other: Dual._multiply(other, self)
+    __truediv__ = lambda self, other: Dual._divide(self, other)
+    __rtruediv__ = lambda self, other: Dual._divide(other, self)
+    __floordiv__ = lambda self, other: Dual._floor_divide(self, other)
+    __rfloordiv__ = lambda self, other: Dual._floor_divide(other, self)
+    __pow__ = lambda self, other: Dual._power(self, other)
+    __rpow__ = lambda self, other: Dual._power(other, self)
+
+    def __neg__(self) -> "Dual":
+        return Dual(-self.value, -self.deriv)
+
+    def __pos__(self) -> "Dual":
+        return self
+
+    def __abs__(self) -> "Dual":
+        return Dual(np.abs(self.value), np.sign(self.value) * self.deriv)
+
+    # Sammenligninger gjøres på verdien; grenvalg i np.where bestemmer så hvilken gren
+    # (og dermed hvilken ensidig deriverte) som brukes.
+    __lt__ = lambda self, other: self.value < _split(other)[0]
+    __le__ = lambda self, other: self.value <= _split(other)[0]
+    __gt__ = lambda self, other: self.value > _split(other)[0]
+    __ge__ = lambda self, other: self.value >= _split(other)[0]
+    __eq__ = lambda self, other: self.value == _split(other)[0]
+    __ne__ = lambda self, other: self.value != _split(other)[0]
+    __hash__ = None
+
+    # --- numpy-protokoller ---
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        if method != "__call__" or kwargs.get("out") is not None:
+            return NotImplemented
+        handler = _UFUNCS.get(ufunc)
+        if handler is None:
+            return NotImplemented
+        return handler(*inputs)
+
+    def __array_function__(self, func, types, args, kwargs):
+        handler = _FUNCTIONS.get(func)
+        if handler is None:
+            return NotImplemented
+        return handler(*args, **kwargs)
+
+
+def _unary(function, derivative):
+    def apply(a):
+        value = function(a.value)
+        return Dual(value, derivative(a.value, value) * a.deriv)
+    return apply
+
+
+def _select(a, b, take_a):
+    (av, ad), (bv, bd) = _split(a), _split(b)
+    value = np.where(take_a, av, bv)
+    if ad is None and bd is None:
+        return value
+    return Dual(value, np.where(take_a, 0.0 if ad is None else ad, 0.0 if bd is None else bd))
+
+
+def _where(condition, a, b):
+    return _select(a, b, _split(condition)[0].astype(bool))
+
+
+def _reduce_sum(a, axis=None):
+    (av, ad) = _split(a)
+    if axis is None:
+        return Dual(av.sum(), ad.reshape(ad.shape[0], -1).sum(axis=1))
+    axis = axis % av.ndim
+    return Dual(av.sum(axis=axis), ad.sum(axis=axis + 1))
+
+
+def _expand_dims(a, axis):
+    axis = axis if axis >= 0 else axis + a.value.ndim + 1
+    return Dual(np.expand_dims(a.value, axis), np.expand_dims(a.deriv, axis + 1))
+
+
+def _comparison(ufunc):
+    return lambda a, b: ufunc(_split(a)[0], _split(b)[0])
+
+
+_UFUNCS = {
+    np.add: Dual._add,
+    np.subtract: Dual._subtract,
+    np.multiply: Dual._multiply,
+    np.true_divide: Dual._divide,
+    np.floor_divide: Dual._floor_divide,
+    np.power: Dual._power,
+    np.negative: lambda a: -a,
+    np.positive: lambda a: a,
+    np.absolute: abs,
+    np.exp: _unary(np.exp, lambda x, v: v),
+    np.log: _unary(np.log, lambda x, v: 1 / x),
+    np.log1p: _unary(np.log1p, lambda x, v: 1 / (1 + x)),
+    np.sqrt: _unary(np.sqrt, lambda x, v: 0.5 / v),
+    np.minimum: lambda a, b: _select(a, b, _split(a)[0] <= _split(b)[0]),
+    np.maximum: lambda a, b: _select(a, b, _split(a)[0] >= _split(b)[0]),
+    np.less: _comparison(np.less),
+    np.less_equal: _comparison(np.less_equal),
+    np.greater: _comparison(np.greater),
+    np.greater_equal: _comparison(np.greater_equal),
+    np.equal: _comparison(np.equal),
+    np.not_equal: _comparison(np.not_equal),
+    np.isfinite: lambda a: np.isfinite(_split(a)[0]),
+    np.isnan: lambda a: np.isnan(_split(a)[0]),
+}
+
+# Numpy-funksjoner (via __array_function__) som brukes i den vektoriserte modellen
+_FUNCTIONS = {
+    np.where: _where,
+    np.sum: _reduce_sum,
+    np.expand_dims: _expand_dims,
+    np.clip: lambda a, lower, upper: np.minimum(np.maximum(a, lower), upper),
+}
+
+
+class GradientResult:
+    """
+    Resultat fra gradients().
+    values: {utdata: array}
+    gradients: {utdata: {inndatafelt: array}}
+    kinks: {navn: bool-array} der punktet ligger nær en knekk i modellen. Der er
+    deriverte ensidige: de tas fra grenen som er aktiv for verdien (laminær for Re < 2300,
+    overgang for 2300 <= Re <= 4000, turbulent for Re > 4000; C_min fra side 1 ved C_1 = C_2).
+    """
+
+    def __init__(self, values: Dict[str, np.ndarray], gradients: Dict[str, Dict[str, np.ndarray]], kinks: Dict[str, np.ndarray]) -> None:
+        self.values = values
+        self.gradients = gradients
+        self.kinks = kinks
+
+
+def gradients(
+    columns: Mapping[str, Any],
+    flow_arrangement: FlowArrangement,
+    fields: Optional[Sequence[str]] = None,
+    outputs: Sequence[str] = DIFFERENTIATED_OUTPUTS,
+    kink_tolerance: float = 1e-3,
+    effectiveness_backend: EffectivenessBackend = EffectivenessBackend.CORRELATION,
+    number_of_passes: int = 1
+) -> GradientResult:
+    """
+    Eksakte deriverte av outputs med hensyn på fields (standard: alle INPUT_FIELDS) i ett
+    vektorisert pass gjennom evaluate_batch. columns, effectiveness_backend og
+    number_of_passes er som for evaluate_batch.
+    number_of_plates deriveres i kontinuerlig relaksasjon (antall kanaler ~ (N + 1) / 2).
+    """
+    fields = list(fields or INPUT_FIELDS)
+    unknown = [name for name in fields if name not in INPUT_FIELDS]
+    if unknown:
+        raise ValueError(f"Ukjente inndatafelter: {', '.join(unknown)}")
+    shape = np.broadcast_shapes(*[np.shape(columns[name]) for name in INPUT_FIELDS])
+    seeded = dict(columns)
+    for i, name in enumerate(fields):
+        deriv = np.zeros((len(fields),) + shape)
+        deriv[i] = 1.0
+        seeded[name] = Dual(np.broadcast_to(np.asarray(columns[name], dtype=float), shape), deriv)
+    evaluated = evaluate_batch(seeded, flow_arrangement, effectiveness_backend, number_of_passes)
+
+    values: Dict[str, np.ndarray] = {}
+    result_gradients: Dict[str, Dict[str, np.ndarray]] = {}
+    for output in outputs:
+        value, deriv = _split(evaluated[output])
+        values[output] = np.broadcast_to(value, shape).copy()
+        deriv = np.zeros((len(fields),) + shape) if deriv is None else np.broadcast_to(deriv, (len(fields),) + shape)
+        result_gradients[output] = {name: deriv[i].copy() for i, name in enumerate(fields)}
+
+    kinks: Dict[str, np.ndarray] = {}
+    for side in ("1", "2"):
+        re = _split(evaluated["re_" + side])[0]
+        near = np.zeros(shape, dtype=bool)
+        for boundary in (RE_LAMINAR, RE_TURBULENT):
+            near |= np.abs(re - boundary) <= kink_tolerance * boundary
+        kinks["regime_" + side] = near
+    c_r = _split(evaluated["c_min"])[0] / _split(evaluated["c_max"])[0]
+    kinks["capacity"] = np.broadcast_to(c_r >= 1 - kink_tolerance, shape).copy()
+    t_1 = np.asarray(columns["airstream_1.temperature_c"], dtype=float)
+    t_2 = np.asarray(columns["airstream_2.temperature_c"], dtype=float)
+    kinks["temperature"] = np.broadcast_to(np.abs(t_1 - t_2) <= kink_tolerance, shape).copy()
+    return GradientResult(values, result_gradients, kinks)
+
+
+def input_gradients(
+    input_data: SimulationInput,
+    fields: Optional[Sequence[str]] = None,
+    outputs: Sequence[str] = DIFFERENTIATED_OUTPUTS
+) -> Dict[str, Dict[str, float]]:
+    """Deriverte for ett enkelt SimulationInput, som {utdata: {inndatafelt: verdi}}."""
+    result = gradients(
+        columns_from_input(input_data), input_data.flow_arrangement, fields, outputs,
+        effectiveness_backend=input_data.effectiveness_backend, number_of_passes=input_data.number_of_passes
+    )
+    return {
+        output: {name: float(value) for name, value in by_field.items()}
+        for output, by_field in result.gradients.items()
+    }
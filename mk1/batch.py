@@ -0,0 +1,211 @@
+from typing import Any, Dict, Mapping, Optional
+import numpy as np
+from moistair import AirProperties
+from heatecxhanger import PlateHeatExchanger
+from flowcorrelations import DEFAULT_FRICTION, DEFAULT_NUSSELT
+from definitions import EffectivenessBackend, FlowArrangement
+from models import SimulationInput
+
+# Inndatafelter i SimulationInput, navngitt som "seksjon.felt"
+AIRSTREAM_FIELDS = ("mass_flow_rate", "temperature_c", "phi", "pressure")
+EXCHANGER_FIELDS = (
+    "width",
+    "length",
+    "plate_thickness",
+    "thermal_conductivity_plate",
+    "number_of_plates",
+    "channel_height",
+)
+INPUT_FIELDS = (
+    tuple(f"airstream_1.{name}" for name in AIRSTREAM_FIELDS)
+    + tuple(f"airstream_2.{name}" for name in AIRSTREAM_FIELDS)
+    + tuple(f"exchanger.{name}" for name in EXCHANGER_FIELDS)
+)
+
+# Valgfrie korreksjonsfaktorer på egenskapsmodellene (1.0 hvis de mangler), felles for begge
+# luftstrømmene. Brukes til å modellere usikkerhet i korrelasjonene for luftegenskaper.
+PROPERTY_FACTORS = ("density", "dynamic_viscosity", "specific_heat_capacity", "thermal_conductivity")
+FACTOR_FIELDS = tuple(f"property.{name}" for name in PROPERTY_FACTORS)
+
+# Valgfrie modellvalg per rad (toppnivåfelter i SimulationInput); False hvis de mangler
+OPTION_FIELDS = ("developing_flow",)
+
+# Valgte korrelasjoner (navn i flowcorrelations-registeret); ett navn for hele batchen
+CORRELATION_FIELDS = ("nusselt_correlation", "friction_correlation")
+
+
+def columns_from_input(input_data: SimulationInput) -> Dict[str, Any]:
+    """Flater ut et SimulationInput-objekt til {"seksjon.felt": verdi} for INPUT_FIELDS, OPTION_FIELDS og CORRELATION_FIELDS."""
+    data = input_data.model_dump()
+    columns = {name: data[name.split(".")[0]][name.split(".")[1]] for name in INPUT_FIELDS}
+    columns.update({name: data[name] for name in OPTION_FIELDS + CORRELATION_FIELDS})
+    return columns
+
+
+def air_property_arrays(temperature_c, relative_humidity, pressure) -> Dict[str, Any]:
+    """
+    Vektorisert AirProperties: bruker de samme calc_*-metodene, men på numpy-arrays.
+    Returnerer en dict med attributtnavnene fra AirProperties (unntatt duggpunkt).
+    """
+    p_ws = AirProperties.calc_saturation_vapor_pressure(temperature_c)
+    p_w = AirProperties.calc_vapor_partial_pressure(relative_humidity, p_ws)
+    x = AirProperties.calc_humidity_ratio(p_w, pressure)
+    return {
+        "humidity_ratio": x,
+        "density": AirProperties.calc_density(pressure, temperature_c, x),
+        "dynamic_viscosity": AirProperties.calc_dynamic_viscosity(temperature_c),
+        "specific_heat_capacity": AirProperties.calc_specific_heat_capacity(x),
+        "thermal_conductivity": AirProperties.calc_thermal_conductivity(temperature_c),
+        "enthalpy": AirProperties.calc_enthalpy(temperature_c, x),
+    }
+
+
+def _unique_rows(keys, shape):
+    """
+    Unike rader av nøkkelkolonnene (kringkastet til shape): indeksene til første forekomst og
+    inverse, slik at rad i er lik rad first[inverse[i]].
+    """
+    # Hver kolonne kodes for seg (1D-unique er raskt), og kodene kombineres til ett heltall
+    # per rad; np.unique med axis=0 brukes bare hvis kombinasjonen ikke får plass i int64
+    code = np.zeros(int(np.prod(shape)), dtype=np.int64)
+    radix = 1
+    for key in keys:
+        values, column = np.unique(np.broadcast_to(np.asarray(key, dtype=float), shape).reshape(-1), return_inverse=True)
+        radix *= values.size
+        if radix >= 2**62:
+            stacked = np.stack([np.broadcast_to(np.asarray(k, dtype=float), shape).reshape(-1) for k in keys], axis=-1)
+            _, first, inverse = np.unique(stacked, axis=0, return_index=True, return_inverse=True)
+            return first, inverse.reshape(-1)
+        code = code * values.size + column.reshape(-1)
+    _, first, inverse = np.unique(code, return_index=True, return_inverse=True)
+    return first, inverse.reshape(-1)
+
+
+def _scatter(values: Mapping[str, Any], inverse: np.ndarray, shape) -> Dict[str, np.ndarray]:
+    """Sprer resultatene for de unike radene tilbake til alle radene (form shape)."""
+    return {
+        name: np.asarray(value)[inverse].reshape(shape) if np.ndim(value) else np.broadcast_to(value, shape).copy()
+        for name, value in values.items()
+    }
+
+
+def evaluate_batch(
+    columns: Mapping[str, Any],
+    flow_arrangement: FlowArrangement,
+    effectiveness_backend: EffectivenessBackend = EffectivenessBackend.CORRELATION,
+    number_of_passes: int = 1,
+    deduplicate: bool = False,
+    stats: Optional[Dict[str, float]] = None
+) -> Dict[str, np.ndarray]:
+    """
+    Beregner mange varmevekslertilfeller på én gang.
+    columns må inneholde alle INPUT_FIELDS; verdiene er skalarer eller arrays som lar seg
+    kringkaste mot hverandre. Feltene i FACTOR_FIELDS er valgfrie multiplikatorer på
+    luftegenskapene, og feltene i OPTION_FIELDS valgfrie modellvalg (bool per rad). Returnerer en dict med nøklene fra HeatExchangerParameters
+    og HeatExchangerResults, der flow_regime_1/2 er regimekoder (se FLOW_REGIMES), pluss
+    correlation_valid_1/2 (gyldighetsområdet til korrelasjonene, se flow_side_arrays).
+    CORRELATION_FIELDS er valgfrie korrelasjonsnavn (standard fra flowcorrelations) og gjelder
+    hele batchen; de slås opp én gang, ikke per rad.
+    Med deduplicate beregnes luftegenskapene bare for unike tilstander (T, φ, p) og korrelasjonene
+    bare for unike rader, og resultatene spres tilbake med indeksarrays. Gjelder når alle
+    varierende kolonner er numeriske numpy-arrays (ikke Dual). Sorteringen koster mer enn den
+    vektoriserte beregningen med standardkorrelasjonene, så det lønner seg bare med dyre
+    korrelasjoner og høy gjenbruk. Andelen gjenbrukte tilstander og rader, og om
+    dedupliseringen faktisk ble brukt, legges i stats ({"states": ..., "rows": ...,
+    "deduplicated": ...}) hvis den er gitt.
+    """
+    missing = [name for name in INPUT_FIELDS if name not in columns]
+    if missing:
+        raise ValueError(f"Mangler inndatafelter: {', '.join(missing)}")
+    correlations = {name: columns.get(name) for name in CORRELATION_FIELDS}
+    if not all(value is None or isinstance(value, str) for value in correlations.values()):
+        raise ValueError("Korrelasjonene må være ett navn for hele batchen")
+    correlations = {
+        "nusselt_correlation": correlations["nusselt_correlation"] or DEFAULT_NUSSELT,
+        "friction_correlation": correlations["friction_correlation"] or DEFAULT_FRICTION,
+    }
+    dedup_stats = {"states": 0.0, "rows": 0.0, "deduplicated": False}
+    # Manglende og None-kolonner (ubrukte faktorer/valg) påvirker ikke resultatet
+    keyed = [name for name in INPUT_FIELDS + FACTOR_FIELDS + OPTION_FIELDS if columns.get(name) is not None]
+    if deduplicate and all(isinstance(columns[name], (np.ndarray, bool, int, float, np.number)) for name in keyed):
+        varying = [name for name in keyed if np.ndim(columns[name])]
+        shape = np.broadcast_shapes(*(np.shape(columns[name]) for name in varying))
+        size = int(np.prod(shape))
+        deduplicate = size > 1 and all(columns[name].dtype.kind in "biuf" for name in varying)
+    else:
+        deduplicate = False
+    if not deduplicate:
+        air_1 = air_property_arrays(columns["airstream_1.temperature_c"], columns["airstream_1.phi"], columns["airstream_1.pressure"])
+        air_2 = air_property_arrays(columns["airstream_2.temperature_c"], columns["airstream_2.phi"], columns["airstream_2.pressure"])
+        output = _evaluate_rows(columns, air_1, air_2, flow_arrangement, effectiveness_backend, number_of_passes, correlations)
+    else:
+        # Trinn 1: luftegenskaper for unike tilstander (T, φ, p), felles for begge luftstrømmene
+        keys = [
+            np.concatenate([np.broadcast_to(columns[f"airstream_{side}.{name}"], shape).reshape(-1) for side in ("1", "2")])
+            for name in ("temperature_c", "phi", "pressure")
+        ]
+        first, inverse = _unique_rows(keys, (2 * size,))
+        dedup_stats["states"] = 1 - first.size / (2 * size)
+        air = air_property_arrays(*(np.asarray(key[first], dtype=float) for key in keys))
+        airs = [{name: value[inverse[k * size:(k + 1) * size]] for name, value in air.items()} for k in range(2)]
+        # Trinn 2: korrelasjoner og ε-NTU for unike rader (tilstander, massestrømmer, geometri og valg)
+        first, inverse = _unique_rows([columns[name] for name in varying], shape)
+        dedup_stats["rows"] = 1 - first.size / size
+        dedup_stats["deduplicated"] = True
+        rows = _evaluate_rows(
+            select_rows(columns, shape, first), *({name: value[first] for name, value in a.items()} for a in airs),
+            flow_arrangement, effectiveness_backend, number_of_passes, correlations
+        )
+        output = _scatter(rows, inverse, shape)
+    if stats is not None:
+        stats.update(dedup_stats)
+    if all(isinstance(v, (np.ndarray, int, float, np.number)) for v in output.values()):
+        output = {k: np.array(v) for k, v in zip(output.keys(), np.broadcast_arrays(*output.values()))}
+    return output
+
+
+def _evaluate_rows(
+    columns: Mapping[str, Any],
+    air_1: Dict[str, Any],
+    air_2: Dict[str, Any],
+    flow_arrangement: FlowArrangement,
+    effectiveness_backend: EffectivenessBackend,
+    number_of_passes: int,
+    correlations: Mapping[str, str]
+) -> Dict[str, Any]:
+    """Korrelasjoner og ε-NTU for kolonnene, med ferdigberegnede luftegenskaper (før faktorene)."""
+    phex = PlateHeatExchanger(**{name: columns[f"exchanger.{name}"] for name in EXCHANGER_FIELDS})
+    for name in PROPERTY_FACTORS:
+        factor = columns.get(f"property.{name}")
+        if factor is not None:
+            air_1[name] = air_1[name] * factor
+            air_2[name] = air_2[name] * factor
+    params = phex.calculate_parameters_array(
+        air_1, air_2, columns["airstream_1.mass_flow_rate"], columns["airstream_2.mass_flow_rate"],
+        columns.get("developing_flow", False), correlations["nusselt_correlation"], correlations["friction_correlation"]
+    )
+    results = PlateHeatExchanger.calculate_results_array(
+        params, columns["airstream_1.temperature_c"], columns["airstream_2.temperature_c"], flow_arrangement, effectiveness_backend, number_of_passes
+    )
+    return {**params, **results}
+
+
+def evaluate_input_batch(
+    base: SimulationInput,
+    overrides: Optional[Mapping[str, Any]] = None
+) -> Dict[str, np.ndarray]:
+    """Som evaluate_batch, men med verdier fra base for alle felter som ikke er gitt i overrides."""
+    columns = columns_from_input(base)
+    columns.update(overrides or {})
+    return evaluate_batch(columns, base.flow_arrangement, base.effectiveness_backend, base.number_of_passes)
+
+
+def select_rows(columns: Mapping[str, Any], shape, rows: np.ndarray) -> Dict[str, Any]:
+    """Kolonnene for de valgte radene (flat indeks i en batch med form shape); skalarer og navn beholdes."""
+    return {name: np.broadcast_to(value, shape).reshape(-1)[rows] if np.ndim(value) else value for name, value in columns.items()}
+
+
+def latin_hypercube(n_samples: int, n_dimensions: int, rng: np.random.Generator) -> np.ndarray:
+    """Latin hypercube-utvalg i enhetskuben, form (n_samples, n_dimensions)."""
+    strata = np.argsort(rng.random((n_dimensions, n_samples)), axis=1).T
+    return (strata + rng.random((n_samples, n_dimensions))) / n_samples
@@ -0,0 +1,239 @@
+from typing import Any, Dict, Mapping, Optional
+import numpy as np
+from definitions import FlowArrangement
+from models import SimulationInput
+from moistair import AirProperties
+from batch import air_property_arrays, columns_from_input, evaluate_batch
+from solvers import safeguarded_newton
+
+# Standard antall celler langs hver strømningsretning
+N_CELLS = 20
+
+# Fordampningsvarme for kondensatet [J/kg] (samme konstant som i calc_enthalpy)
+H_EVAPORATION = 2501000.0
+
+WET_DRY_ARRANGEMENTS = (FlowArrangement.COUNTER_FLOW, FlowArrangement.CROSS_FLOW)
+
+
+def saturation_humidity_ratio(temperature_c, pressure):
+    """Fuktighetsforhold for mettet luft ved temperaturen."""
+    return AirProperties.calc_humidity_ratio(AirProperties.calc_saturation_vapor_pressure(temperature_c), pressure)
+
+
+def _wall_flux(wall, temperature, x, pressure, conductance, mass_conductance):
+    """
+    Varmestrøm fra luften til veggen i hver celle [W], regnet fra cellens innløpstilstand:
+        q = G (T - T_vegg) + G_m max(x - x_s(T_vegg), 0) L
+    Cellen er våt når veggen er under duggpunktet (x > x_s(T_vegg)); da kondenserer fukt med
+    drivkraft x - x_s (Lewis-tall 1) og frigjør fordampningsvarmen L. Uttrykket er kontinuerlig
+    ved duggpunktet. G = C (1 - exp(-NTU_celle)) og G_m = ṁ (1 - exp(-NTU_celle)), slik at
+    fluksen stemmer eksakt med marsjen i _march når veggtemperaturen er konstant i cellen.
+    Returnerer (fluks, våt).
+    """
+    excess = x - saturation_humidity_ratio(wall, pressure)
+    wet = excess > 0
+    return conductance * (temperature - wall) + mass_conductance * np.maximum(excess, 0.0) * H_EVAPORATION, wet
+
+
+def _solve_walls(side_1, side_2, cell, guess, tolerance: float = 1e-8, max_iterations: int = 30):
+    """
+    Veggtemperaturene i alle celler og tidssteg samtidig. side_1/side_2 er (T, x, p) ved
+    cellenes innløp. Varmen fra side 1 går gjennom
+    platen (konduktans K) til side 2:  q = q_1(T_v1) = K (T_v1 - T_v2) = -q_2(T_v2).
+    Residualet q_1 + q_2 er avtagende i T_v1, med roten mellom strømtemperaturene;
+    sikret Newton (solvers.safeguarded_newton) med startverdi fra forrige ytre iterasjon.
+    Knekken ved duggpunktet kan gi noen halveringssteg.
+    """
+    # Flate kopier av alle størrelser, slik at bare celler som ikke har konvergert regnes videre
+    arrays = np.broadcast_arrays(guess, *side_1, *side_2, cell["g_1"], cell["gm_1"], cell["g_2"], cell["gm_2"], cell["k"])
+    shape = arrays[0].shape
+    t_w1, t_1, x_1, p_1, t_2, x_2, p_2, g_1, gm_1, g_2, gm_2, k = [np.array(a, dtype=float).ravel() for a in arrays]
+    lower, upper = np.minimum(t_1, t_2), np.maximum(t_1, t_2)
+
+    # Fortegnet snus slik at restfunksjonen er stigende, som safeguarded_newton forutsetter
+    def residual(t_w, i):
+        q_1, _ = _wall_flux(t_w, t_1[i], x_1[i], p_1[i], g_1[i], gm_1[i])
+        q_2, _ = _wall_flux(t_w - q_1 / k[i], t_2[i], x_2[i], p_2[i], g_2[i], gm_2[i])
+        return -(q_1 + q_2)
+
+    derivative = lambda t_w, r, i, step=1e-4: (residual(t_w + step, i) - r) / step
+    t_w1, _, _ = safeguarded_newton(residual, derivative, lower, upper, np.clip(t_w1, lower, upper), tolerance, max_iterations)
+    t_w1 = t_w1.reshape(shape)
+    q, wet_1 = _wall_flux(t_w1, *side_1, cell["g_1"], cell["gm_1"])
+    t_w2 = t_w1 - q / cell["k"]
+    _, wet_2 = _wall_flux(t_w2, *side_2, cell["g_2"], cell["gm_2"])
+    return t_w1, t_w2, wet_1, wet_2
+
+
+def _cell_outlet(temperature, x, pressure, wall, decay):
+    """
+    Tilstanden ut av en celle med konstant veggtemperatur og d = exp(-NTU_celle):
+        T_ut = T_v + (T_inn - T_v) d
+        x_ut = x_s + (x_inn - x_s) d  der x_inn > x_s(T_v) (våt celle), ellers x_ut = x_inn
+    """
+    x_s = saturation_humidity_ratio(wall, pressure)
+    return wall + (temperature - wall) * decay, np.where(x > x_s, x_s + (x - x_s) * decay, x)
+
+
+def _march(temperature_in, x_in, pressure, wall, decay, axis: int, reverse: bool):
+    """
+    Følger én side gjennom cellene i strømningsretningen (axis, baklengs hvis reverse), med
+    konstant veggtemperatur i hver celle (_cell_outlet).
+    Alle baner (parallelle cellerekker) og tidssteg behandles samtidig.
+    Returnerer (T ved innløpet til hver celle, x ved innløpet til hver celle, T ut, x ut) der
+    utløpsverdiene er per bane.
+    """
+    wall = np.moveaxis(wall, axis, 0)
+    n = wall.shape[0]
+    t, x = np.broadcast_to(temperature_in, wall.shape[1:]), np.broadcast_to(x_in, wall.shape[1:])
+    t_cells = np.empty(wall.shape)
+    x_cells = np.empty(wall.shape)
+    for position in (range(n - 1, -1, -1) if reverse else range(n)):
+        t_cells[position], x_cells[position] = t, x
+        t, x = _cell_outlet(t, x, pressure, wall[position], decay)
+    return np.moveaxis(t_cells, 0, axis), np.moveaxis(x_cells, 0, axis), t, x
+
+
+def _sweep_cross(side_1, side_2, cell, decay_1, decay_2, shape):
+    """
+    Kryssstrøm uten ytre iterasjon: celle (i, j) trenger bare tilstanden ut av cellen før
+    på side 1 (i - 1, j) og på side 2 (i, j - 1), så cellene på samme antidiagonal er
+    uavhengige og løses samtidig (som _cross_pass i effectiveness), med veggtemperaturene fra
+    _solve_walls. side_1/side_2 er (T, x, p) ved innløpet; cell, decay og p har formen (..., 1).
+    Returnerer veggtemperatur og våt-flagg per celle for begge sider og (T, x) ut per bane.
+    """
+    n, m = shape[-2:]
+    t_1, x_1 = [np.broadcast_to(v, shape[:-2] + (m,)).copy() for v in side_1[:2]]
+    t_2, x_2 = [np.broadcast_to(v, shape[:-2] + (n,)).copy() for v in side_2[:2]]
+    wall_1, wall_2 = np.empty(shape), np.empty(shape)
+    wet_1, wet_2 = np.empty(shape, dtype=bool), np.empty(shape, dtype=bool)
+    for k in range(n + m - 1):
+        i = np.arange(max(0, k - m + 1), min(n, k + 1))
+        j = k - i
+        inlet_1 = (t_1[..., j], x_1[..., j], side_1[2])
+        inlet_2 = (t_2[..., i], x_2[..., i], side_2[2])
+        w_1, w_2, d_1, d_2 = _solve_walls(inlet_1, inlet_2, cell, 0.5 * (inlet_1[0] + inlet_2[0]))
+        wall_1[..., i, j], wall_2[..., i, j], wet_1[..., i, j], wet_2[..., i, j] = w_1, w_2, d_1, d_2
+        t_1[..., j], x_1[..., j] = _cell_outlet(*inlet_1, w_1, decay_1)
+        t_2[..., i], x_2[..., i] = _cell_outlet(*inlet_2, w_2, decay_2)
+    return wall_1, wall_2, wet_1, wet_2, (t_1, x_1), (t_2, x_2)
+
+
+def wet_dry_cells(
+    base: SimulationInput,
+    overrides: Optional[Mapping[str, Any]] = None,
+    n_cells: int = N_CELLS,
+    tolerance: float = 1e-6,
+    max_iterations: int = 500
+) -> Dict[str, Any]:
+    """
+    Diskretisert veksler med kondensasjon: platen deles i celler (n_cells langs strømmen for
+    motstrøm, n_cells x n_cells for kryssstrøm). h_1/h_2, massestrømmer og cp hentes fra
+    evaluate_batch (samme korrelasjoner som ε-NTU-modellen). En celle er våt på en side når
+    veggtemperaturen på den siden er under luftens duggpunkt; da kondenserer fukt med
+    drivkraft x - x_s(T_vegg) (Lewis-tall 1), og fordampningsvarmen avgis til veggen.
+    Kryssstrøm løses direkte i ett sveip over cellenes antidiagonaler (_sweep_cross).
+    Motstrøm har ytre iterasjon: veggtemperaturer i alle celler fra lokal varmebalanse,
+    deretter marsj av begge sider med de nye veggtemperaturene, til cellenes
+    innløpstemperaturer endrer seg mindre enn tolerance [K]. Vektorisert over celler og over
+    tidssteg/overrides (som i evaluate_batch).
+    Returnerer utløpstilstander (temperature_out_1/2, humidity_ratio_out_1/2), q_actual
+    (gjennom platen fra side 1 til side 2, inkl. latent), q_received (fra side 2 sin
+    energibalanse, kontroll), q_sensible og q_latent (side 1), condensate_1/2 [kg/s], wet_fraction_1/2
+    (andel våt plateflate), wet_1/2 og wall_temperature_1/2 per celle, q_dry (ε-NTU uten
+    kondensasjon), iterations (1 for kryssstrøm) og converged.
+    """
+    if base.flow_arrangement not in WET_DRY_ARRANGEMENTS:
+        raise ValueError(f"Våt/tørr-modellen støtter bare {', '.join(a.value for a in WET_DRY_ARRANGEMENTS)}")
+    columns = columns_from_input(base)
+    columns.update(overrides or {})
+    evaluated = evaluate_batch(columns, base.flow_arrangement, base.effectiveness_backend, base.number_of_passes)
+    cross = base.flow_arrangement == FlowArrangement.CROSS_FLOW
+    grid = (n_cells, n_cells) if cross else (n_cells, 1)
+    lanes_1, lanes_2 = grid[1], (grid[0] if cross else 1)
+    # Batch-størrelser får to ekstra akser for cellenettet (expand), eller én for banene (lane)
+    expand = lambda value: np.asarray(value, dtype=float)[..., None, None]
+    lane = lambda value: np.asarray(value, dtype=float)[..., None]
+
+    sides = {}
+    for side, lanes in (("1", lanes_1), ("2", lanes_2)):
+        t_in = np.asarray(columns[f"airstream_{side}.temperature_c"], dtype=float)
+        p = np.asarray(columns[f"airstream_{side}.pressure"], dtype=float)
+        x_in = air_property_arrays(t_in, columns[f"airstream_{side}.phi"], p)["humidity_ratio"]
+        c_lane = evaluated["c_" + side] / lanes
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            decay = np.exp(-evaluated["h_" + side] * evaluated["area_heat_" + side] / (grid[0] * grid[1]) / c_lane)
+        conductance = c_lane * (1 - decay)
+        sides[side] = {
+            "t_in": t_in, "x_in": x_in, "p": p,
+            "decay": expand(decay), "g": expand(conductance),
+            "gm": expand(conductance * np.asarray(columns[f"airstream_{side}.mass_flow_rate"], dtype=float) / evaluated["c_" + side]),
+        }
+    cell_area = evaluated["area_heat_1"] / (grid[0] * grid[1])
+    cell = {
+        "g_1": sides["1"]["g"], "gm_1": sides["1"]["gm"], "g_2": sides["2"]["g"], "gm_2": sides["2"]["gm"],
+        "k": expand(columns["exchanger.thermal_conductivity_plate"] * cell_area / columns["exchanger.plate_thickness"]),
+    }
+
+    shape = np.broadcast_shapes(*[np.shape(v) for s in sides.values() for v in (s["t_in"], s["x_in"], s["decay"][..., 0, 0])]) + grid
+    p_1, p_2 = expand(sides["1"]["p"]), expand(sides["2"]["p"])
+    t_1 = np.broadcast_to(expand(sides["1"]["t_in"]), shape).copy()
+    x_1 = np.broadcast_to(expand(sides["1"]["x_in"]), shape).copy()
+    t_2 = np.broadcast_to(expand(sides["2"]["t_in"]), shape).copy()
+    x_2 = np.broadcast_to(expand(sides["2"]["x_in"]), shape).copy()
+    if cross:
+        wall, wall_2, wet_1, wet_2, (out_t_1, out_x_1), (out_t_2, out_x_2) = _sweep_cross(
+            (t_1[..., 0, :], x_1[..., 0, :], lane(sides["1"]["p"])), (t_2[..., :, 0], x_2[..., :, 0], lane(sides["2"]["p"])),
+            {name: value[..., 0] for name, value in cell.items()}, sides["1"]["decay"][..., 0], sides["2"]["decay"][..., 0], shape
+        )
+        iterations, converged = 1, np.ones(shape[:-2], dtype=bool)
+    else:
+        wall = 0.5 * (t_1 + t_2)
+        converged = np.zeros(shape[:-2], dtype=bool)
+        iterations = 0
+        for iterations in range(1, max_iterations + 1):
+            wall, wall_2, wet_1, wet_2 = _solve_walls((t_1, x_1, p_1), (t_2, x_2, p_2), cell, wall)
+            t_1_new, x_1_new, out_t_1, out_x_1 = _march(
+                lane(sides["1"]["t_in"]), lane(sides["1"]["x_in"]), lane(sides["1"]["p"]),
+                wall, sides["1"]["decay"][..., 0], axis=-2, reverse=False
+            )
+            # Side 2 går baklengs langs samme akse
+            t_2_new, x_2_new, out_t_2, out_x_2 = _march(
+                lane(sides["2"]["t_in"]), lane(sides["2"]["x_in"]), lane(sides["2"]["p"]),
+                wall_2, sides["2"]["decay"][..., 0], axis=-2, reverse=True
+            )
+            change = np.maximum(np.max(np.abs(t_1_new - t_1), axis=(-2, -1)), np.max(np.abs(t_2_new - t_2), axis=(-2, -1)))
+            t_1, x_1, t_2, x_2 = t_1_new, x_1_new, t_2_new, x_2_new
+            converged = change <= tolerance
+            if np.all(converged):
+                break
+
+    # Banene har like massestrømmer: blandingen er middelverdien (konstant cp som i ε-NTU)
+    temperature_out_1, humidity_ratio_out_1 = np.mean(out_t_1, axis=-1), np.mean(out_x_1, axis=-1)
+    temperature_out_2, humidity_ratio_out_2 = np.mean(out_t_2, axis=-1), np.mean(out_x_2, axis=-1)
+    condensate_1 = np.asarray(columns["airstream_1.mass_flow_rate"], dtype=float) * (sides["1"]["x_in"] - humidity_ratio_out_1)
+    condensate_2 = np.asarray(columns["airstream_2.mass_flow_rate"], dtype=float) * (sides["2"]["x_in"] - humidity_ratio_out_2)
+    # Positiv q fra side 1 til side 2; kondensatets fordampningsvarme går inn i veggen på sin side
+    q_sensible = evaluated["c_1"] * (sides["1"]["t_in"] - temperature_out_1)
+    q_latent = condensate_1 * H_EVAPORATION
+    return {
+        "temperature_out_1": temperature_out_1,
+        "temperature_out_2": temperature_out_2,
+        "humidity_ratio_out_1": humidity_ratio_out_1,
+        "humidity_ratio_out_2": humidity_ratio_out_2,
+        "q_actual": q_sensible + q_latent,
+        "q_received": evaluated["c_2"] * (temperature_out_2 - sides["2"]["t_in"]) - condensate_2 * H_EVAPORATION,
+        "q_sensible": q_sensible,
+        "q_latent": q_latent,
+        "q_dry": np.sign(sides["1"]["t_in"] - sides["2"]["t_in"]) * evaluated["q_actual"],
+        "condensate_1": condensate_1,
+        "condensate_2": condensate_2,
+        "wet_fraction_1": np.mean(wet_1, axis=(-2, -1)),
+        "wet_fraction_2": np.mean(wet_2, axis=(-2, -1)),
+        "wet_1": wet_1,
+        "wet_2": wet_2,
+        "wall_temperature_1": wall,
+        "wall_temperature_2": wall_2,
+        "iterations": iterations,
+        "converged": converged,
+    }
@@ -0,0 +1,254 @@
+from typing import Any, Dict, Mapping, Optional
+import numpy as np
+from scipy.linalg import solve_banded
+from definitions import FlowArrangement
+from models import SimulationInput
+from moistair import AirProperties
+from heatecxhanger import PlateHeatExchanger
+from flowcorrelations import DEFAULT_FRICTION, DEFAULT_NUSSELT
+from batch import EXCHANGER_FIELDS, PROPERTY_FACTORS, air_property_arrays, columns_from_input, evaluate_batch, select_rows
+from solvers import safeguarded_newton
+
+# Standard antall RK4-steg langs lengden
+N_STEPS = 20
+
+# Standard antall noder for modellen med varmeledning langs platen
+N_NODES = 1000
+
+# Største antall ukjente i ett båndsystem; større batcher løses i flere omganger
+MAX_UNKNOWNS = 1_000_000
+
+
+def _local_air(temperature_c, x, pressure, factors: Mapping[str, Any]) -> Dict[str, Any]:
+    """
+    Luftegenskaper ved lokal temperatur og uendret fuktighetsforhold (ingen kondensasjon).
+    Bare tetthet, viskositet og varmeledning varierer med T; c_p fra
+    calc_specific_heat_capacity avhenger bare av x og er konstant langs veksleren.
+    """
+    air = {
+        "density": AirProperties.calc_density(pressure, temperature_c, x),
+        "dynamic_viscosity": AirProperties.calc_dynamic_viscosity(temperature_c),
+        "specific_heat_capacity": AirProperties.calc_specific_heat_capacity(x),
+        "thermal_conductivity": AirProperties.calc_thermal_conductivity(temperature_c),
+    }
+    for name, factor in factors.items():
+        air[name] = air[name] * factor
+    return air
+
+
+def _shooting(columns: Mapping[str, Any], n_steps: int):
+    """
+    RK4-integrasjon fra z = 0 til L for radene i columns (se counter_flow_bvp), gitt T_2 ved
+    z = 0. Returnerer integrate(t_2_out, profiles) -> (T_1(L), T_2(L), q, historikk).
+    """
+    phex = PlateHeatExchanger(**{name: columns[f"exchanger.{name}"] for name in EXCHANGER_FIELDS})
+    factors = {name: columns[f"property.{name}"] for name in PROPERTY_FACTORS if columns.get(f"property.{name}") is not None}
+    sides = {}
+    for side in ("1", "2"):
+        t_in = np.asarray(columns[f"airstream_{side}.temperature_c"], dtype=float)
+        p = np.asarray(columns[f"airstream_{side}.pressure"], dtype=float)
+        sides[side] = {
+            "t_in": t_in, "p": p,
+            "x": air_property_arrays(t_in, columns[f"airstream_{side}.phi"], p)["humidity_ratio"],
+            "m": np.asarray(columns[f"airstream_{side}.mass_flow_rate"], dtype=float),
+        }
+    length = np.asarray(phex.length, dtype=float)
+    area_per_length = phex.area_heat_1 / length
+    dz = length / n_steps
+
+    def slope(t_1, t_2):
+        params = phex.calculate_parameters_array(
+            _local_air(t_1, sides["1"]["x"], sides["1"]["p"], factors),
+            _local_air(t_2, sides["2"]["x"], sides["2"]["p"], factors),
+            sides["1"]["m"], sides["2"]["m"],
+            columns.get("developing_flow", False),
+            columns.get("nusselt_correlation") or DEFAULT_NUSSELT,
+            columns.get("friction_correlation") or DEFAULT_FRICTION
+        )
+        q = params["u_value"] * area_per_length * (t_1 - t_2)
+        return -q / params["c_1"], -q / params["c_2"], q
+
+    def integrate(t_2_out, profiles: bool = False):
+        t_1, t_2, q = sides["1"]["t_in"] + 0 * t_2_out, t_2_out, 0 * t_2_out
+        history = [(t_1, t_2)]
+        for _ in range(n_steps):
+            k1 = slope(t_1, t_2)
+            k2 = slope(t_1 + 0.5 * dz * k1[0], t_2 + 0.5 * dz * k1[1])
+            k3 = slope(t_1 + 0.5 * dz * k2[0], t_2 + 0.5 * dz * k2[1])
+            k4 = slope(t_1 + dz * k3[0], t_2 + dz * k3[1])
+            t_1, t_2, q = (
+                value + dz / 6 * (a + 2 * b + 2 * c + d)
+                for value, a, b, c, d in zip((t_1, t_2, q), k1, k2, k3, k4)
+            )
+            if profiles:
+                history.append((t_1, t_2))
+        return t_1, t_2, q, history
+
+    return integrate
+
+
+def counter_flow_bvp(
+    base: SimulationInput,
+    overrides: Optional[Mapping[str, Any]] = None,
+    n_steps: int = N_STEPS,
+    tolerance: float = 1e-8,
+    max_iterations: int = 30
+) -> Dict[str, Any]:
+    """
+    Motstrøm med temperaturavhengige egenskaper, som randverdiproblem langs lengden z
+    (side 1 går inn ved z = 0, side 2 ved z = L):
+        dT_1/dz = -q'/C_1,  dT_2/dz = -q'/C_2,  q' = U(T_1, T_2) (A/L) (T_1 - T_2)
+    der U regnes lokalt med calculate_parameters_array (flow_side_arrays) og egenskapene
+    ved lokal temperatur. Bare ρ, μ og k varierer; c_p, og dermed C, er konstant fordi
+    egenskapsmodellen bare har c_p(x) (se _local_air).
+    Løses med skyting på T_2 ved z = 0 (utløpet på side 2): RK4 fra z = 0 til L (_shooting), og
+    sikret Newton (solvers.safeguarded_newton) på T_2(L) - T_2,inn, vektorisert over batchen.
+    Startverdi fra ε-NTU-løsningen (evaluate_batch); løsningen ligger mellom
+    innløpstemperaturene.
+    Returnerer temperature_out_1/2, q_actual og effectiveness (samme definisjon som i
+    evaluate_batch), q_constant_properties (ε-NTU), position og temperature_profile_1/2
+    (form (..., n_steps + 1)), iterations og converged.
+    """
+    if base.flow_arrangement != FlowArrangement.COUNTER_FLOW:
+        raise ValueError("Randverdiløseren gjelder bare motstrøm")
+    columns = columns_from_input(base)
+    columns.update(overrides or {})
+    evaluated = evaluate_batch(columns, base.flow_arrangement, base.effectiveness_backend, base.number_of_passes)
+    integrate = _shooting(columns, n_steps)
+    length = np.asarray(columns["exchanger.length"], dtype=float)
+    t_1_in = np.asarray(columns["airstream_1.temperature_c"], dtype=float)
+    t_2_in = np.asarray(columns["airstream_2.temperature_c"], dtype=float)
+    lower, upper = np.minimum(t_1_in, t_2_in), np.maximum(t_1_in, t_2_in)
+    # Startverdi: utløpet på side 2 fra ε-NTU
+    t_2_out = t_2_in + np.sign(t_1_in - t_2_in) * evaluated["q_actual"] / evaluated["c_2"]
+    t_2_out = np.clip(np.where(np.isfinite(t_2_out), t_2_out, 0.5 * (lower + upper)), lower, upper)
+    shape = t_2_out.shape
+    flat_t_2_in = np.broadcast_to(t_2_in, shape).reshape(-1)
+    flat_step = np.broadcast_to(1e-6 * np.maximum(np.abs(t_1_in - t_2_in), 1e-3), shape).reshape(-1)
+
+    # Bare radene som ikke har konvergert integreres videre
+    def residual(t_2_out, rows):
+        return _shooting(select_rows(columns, shape, rows), n_steps)(t_2_out)[1] - flat_t_2_in[rows]
+
+    derivative = lambda t_2_out, r, rows: (residual(t_2_out + flat_step[rows], rows) - r) / flat_step[rows]
+    t_2_out, converged, iterations = safeguarded_newton(
+        residual, derivative, lower, upper, t_2_out, tolerance, max_iterations
+    )
+
+    t_1_out, _, q, history = integrate(t_2_out, profiles=True)
+    q_actual = np.abs(q)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        effectiveness = q_actual / (evaluated["c_min"] * np.abs(t_1_in - t_2_in))
+    return {
+        "temperature_out_1": t_1_out,
+        "temperature_out_2": t_2_out,
+        "q_actual": q_actual,
+        "effectiveness": effectiveness,
+        "q_constant_properties": evaluated["q_actual"],
+        "position": np.linspace(0.0, 1.0, n_steps + 1) * length[..., None],
+        "temperature_profile_1": np.stack([np.broadcast_to(t, shape) for t, _ in history], axis=-1),
+        "temperature_profile_2": np.stack([np.broadcast_to(t, shape) for _, t in history], axis=-1),
+        "iterations": iterations,
+        "converged": converged,
+    }
+
+
+def _banded(entries: Mapping[int, np.ndarray], size: int, bandwidth: int) -> np.ndarray:
+    """Båndlagring for solve_banded; entries[offset][r] er A[r, r + offset]."""
+    ab = np.zeros((2 * bandwidth + 1, size))
+    for offset, values in entries.items():
+        if offset >= 0:
+            ab[bandwidth - offset, offset:] = values[:size - offset]
+        else:
+            ab[bandwidth - offset, :size + offset] = values[-offset:]
+    return ab
+
+
+def longitudinal_conduction(
+    base: SimulationInput,
+    overrides: Optional[Mapping[str, Any]] = None,
+    n_nodes: int = N_NODES
+) -> Dict[str, Any]:
+    """
+    Motstrøm med varmeledning i platene langs strømningsretningen (konstante egenskaper fra
+    evaluate_batch). Lengden deles i n_nodes celler med ukjente [T_1, T_plate, T_2] per celle:
+        luft:   T_ut = T_plate + d (T_oppstrøms - T_plate),  d = exp(-NTU_celle)
+        plate:  g_1 (T_1,oppstrøms - T_p) + g_2 (T_2,oppstrøms - T_p)
+                + K_ax (T_p,i-1 - 2 T_p,i + T_p,i+1) = 0,  K_ax = k_plate t b N_plater / Δz
+    med g = C (1 - d) som i condensation/transient (halve platemotstanden på hver side) og
+    isolerte plateender. Med cellene nummerert fortløpende blir systemet et båndsystem med
+    fire bånd på hver side av diagonalen; radene i batchen kobles ikke og stables i samme
+    system, som løses med solve_banded.
+    Returnerer temperature_out_1/2, q_actual og effectiveness (samme definisjon som i
+    evaluate_batch), effectiveness_no_conduction (ε-NTU), conduction_parameter
+    (λ = k_plate A_tverrsnitt / (L C_min)) og wall_temperature (form (..., n_nodes)).
+    """
+    if base.flow_arrangement != FlowArrangement.COUNTER_FLOW:
+        raise ValueError("Modellen for varmeledning langs platen gjelder bare motstrøm")
+    if n_nodes < 2:
+        raise ValueError("n_nodes må være minst 2")
+    columns = columns_from_input(base)
+    columns.update(overrides or {})
+    evaluated = evaluate_batch(columns, base.flow_arrangement, base.effectiveness_backend, base.number_of_passes)
+    phex = PlateHeatExchanger(**{name: columns[f"exchanger.{name}"] for name in EXCHANGER_FIELDS})
+    conduction = phex.thermal_conductivity_plate * phex.plate_thickness * phex.width * phex.number_of_plates / phex.length
+    t_1_in = np.asarray(columns["airstream_1.temperature_c"], dtype=float)
+    t_2_in = np.asarray(columns["airstream_2.temperature_c"], dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        d_1 = np.exp(-1 / ((evaluated["r_conv_1"] + 0.5 * evaluated["r_cond"]) * n_nodes * evaluated["c_1"]))
+        d_2 = np.exp(-1 / ((evaluated["r_conv_2"] + 0.5 * evaluated["r_cond"]) * n_nodes * evaluated["c_2"]))
+    g_1, g_2 = evaluated["c_1"] * (1 - d_1), evaluated["c_2"] * (1 - d_2)
+    arrays = np.broadcast_arrays(t_1_in, t_2_in, d_1, d_2, g_1, g_2, conduction * n_nodes)
+    shape = arrays[0].shape
+    t_1_in, t_2_in, d_1, d_2, g_1, g_2, k_axial = [np.array(a, dtype=float).reshape(-1, 1) for a in arrays]
+
+    # Naboer langs platen: innløpsende (i = 0) for side 1, innløpsende (i = n - 1) for side 2
+    first = np.arange(n_nodes) == 0
+    last = np.arange(n_nodes) == n_nodes - 1
+    rows = t_1_in.shape[0]
+    wall = np.empty((rows, n_nodes))
+    t_1_out, t_2_out = np.empty(rows), np.empty(rows)
+    chunk = max(1, MAX_UNKNOWNS // (3 * n_nodes))
+    for start in range(0, rows, chunk):
+        part = slice(start, start + chunk)
+        count = t_1_in[part].shape[0]
+        zero = np.zeros((count, n_nodes))
+
+        def node(air_1=zero, plate=zero, air_2=zero):
+            # Ett tall per ukjent, i rekkefølgen [T_1, T_plate, T_2] for hver celle
+            return np.stack(np.broadcast_arrays(air_1, plate, air_2), axis=-1).reshape(-1)
+
+        d1, d2, gg1, gg2, k = d_1[part], d_2[part], g_1[part], g_2[part], k_axial[part]
+        neighbours = 2 - first.astype(float) - last.astype(float)
+        entries = {
+            0: node(1.0, -(gg1 + gg2 + k * neighbours), 1.0),
+            1: node(air_1=-(1 - d1)),
+            -1: node(air_2=-(1 - d2)),
+            -3: node(air_1=np.where(first, 0.0, -d1), plate=np.where(first, 0.0, k)),
+            3: node(plate=np.where(last, 0.0, k), air_2=np.where(last, 0.0, -d2)),
+            -4: node(plate=np.where(first, 0.0, gg1)),
+            4: node(plate=np.where(last, 0.0, gg2)),
+        }
+        t1, t2 = t_1_in[part], t_2_in[part]
+        rhs = node(
+            np.where(first, d1 * t1, 0.0),
+            np.where(first, -gg1 * t1, 0.0) + np.where(last, -gg2 * t2, 0.0),
+            np.where(last, d2 * t2, 0.0)
+        )
+        solution = solve_banded((4, 4), _banded(entries, rhs.size, 4), rhs).reshape(count, n_nodes, 3)
+        wall[part], t_1_out[part], t_2_out[part] = solution[..., 1], solution[:, -1, 0], solution[:, 0, 2]
+
+    t_1_out, t_2_out = t_1_out.reshape(shape), t_2_out.reshape(shape)
+    q_actual = np.abs(evaluated["c_1"] * (t_1_in.reshape(shape) - t_1_out))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        effectiveness = q_actual / (evaluated["c_min"] * np.abs(t_1_in - t_2_in).reshape(shape))
+        conduction_parameter = conduction / evaluated["c_min"]
+    return {
+        "temperature_out_1": t_1_out,
+        "temperature_out_2": t_2_out,
+        "q_actual": q_actual,
+        "effectiveness": effectiveness,
+        "effectiveness_no_conduction": evaluated["effectiveness"],
+        "conduction_parameter": conduction_parameter,
+        "wall_temperature": wall.reshape(shape + (n_nodes,)),
+    }
@@ -3,4 +3,23 @@ from enum import Enum
 class FlowArrangement(str, Enum):
     CROSS_FLOW = "cross-flow"
     COUNTER_FLOW = "counter-flow"
+    # Kryssstrøm der luftstrøm 1 (hhv. 2) er blandet på tvers av strømningsretningen
+    CROSS_FLOW_MIXED_1 = "cross-flow-mixed-1"
+    CROSS_FLOW_MIXED_2 = "cross-flow-mixed-2"
+    # Luftstrøm 2 går i flere kryssstrømspass, motstrøms i forhold til luftstrøm 1
+    COUNTER_CROSS_FLOW = "counter-cross-flow"
 
+
+
+class EffectivenessBackend(str, Enum):
+    # Korrelasjonen i calculate_results (tilnærmet for kryssstrøm)
+    CORRELATION = "correlation"
+    # Forhåndsberegnet tabell over den eksakte løsningen (se effectiveness.py)
+    EXACT_TABLE = "exact-table"
+
+
+class ManifoldLayout(str, Enum):
+    # Innløp og utløp i samme ende av platepakken (strømmen snur i utløpsfordeleren)
+    U_TYPE = "U-type"
+    # Innløp og utløp i hver sin ende av platepakken
+    Z_TYPE = "Z-type"
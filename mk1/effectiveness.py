@@ -0,0 +1,321 @@
+import os
+import tempfile
+from typing import Callable, Dict
+import numpy as np
+from scipy.special import gammainc
+
+# Versjon av tabellformatet/beregningen; økes når innholdet endres slik at gamle filer ignoreres
+TABLE_VERSION = 1
+
+# Tabellene lagres her; kan overstyres med miljøvariabelen VARMEVEKSLER_CACHE_DIR
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "varmeveksler")
+
+# Standard rutenett: NTU jevnt fordelt i log(1 + NTU) opp til NTU_MAX, C_r jevnt i [0, 1]
+NTU_MAX = 50.0
+N_NTU = 401
+N_CR = 101
+
+
+def cache_dir() -> str:
+    return os.environ.get("VARMEVEKSLER_CACHE_DIR", DEFAULT_CACHE_DIR)
+
+
+def _values(x):
+    """Verdien uten deriverte (autodiff.Dual har den i .value)."""
+    return getattr(x, "value", x)
+
+
+class EffectivenessTable:
+    """
+    ε(NTU, C_r) tabulert på et jevnt rutenett i u = log(1 + NTU) og C_r ∈ [0, 1].
+    Oppslag er vektorisert bilineær interpolasjon; indeksene beregnes direkte fra
+    rutenettavstanden (ingen søk). NTU > ntu_max gir verdien ved ntu_max (ε er da mettet).
+    """
+
+    def __init__(self, ntu_max: float, values: np.ndarray) -> None:
+        self.ntu_max = float(ntu_max)
+        self.values = np.asarray(values, dtype=float)
+        self.n_ntu, self.n_cr = self.values.shape
+        self._du = np.log1p(self.ntu_max) / (self.n_ntu - 1)
+        self._dcr = 1.0 / (self.n_cr - 1)
+
+    @staticmethod
+    def grid(ntu_max: float = NTU_MAX, n_ntu: int = N_NTU, n_cr: int = N_CR):
+        """Rutenettpunktene (NTU, C_r) som 1D-arrays."""
+        return np.expm1(np.linspace(0.0, np.log1p(ntu_max), n_ntu)), np.linspace(0.0, 1.0, n_cr)
+
+    def __call__(self, ntu, c_r) -> np.ndarray:
+        # Bare operasjoner som autodiff.Dual støtter, slik at deriverte av interpolanten følger
+        # med; celleindeksene tas fra verdiene
+        valid = np.isfinite(c_r) & ~np.isnan(ntu)
+        u = np.log1p(np.clip(np.where(valid, ntu, 0.0), 0.0, self.ntu_max)) / self._du
+        v = np.clip(np.where(valid, c_r, 0.0), 0.0, 1.0) / self._dcr
+        i = np.minimum(np.asarray(_values(u)).astype(np.int64), self.n_ntu - 2)
+        j = np.minimum(np.asarray(_values(v)).astype(np.int64), self.n_cr - 2)
+        s, t = u - i, v - j
+        table = self.values
+        value = (
+            (1 - s) * (1 - t) * table[i, j] + s * (1 - t) * table[i + 1, j]
+            + (1 - s) * t * table[i, j + 1] + s * t * table[i + 1, j + 1]
+        )
+        return np.where(valid, value, np.nan)
+
+    def save(self, path: str) -> None:
+        """Skriver tabellen atomisk (via midlertidig fil) slik at samtidige prosesser ikke ser halve filer."""
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        handle, temporary = tempfile.mkstemp(dir=directory, suffix=".npz")
+        try:
+            with os.fdopen(handle, "wb") as f:
+                np.savez(f, version=TABLE_VERSION, ntu_max=self.ntu_max, values=self.values)
+            os.chmod(temporary, 0o644)
+            os.replace(temporary, path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+
+    @staticmethod
+    def load(path: str) -> "EffectivenessTable":
+        with np.load(path) as data:
+            if int(data["version"]) != TABLE_VERSION:
+                raise ValueError(f"Utdatert tabellversjon i {path}")
+            return EffectivenessTable(float(data["ntu_max"]), data["values"])
+
+
+_tables: Dict[str, EffectivenessTable] = {}
+
+
+def cached_table(name: str, build: Callable[[], EffectivenessTable]) -> EffectivenessTable:
+    """
+    Henter tabellen `name` fra minnet, fra disk (cache_dir()) eller bygger den med build()
+    og lagrer den. Navnet må beskrive alt som påvirker innholdet (arrangement, rutenett, ...).
+    """
+    table = _tables.get(name)
+    if table is not None:
+        return table
+    path = os.path.join(cache_dir(), f"{name}_v{TABLE_VERSION}.npz")
+    try:
+        table = EffectivenessTable.load(path)
+    except (OSError, ValueError, KeyError):
+        table = build()
+        try:
+            table.save(path)
+        except OSError:
+            # Skrivebeskyttet katalog: tabellen brukes fra minnet og bygges på nytt neste gang
+            pass
+    _tables[name] = table
+    return table
+
+
+def crossflow_unmixed_exact(ntu, c_r, tolerance: float = 1e-12) -> np.ndarray:
+    """
+    Eksakt effektivitet for kryssstrøm med begge strømmer ublandet (Mason 1954):
+        ε = 1 / (C_r NTU) Σ_{n>=0} P(n + 1, NTU) P(n + 1, C_r NTU)
+    der P er den regulariserte nedre ufullstendige gammafunksjonen. Summen avbrytes når
+    leddene er mindre enn tolerance. C_r = 0 gir grenseverdien 1 - exp(-NTU).
+    Vektorisert, men for tung til bruk per beregning; se crossflow_unmixed_table().
+    """
+    ntu, c_r = np.broadcast_arrays(np.asarray(ntu, dtype=float), np.asarray(c_r, dtype=float))
+    y = c_r * ntu
+    positive = (ntu > 0) & (y > 0)
+    total = np.zeros(ntu.shape)
+    n = 0
+    while True:
+        term = gammainc(n + 1, ntu) * np.where(positive, gammainc(n + 1, np.where(positive, y, 1.0)), 0.0)
+        total += term
+        n += 1
+        if n > ntu.max(initial=0.0) and np.all(term <= tolerance * total):
+            break
+    with np.errstate(divide="ignore", invalid="ignore"):
+        effectiveness = total / np.where(positive, y, 1.0)
+    return np.where(positive, effectiveness, np.where(ntu > 0, -np.expm1(-ntu), 0.0))
+
+
+def _build_crossflow_unmixed() -> EffectivenessTable:
+    ntu, c_r = EffectivenessTable.grid()
+    return EffectivenessTable(NTU_MAX, crossflow_unmixed_exact(ntu[:, None], c_r[None, :]))
+
+
+def crossflow_unmixed_table() -> EffectivenessTable:
+    """Tabell over den eksakte løsningen for ublandet/ublandet kryssstrøm (bygges ved første bruk)."""
+    return cached_table(f"crossflow_unmixed_{N_NTU}x{N_CR}_{NTU_MAX:g}", _build_crossflow_unmixed)
+
+
+# --- Numerisk ε-NTU for arrangementer uten lukket løsning ---
+#
+# Varmeveksleren deles i celler. Strøm 1 går i x-retning gjennom M kolonner fordelt på N baner,
+# strøm 2 i y-retning gjennom N rader fordelt på M baner. I hver celle er varmestrømmen
+# q = UA_c (t1 - t2) / (1 + UA_c / (2 C1_c) + UA_c / (2 C2_c)) (middeltemperaturer i cellen,
+# andre ordens nøyaktig). Temperaturene er dimensjonsløse, θ = (T - T2_inn) / (T1_inn - T2_inn),
+# og C_min = 1 slik at UA = NTU. Alle tabellpunkter beregnes samtidig (vektorisert).
+
+# Antall celler per retning og pass; resultatet Richardson-ekstrapoleres fra NUMERICAL_RESOLUTION
+# og 2 * NUMERICAL_RESOLUTION
+NUMERICAL_RESOLUTION = 16
+
+
+def _cross_pass(t1: np.ndarray, t2: np.ndarray, ua, w1, w2, mixed_1: bool = False) -> None:
+    """
+    Ett kryssstrømspass, oppdaterer t1 (N baner, ...) og t2 (M baner, ...) på stedet.
+    ua er UA for passet, w1/w2 = C_min / C for hver strøm (kringkastes mot t1[0]).
+    mixed_1: strøm 1 blandes etter hver kolonne (ellers er begge strømmer ublandet).
+    """
+    n, m = len(t1), len(t2)
+    if mixed_1:
+        # Strøm 1 har samme temperatur over hele kolonnen. Strøm 2-banen i kolonnen ser da en
+        # konstant temperatur (middelverdien i kolonnen) og har eksakt eksponentiell profil:
+        # Δθ2 = β (θ1_midt - θ2), β = 1 - exp(-UA w2). Strøm 1 endres med Δθ2 C2_bane / C1.
+        with np.errstate(divide="ignore", invalid="ignore"):
+            beta_per_w2 = np.where(w2 > 0, -np.expm1(-ua * w2) / w2, ua)
+        beta = beta_per_w2 * w2
+        gamma = w1 * beta_per_w2 / m
+        for i in range(m):
+            change = (t1[0] - t2[i]) / (1 + gamma / 2)
+            t2[i] += beta * change
+            t1[:] = t1[0] - gamma * change
+        return
+    ua_cell = ua / (n * m)
+    a1 = ua_cell * n * w1
+    a2 = ua_cell * m * w2
+    denominator = 1 + (a1 + a2) / 2
+    alpha_1 = a1 / denominator
+    alpha_2 = a2 / denominator
+    # Ublandet/ublandet: cellene på samme antidiagonal er uavhengige og oppdateres samtidig
+    for k in range(n + m - 1):
+        i = np.arange(max(0, k - n + 1), min(m, k + 1))
+        j = k - i
+        difference = t1[j] - t2[i]
+        t1[j] -= alpha_1 * difference
+        t2[i] += alpha_2 * difference
+
+
+def _single_pass(ntu, w1, w2, resolution: int, mixed_1: bool) -> np.ndarray:
+    """ε for ett kryssstrømspass (C_min = 1)."""
+    shape = np.broadcast_shapes(np.shape(ntu), np.shape(w1), np.shape(w2))
+    t1 = np.ones((resolution,) + shape)
+    t2 = np.zeros((resolution,) + shape)
+    _cross_pass(t1, t2, ntu, w1, w2, mixed_1)
+    # q = C1 (1 - θ1_ut) = C2 θ2_ut; ε = q / C_min, regnet fra den strømmen som har C_min
+    return np.where(w1 >= w2, (1 - t1.mean(axis=0)), t2.mean(axis=0))
+
+
+def _counter_cross(ntu, w1, w2, resolution: int, columns_per_pass: int, number_of_passes: int) -> np.ndarray:
+    """
+    ε for motstrøms kryssstrøm: strøm 1 går rett gjennom (ublandet), strøm 2 går i
+    number_of_passes kryssstrømspass i motsatt hovedretning og blandes mellom passene.
+    Alt er lineært i innløpstemperaturene, så temperaturene føres som affine funksjoner av
+    de ukjente innløpstemperaturene s_k til hvert pass på strøm 2 (siste akse: konstantledd
+    og én koeffisient per pass). Koblingen s_k = θ2_ut(k + 1) løses til slutt som et lite
+    lineært likningssystem per tabellpunkt.
+    """
+    shape = np.broadcast_shapes(np.shape(ntu), np.shape(w1), np.shape(w2))
+    n_coefficients = 1 + number_of_passes
+    expand = lambda x: np.asarray(x, dtype=float)[..., None]
+    ntu, w1, w2 = expand(ntu), expand(w1), expand(w2)
+    t1 = np.zeros((resolution,) + shape + (n_coefficients,))
+    t1[..., 0] = 1.0
+    outlets = []
+    for k in range(number_of_passes):
+        t2 = np.zeros((columns_per_pass,) + shape + (n_coefficients,))
+        t2[..., 1 + k] = 1.0
+        _cross_pass(t1, t2, ntu / number_of_passes, w1, w2)
+        outlets.append(t2.mean(axis=0))
+    # Likninger: s_k - θ2_ut(k + 1)(s) = 0 for k < n - 1, og s_{n-1} = 0 (innløp strøm 2)
+    matrix = np.zeros(shape + (number_of_passes, number_of_passes))
+    rhs = np.zeros(shape + (number_of_passes,))
+    for k in range(number_of_passes):
+        matrix[..., k, k] = 1.0
+        if k < number_of_passes - 1:
+            matrix[..., k, :] -= outlets[k + 1][..., 1:]
+            rhs[..., k] = outlets[k + 1][..., 0]
+    s = np.linalg.solve(matrix, rhs[..., None])[..., 0]
+    affine = lambda coefficients: coefficients[..., 0] + np.sum(coefficients[..., 1:] * s, axis=-1)
+    theta_1 = affine(t1.mean(axis=0))
+    theta_2 = affine(outlets[0])
+    return np.where(w1[..., 0] >= w2[..., 0], 1 - theta_1, theta_2)
+
+
+def numerical_effectiveness(
+    arrangement: str,
+    ntu,
+    c_r,
+    c_min_side: int,
+    number_of_passes: int = 1,
+    resolution: int = NUMERICAL_RESOLUTION
+) -> np.ndarray:
+    """
+    Numerisk ε(NTU, C_r) for arrangement ("cross-flow", "cross-flow-mixed-1",
+    "cross-flow-mixed-2" eller "counter-cross-flow") når C_min er på side c_min_side (1 eller 2).
+    Beregnes med resolution og 2 * resolution celler per retning og Richardson-ekstrapoleres.
+    """
+    if c_min_side not in (1, 2):
+        raise ValueError("c_min_side må være 1 eller 2")
+    ntu, c_r = np.broadcast_arrays(np.asarray(ntu, dtype=float), np.asarray(c_r, dtype=float))
+    w1, w2 = (np.ones_like(c_r), c_r) if c_min_side == 1 else (c_r, np.ones_like(c_r))
+
+    # Kolonnene langs strøm 1 fordeles på passene, men minst 4 per pass
+    columns_per_pass = max(4, -(-resolution // number_of_passes))
+
+    def solve(refinement: int) -> np.ndarray:
+        cells = refinement * resolution
+        if arrangement == "cross-flow":
+            return _single_pass(ntu, w1, w2, cells, mixed_1=False)
+        if arrangement == "cross-flow-mixed-1":
+            return _single_pass(ntu, w1, w2, cells, mixed_1=True)
+        if arrangement == "cross-flow-mixed-2":
+            # Samme som mixed-1 med strømmene byttet om
+            return _single_pass(ntu, w2, w1, cells, mixed_1=True)
+        if arrangement == "counter-cross-flow":
+            return _counter_cross(ntu, w1, w2, cells, refinement * columns_per_pass, number_of_passes)
+        raise ValueError(f"Ingen numerisk modell for arrangementet: {arrangement}")
+
+    coarse = solve(1)
+    fine = solve(2)
+    return fine + (fine - coarse) / 3
+
+
+# Arrangementer som beregnes numerisk (verdiene i FlowArrangement)
+NUMERICAL_ARRANGEMENTS = ("cross-flow-mixed-1", "cross-flow-mixed-2", "counter-cross-flow")
+
+# Grovere rutenett for de numeriske tabellene (glatte flater; interpolasjonsfeil ~5e-5)
+N_NTU_NUMERICAL = 201
+N_CR_NUMERICAL = 51
+
+
+def numerical_table(arrangement: str, c_min_side: int, number_of_passes: int = 1) -> EffectivenessTable:
+    """
+    Tabell for et numerisk arrangement når C_min er på side c_min_side. Bygges ved første
+    bruk og lagres per arrangement, side og antall pass (number_of_passes brukes bare for
+    "counter-cross-flow").
+    """
+    # Godtar også FlowArrangement (str-enum); verdien brukes i filnavnet
+    arrangement = getattr(arrangement, "value", arrangement)
+    if arrangement not in NUMERICAL_ARRANGEMENTS:
+        raise ValueError(f"Ingen numerisk modell for arrangementet: {arrangement}")
+    if number_of_passes < 1:
+        raise ValueError("number_of_passes må være minst 1")
+    passes = number_of_passes if arrangement == "counter-cross-flow" else 1
+
+    def build() -> EffectivenessTable:
+        ntu, c_r = EffectivenessTable.grid(NTU_MAX, N_NTU_NUMERICAL, N_CR_NUMERICAL)
+        values = numerical_effectiveness(arrangement, ntu[:, None], c_r[None, :], c_min_side, passes)
+        return EffectivenessTable(NTU_MAX, values)
+
+    name = f"{arrangement}_{passes}pass_cmin{c_min_side}_{N_NTU_NUMERICAL}x{N_CR_NUMERICAL}_{NTU_MAX:g}_r{NUMERICAL_RESOLUTION}"
+    return cached_table(name, build)
+
+
+def arrangement_effectiveness(arrangement: str, ntu, c_r, c_min_side_1, number_of_passes: int = 1) -> np.ndarray:
+    """
+    Vektorisert oppslag for de numeriske arrangementene. c_min_side_1 er sann der
+    C_1 <= C_2; bare tabellene som faktisk trengs, lastes.
+    """
+    c_min_side_1 = np.asarray(c_min_side_1, dtype=bool)
+    result = None
+    for side, selected in ((1, c_min_side_1), (2, ~c_min_side_1)):
+        if np.any(selected):
+            value = numerical_table(arrangement, side, number_of_passes)(ntu, c_r)
+            result = value if result is None else np.where(selected, value, result)
+    if result is None:
+        return np.full(np.broadcast_shapes(np.shape(_values(ntu)), np.shape(_values(c_r)), c_min_side_1.shape), np.nan)
+    return result
@@ -0,0 +1,189 @@
+from typing import Any, Dict, Mapping, Optional, Sequence
+import numpy as np
+from models import SimulationInput
+from batch import air_property_arrays, columns_from_input, evaluate_batch
+
+
+class FanCurve:
+    """
+    Viftekurve Δp_vifte(V) [Pa] som funksjon av volumstrøm V [m3/s].
+    Gis enten som tabellpunkter (lineær interpolasjon, lineær ekstrapolasjon utenfor) eller
+    som polynomkoeffisienter a_0 + a_1 V + a_2 V^2 + ... Alle arrays kan ha ledende akser
+    for mange vifter samtidig: flow/pressure form (..., n_punkter), coefficients (..., grad + 1).
+    """
+
+    def __init__(self, flow: Optional[Any] = None, pressure: Optional[Any] = None, coefficients: Optional[Any] = None) -> None:
+        if coefficients is None and (flow is None or pressure is None):
+            raise ValueError("Oppgi enten flow og pressure eller coefficients")
+        if coefficients is not None and (flow is not None or pressure is not None):
+            raise ValueError("Oppgi enten tabellpunkter eller polynom, ikke begge")
+        self.coefficients = None if coefficients is None else np.asarray(coefficients, dtype=float)
+        self.flow = None if flow is None else np.asarray(flow, dtype=float)
+        self.pressure_points = None if pressure is None else np.asarray(pressure, dtype=float)
+        if self.flow is not None:
+            if self.flow.shape[-1] < 2:
+                raise ValueError("En tabellert viftekurve må ha minst to punkter")
+            if np.any(np.diff(self.flow, axis=-1) <= 0):
+                raise ValueError("Volumstrømmene i viftekurven må være strengt stigende")
+
+    @staticmethod
+    def from_points(flow: Sequence[float], pressure: Sequence[float]) -> "FanCurve":
+        return FanCurve(flow=flow, pressure=pressure)
+
+    @staticmethod
+    def from_polynomial(coefficients: Sequence[float]) -> "FanCurve":
+        return FanCurve(coefficients=coefficients)
+
+    @property
+    def shape(self):
+        """Formen på viftebatchen (ledende akser)."""
+        if self.coefficients is not None:
+            return self.coefficients.shape[:-1]
+        return np.broadcast_shapes(self.flow.shape[:-1], self.pressure_points.shape[:-1])
+
+    def pressure(self, volumetric_flow) -> np.ndarray:
+        """Viftetrykk ved volumstrømmen(e); kringkastes mot viftebatchen."""
+        v = np.asarray(volumetric_flow, dtype=float)
+        if self.coefficients is not None:
+            result = np.zeros(np.broadcast_shapes(v.shape, self.shape))
+            for coefficient in np.moveaxis(self.coefficients, -1, 0)[::-1]:
+                result = result * v + coefficient
+            return result
+        flow, pressure = self.flow, self.pressure_points
+        n_points = flow.shape[-1]
+        # Segmentindeks uten søk per rad: antall tabellpunkter <= v, begrenset til gyldige segmenter
+        index = np.clip(np.sum(flow <= v[..., None], axis=-1) - 1, 0, n_points - 2)
+        take = lambda a, i: np.take_along_axis(np.broadcast_to(a, i.shape + (n_points,)), i[..., None], axis=-1)[..., 0]
+        shape = np.broadcast_shapes(v.shape, self.shape)
+        index = np.broadcast_to(index, shape)
+        v0, v1 = take(flow, index), take(flow, index + 1)
+        p0, p1 = take(pressure, index), take(pressure, index + 1)
+        return p0 + (p1 - p0) * (np.broadcast_to(v, shape) - v0) / (v1 - v0)
+
+    def reference_flow(self) -> np.ndarray:
+        """En volumstrøm i kurvens arbeidsområde, brukt som startpunkt for innramming."""
+        if self.coefficients is not None:
+            return np.ones(self.shape)
+        return np.broadcast_to(self.flow[..., -1], self.shape)
+
+
+def _illinois(function, lower, upper, f_lower, f_upper, tolerance: float, max_iterations: int):
+    """
+    Vektorisert Illinois-metode (modifisert regula falsi) for innrammede røtter.
+    f_lower > 0 > f_upper (eller omvendt) må gjelde for alle aktive punkter.
+    Returnerer (rot, konvergert).
+    """
+    a, b, fa, fb = lower.copy(), upper.copy(), f_lower.copy(), f_upper.copy()
+    converged = (fa == 0) | (fb == 0)
+    root = np.where(fa == 0, a, b)
+    for _ in range(max_iterations):
+        active = ~converged
+        if not np.any(active):
+            break
+        with np.errstate(divide="ignore", invalid="ignore"):
+            c = np.where(active, (a * fb - b * fa) / (fb - fa), b)
+        c = np.where(np.isfinite(c), c, 0.5 * (a + b))
+        fc = function(c)
+        same_side = np.sign(fc) == np.sign(fb)
+        a_new = np.where(same_side, a, b)
+        fa_new = np.where(same_side, 0.5 * fa, fb)
+        a, fa = np.where(active, a_new, a), np.where(active, fa_new, fa)
+        b, fb = np.where(active, c, b), np.where(active, fc, fb)
+        root = np.where(active, c, root)
+        converged |= (np.abs(b - a) <= tolerance * np.maximum(np.abs(b), 1e-12)) | (fc == 0)
+    return root, converged
+
+
+def operating_point(
+    base: SimulationInput,
+    fan_1: Optional[FanCurve] = None,
+    fan_2: Optional[FanCurve] = None,
+    system_loss_1: Any = 0.0,
+    system_loss_2: Any = 0.0,
+    overrides: Optional[Mapping[str, Any]] = None,
+    tolerance: float = 1e-10,
+    max_iterations: int = 100
+) -> Dict[str, np.ndarray]:
+    """
+    Finner massestrømmen på hver side der viftetrykket er lik trykkfallet i veksleren pluss
+    systemtapet K V^2 (system_loss_1/2 = K [Pa/(m3/s)^2]):
+        Δp_vifte(V) = Δp_veksler(ṁ) + K V^2,  V = ṁ / ρ
+    Venstresiden avtar og høyresiden øker med ṁ, så roten rammes inn (øvre grense dobles
+    til differansen skifter fortegn) og løses med Illinois-metoden. Begge sider løses i
+    samme batchkall per iterasjon. Vifter, systemtap og overrides (som i evaluate_batch)
+    kringkastes mot hverandre, slik at mange kombinasjoner løses samtidig.
+    Side uten vifte beholder massestrømmen fra base/overrides.
+    Returnerer mass_flow_rate_1/2, volumetric_flow_rate_1/2, fan_pressure_1/2, delta_p_1/2,
+    system_pressure_1/2 og converged.
+    """
+    columns = columns_from_input(base)
+    columns.update(overrides or {})
+    fans = {"1": fan_1, "2": fan_2}
+    losses = {"1": np.asarray(system_loss_1, dtype=float), "2": np.asarray(system_loss_2, dtype=float)}
+    density = {
+        side: air_property_arrays(
+            columns[f"airstream_{side}.temperature_c"], columns[f"airstream_{side}.phi"], columns[f"airstream_{side}.pressure"]
+        )["density"]
+        for side in ("1", "2")
+    }
+    shape = np.broadcast_shapes(
+        *[np.shape(v) for v in columns.values()],
+        *[fan.shape for fan in fans.values() if fan is not None],
+        losses["1"].shape, losses["2"].shape
+    )
+
+    def mismatch(mass_flow: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        trial = dict(columns)
+        trial.update({f"airstream_{side}.mass_flow_rate": m for side, m in mass_flow.items()})
+        evaluated = evaluate_batch(trial, base.flow_arrangement, base.effectiveness_backend, base.number_of_passes)
+        result = {}
+        for side, m in mass_flow.items():
+            v = m / density[side]
+            result[side] = fans[side].pressure(v) - evaluated["delta_p_" + side] - losses[side] * v**2
+        return result
+
+    solved = [side for side in ("1", "2") if fans[side] is not None]
+    mass_flow = {side: np.broadcast_to(np.asarray(columns[f"airstream_{side}.mass_flow_rate"], dtype=float), shape).copy() for side in ("1", "2")}
+    converged = np.ones(shape, dtype=bool)
+    if solved:
+        # Nedre grense: ṁ -> 0 gir trykkdifferanse lik viftens stengetrykk
+        lower = {side: np.zeros(shape) for side in solved}
+        f_lower = {side: np.broadcast_to(fans[side].pressure(0.0), shape).astype(float) for side in solved}
+        upper = {side: np.broadcast_to(fans[side].reference_flow() * density[side], shape).astype(float) for side in solved}
+        f_upper = mismatch(upper)
+        for _ in range(60):
+            expand = {side: (f_upper[side] > 0) & (f_lower[side] > 0) for side in solved}
+            if not any(np.any(e) for e in expand.values()):
+                break
+            for side in solved:
+                lower[side] = np.where(expand[side], upper[side], lower[side])
+                f_lower[side] = np.where(expand[side], f_upper[side], f_lower[side])
+                upper[side] = np.where(expand[side], 2 * upper[side], upper[side])
+            f_upper = mismatch(upper)
+
+        # Alle sider itereres samtidig: funksjonen tar en stablet array (side først)
+        def stacked(m: np.ndarray) -> np.ndarray:
+            values = mismatch({side: m[i] for i, side in enumerate(solved)})
+            return np.stack([values[side] for side in solved])
+
+        stack = lambda d: np.stack([d[side] for side in solved])
+        root, ok = _illinois(stacked, stack(lower), stack(upper), stack(f_lower), stack(f_upper), tolerance, max_iterations)
+        for i, side in enumerate(solved):
+            bracketed = (f_lower[side] > 0) & (f_upper[side] <= 0)
+            # Viften klarer ikke å overvinne noe trykkfall: ingen strømning
+            no_flow = f_lower[side] <= 0
+            mass_flow[side] = np.where(no_flow, 0.0, np.where(bracketed, root[i], np.nan))
+            converged &= no_flow | (bracketed & ok[i])
+
+    final = dict(columns)
+    final.update({f"airstream_{side}.mass_flow_rate": m for side, m in mass_flow.items()})
+    evaluated = evaluate_batch(final, base.flow_arrangement, base.effectiveness_backend, base.number_of_passes)
+    result = {"converged": converged}
+    for side in ("1", "2"):
+        v = mass_flow[side] / density[side]
+        result["mass_flow_rate_" + side] = mass_flow[side]
+        result["volumetric_flow_rate_" + side] = v
+        result["delta_p_" + side] = np.where(mass_flow[side] > 0, evaluated["delta_p_" + side], 0.0)
+        result["system_pressure_" + side] = losses[side] * v**2
+        result["fan_pressure_" + side] = fans[side].pressure(v) if fans[side] is not None else np.full(shape, np.nan)
+    return result
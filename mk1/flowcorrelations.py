@@ -1,11 +1,22 @@
-from typing import Optional
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
 import math
+import numpy as np
 from pydantic import BaseModel, Field
 
 # Konstanter for regimegrenser
 RE_LAMINAR = 2300
 RE_TURBULENT = 4000
 
+# Regimenavn indeksert med kodene fra flow_regime_code_array
+FLOW_REGIMES = ("Laminær", "Overgangsstrømning", "Turbulent")
+
+# Fullt utviklet laminær strømning mellom parallelle plater
+NU_LAMINAR = 7.54
+F_RE_LAMINAR = 96
+
+# Gauss-Legendre-punkter for middelverdien av lokale Nu langs kanalen (se mean_nusselt_developing_array)
+N_DEVELOPING_POINTS = 16
+
 class FLowInputModel(BaseModel):
     mass_flow_rate: float = Field(..., title="Masseflow (kg/s)")
     density: float = Field(..., title="Tetthet (kg/m³)")
@@ -62,12 +73,14 @@ def prandtl_number(specific_heat_capacity: float, dynamic_viscosity: float, ther
         return float('nan')
     return specific_heat_capacity * dynamic_viscosity / thermal_conductivity
 
-def nusselt_number(reynolds: float, prandtl: float, flow_regime: str) -> float:
-    """Returnerer Nusselt-tallet."""
+def nusselt_number(reynolds: float, prandtl: float, flow_regime: str, nusselt_laminar: float = NU_LAMINAR) -> float:
+    """
+    Returnerer Nusselt-tallet.
+    nusselt_laminar: laminær verdi (fullt utviklet, eller middelverdi for utviklende strømning)
+    """
     if flow_regime == "Laminær":
-        nusselt = 7.54
+        nusselt = nusselt_laminar
     elif flow_regime == "Overgangsstrømning":
-        nusselt_laminar = 7.54
         friction_factor = (0.79 * math.log(reynolds) - 1.64)**-2 if reynolds > RE_LAMINAR else 96/reynolds
         nusselt_turbulent = (
             (friction_factor/8) * (reynolds - 1000) * prandtl /
@@ -83,14 +96,17 @@ def nusselt_number(reynolds: float, prandtl: float, flow_regime: str) -> float:
         )
     return nusselt
 
-def friction_factor(reynolds: float, flow_regime: str) -> float:
-    """Returnerer friksjonsfaktor."""
+def friction_factor(reynolds: float, flow_regime: str, friction_laminar: Optional[float] = None) -> float:
+    """
+    Returnerer friksjonsfaktor.
+    friction_laminar: laminær verdi hvis ikke 96/Re (f.eks. tilsynelatende friksjonsfaktor i innløpsområdet)
+    """
     if reynolds <= 0:
         return float('nan')
+    f_laminar = F_RE_LAMINAR / reynolds if friction_laminar is None else friction_laminar
     if flow_regime == "Laminær":
-        return 96 / reynolds
+        return f_laminar
     elif flow_regime == "Overgangsstrømning":
-        f_laminar = 96 / reynolds
         f_turbulent = (0.79 * math.log(reynolds) - 1.64)**-2
         weight = (reynolds - RE_LAMINAR) / (RE_TURBULENT - RE_LAMINAR)
         return f_laminar + weight * (f_turbulent - f_laminar)
@@ -129,19 +145,32 @@ def flow_side_results(
     thermal_conductivity: float,
     flow_area: float,
     hydraulic_diameter: float,
-    length: float
+    length: float,
+    developing_flow: bool = False,
+    nusselt_correlation: Optional[str] = None,
+    friction_correlation: Optional[str] = None,
+    aspect_ratio: float = 0.0
 ) -> FlowResults:
     """
     Samler alle relevante strømningstall for én side og returnerer som FlowResults.
-    Alle enheter SI.
+    Alle enheter SI. Med developing_flow brukes innløpsområdets middelverdier for Nu og
+    friksjonsfaktor i stedet for de fullt utviklede laminære verdiene.
+    nusselt_correlation/friction_correlation: navn i korrelasjonsregisteret (standard: parallelle plater).
     """
+    nusselt = get_correlation("nusselt", nusselt_correlation or DEFAULT_NUSSELT)
+    friction = get_correlation("friction", friction_correlation or DEFAULT_FRICTION)
+    channel = Channel(hydraulic_diameter, length, aspect_ratio)
     re = reynolds_number(mass_flow_rate, density, dynamic_viscosity, hydraulic_diameter, flow_area)
     regime = flow_regime_from_re(re)
     pr = prandtl_number(specific_heat_capacity, dynamic_viscosity, thermal_conductivity)
-    nu = nusselt_number(re, pr, regime)
+    nusselt_laminar, friction_laminar = None, None
+    if developing_flow and re > 0:
+        nusselt_laminar = float(mean_nusselt_developing_array(re, pr, hydraulic_diameter, length))
+        friction_laminar = float(apparent_friction_factor_array(re, hydraulic_diameter, length))
+    nu = nusselt.scalar(re, pr, channel, nusselt_laminar)
     vel = velocity(mass_flow_rate, density, flow_area)
     h = nu * thermal_conductivity / hydraulic_diameter if hydraulic_diameter > 0 else float('nan')
-    f = friction_factor(re, regime)
+    f = friction.scalar(re, channel, friction_laminar)
     dp = pressure_drop(f, length, hydraulic_diameter, density, vel)
     volumetric_flow_rate = mass_flow_rate / density if density > 0 else float('nan')
     mass_flux = mass_flow_rate / flow_area if flow_area > 0 else float('nan')
@@ -157,3 +186,410 @@ def flow_side_results(
         volumetric_flow_rate=volumetric_flow_rate,
         mass_flux=mass_flux
     )
+
+
+# --- Vektoriserte varianter (numpy-arrays) ---
+# Samme korrelasjoner som over, men uten forgreninger per element. Alle grener
+# beregnes og velges med np.where, derfor undertrykkes numpy-advarsler for
+# verdier som uansett forkastes.
+
+def flow_regime_code_array(reynolds_number) -> np.ndarray:
+    """Returnerer regimekode (indeks i FLOW_REGIMES) for en array av Reynolds-tall."""
+    return np.where(reynolds_number < RE_LAMINAR, 0, np.where(reynolds_number <= RE_TURBULENT, 1, 2))
+
+def nusselt_number_array(reynolds, prandtl, nusselt_laminar=NU_LAMINAR):
+    """Vektorisert nusselt_number."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        friction_turbulent = (0.79 * np.log(reynolds) - 1.64)**-2
+        nusselt_turbulent = (
+            (friction_turbulent/8) * (reynolds - 1000) * prandtl /
+            (1 + 12.7 * np.sqrt(friction_turbulent/8) * (prandtl**(2/3) - 1))
+        )
+        weight = (reynolds - RE_LAMINAR) / (RE_TURBULENT - RE_LAMINAR)
+        nusselt_transition = nusselt_laminar + weight * (nusselt_turbulent - nusselt_laminar)
+        return np.where(
+            reynolds < RE_LAMINAR, nusselt_laminar,
+            np.where(reynolds <= RE_TURBULENT, nusselt_transition, nusselt_turbulent)
+        )
+
+def friction_factor_array(reynolds, friction_laminar=None):
+    """Vektorisert friction_factor. Gir nan for Re <= 0."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        f_laminar = F_RE_LAMINAR / reynolds if friction_laminar is None else friction_laminar
+        f_turbulent = (0.79 * np.log(reynolds) - 1.64)**-2
+        weight = (reynolds - RE_LAMINAR) / (RE_TURBULENT - RE_LAMINAR)
+        f = np.where(
+            reynolds < RE_LAMINAR, f_laminar,
+            np.where(reynolds <= RE_TURBULENT, f_laminar + weight * (f_turbulent - f_laminar), f_turbulent)
+        )
+        return np.where(reynolds <= 0, np.nan, f)
+
+def flow_side_arrays(
+    mass_flow_rate,
+    density,
+    dynamic_viscosity,
+    specific_heat_capacity,
+    thermal_conductivity,
+    flow_area,
+    hydraulic_diameter,
+    length,
+    developing_flow=False,
+    nusselt_correlation: Optional[str] = None,
+    friction_correlation: Optional[str] = None,
+    aspect_ratio=0.0
+) -> Dict[str, np.ndarray]:
+    """
+    Vektorisert flow_side_results. Returnerer en dict med samme nøkler som FlowResults,
+    men med flow_regime som regimekode (se FLOW_REGIMES), pluss correlation_valid: sann der
+    Re og Pr ligger innenfor gyldighetsområdet til begge de valgte korrelasjonene (Correlation.valid).
+    Alle argumenter kan være skalarer eller numpy-arrays som lar seg kringkaste;
+    developing_flow kan også være en bool-array (per rad). Korrelasjonene er ett navn
+    per kall, slik at oppslaget i registeret skjer én gang for hele batchen.
+    """
+    nusselt = get_correlation("nusselt", nusselt_correlation or DEFAULT_NUSSELT)
+    friction = get_correlation("friction", friction_correlation or DEFAULT_FRICTION)
+    channel = Channel(hydraulic_diameter, length, aspect_ratio)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        vel = mass_flow_rate / (density * flow_area)
+        re = density * vel * hydraulic_diameter / dynamic_viscosity
+        pr = specific_heat_capacity * dynamic_viscosity / thermal_conductivity
+        nu = nusselt.array(re, pr, channel)
+        f = friction.array(re, channel)
+        if np.any(developing_flow):
+            nusselt_laminar = mean_nusselt_developing_array(re, pr, hydraulic_diameter, length)
+            friction_laminar = apparent_friction_factor_array(re, hydraulic_diameter, length)
+            nu = np.where(developing_flow, nusselt.array(re, pr, channel, nusselt_laminar), nu)
+            f = np.where(developing_flow, friction.array(re, channel, friction_laminar), f)
+        return {
+            "reynolds_number": re,
+            "flow_regime": flow_regime_code_array(re),
+            "prandtl_number": pr,
+            "nusselt_number": nu,
+            "velocity": vel,
+            "heat_transfer_coefficient": nu * thermal_conductivity / hydraulic_diameter,
+            "friction_factor": f,
+            "pressure_drop": f * (length / hydraulic_diameter) * (density * vel**2) / 2,
+            "volumetric_flow_rate": mass_flow_rate / density,
+            "mass_flux": mass_flow_rate / flow_area,
+            "correlation_valid": np.asarray(nusselt.valid(re, pr) & friction.valid(re), dtype=bool),
+        }
+
+
+# --- Innløpsområdet (utviklende laminær strømning mellom parallelle plater) ---
+# x* = x / (Dh Re Pr) er termisk og x+ = x / (Dh Re) hydrodynamisk dimensjonsløs lengde.
+
+def nusselt_local_thermal_array(x_star):
+    """
+    Lokalt Nu for termisk utviklende strømning med utviklet hastighetsprofil, konstant
+    veggtemperatur (Shah og London 1978). Går mot NU_LAMINAR for store x*.
+    """
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        return np.where(
+            x_star <= 1e-3,
+            1.233 * x_star**(-1/3) + 0.4,
+            7.541 + 6.874 * (1e3 * x_star)**-0.488 * np.exp(-245 * x_star)
+        )
+
+def nusselt_local_simultaneous_array(x_star, prandtl):
+    """
+    Lokalt Nu for samtidig hydrodynamisk og termisk utviklende strømning, avledet fra
+    Stephans middelverdi Nu_m = 7.55 + 0.024 x*^-1.14 / (1 + 0.0358 Pr^0.17 x*^-0.64)
+    som Nu_x = d(x* Nu_m)/dx*. Gyldig for 0.1 < Pr < 1000.
+    """
+    b = 0.0358 * prandtl**0.17
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        g = 0.024 * x_star**-0.14
+        h = 1 + b * x_star**-0.64
+        dg = -0.14 * g / x_star
+        dh = -0.64 * b * x_star**-1.64
+        return 7.55 + (dg * h - g * dh) / h**2
+
+def apparent_friction_factor_array(reynolds, hydraulic_diameter, length):
+    """
+    Tilsynelatende (middel) Darcy-friksjonsfaktor over lengden for hydrodynamisk utviklende
+    strømning (Shah 1978, parallelle plater: f_app Re = 4 * (3.44 / sqrt(x+) +
+    (K / (4 x+) + 24 - 3.44 / sqrt(x+)) / (1 + C / x+^2)), K = 0.674, C = 2.9e-5).
+    Går mot 96/Re for lange kanaler.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x_plus = length / (hydraulic_diameter * reynolds)
+        root = 3.44 / np.sqrt(x_plus)
+        fanning_re = root + (0.674 / (4 * x_plus) + F_RE_LAMINAR / 4 - root) / (1 + 2.9e-5 / x_plus**2)
+        return 4 * fanning_re / reynolds
+
+def mean_nusselt_developing_array(reynolds, prandtl, hydraulic_diameter, length, simultaneous=True, n_points=N_DEVELOPING_POINTS):
+    """
+    Middelverdien av lokale Nu over kanallengden, (1/L) ∫ Nu_x dx. Lokale verdier beregnes i
+    n_points Gauss-Legendre-punkter på en ekstra (siste) akse, så kallet er vektorisert over
+    både posisjoner og en batch av geometrier/driftspunkter. Med x = L t^3 blir
+    singulariteten ved innløpet (Nu_x ~ x^-1/3) glatt i t.
+    simultaneous: samtidig utviklende (standard for luft, Pr ~ 0.7) eller bare termisk utviklende.
+    """
+    nodes, weights = np.polynomial.legendre.leggauss(n_points)
+    t = 0.5 * (nodes + 1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        graetz_length = np.expand_dims(length / (hydraulic_diameter * reynolds * prandtl), -1)
+    x_star = graetz_length * t**3
+    local = nusselt_local_simultaneous_array(x_star, np.expand_dims(prandtl, -1)) if simultaneous else nusselt_local_thermal_array(x_star)
+    return np.sum(local * (1.5 * t**2 * weights), axis=-1)
+
+
+# --- Register over navngitte korrelasjoner ---
+# Hver korrelasjon har en skalar og en vektorisert implementasjon med samme signatur:
+#   Nusselt:   (reynolds, prandtl, channel, laminar=None)
+#   Friksjon:  (reynolds, channel, laminar=None)
+# channel beskriver kanalgeometrien (Channel). laminar overstyrer den fullt utviklede
+# laminære verdien (brukes for innløpsområdet, se developing_flow); korrelasjoner uten
+# egen laminær gren ignorerer den. Korrelasjonen slås opp én gang per kall/batch.
+
+class Channel(NamedTuple):
+    hydraulic_diameter: Any
+    length: Any
+    # Kanalhøyde / bredde (0 for parallelle plater)
+    aspect_ratio: Any = 0.0
+
+
+class Correlation:
+    """Navngitt Nusselt- eller friksjonskorrelasjon med gyldighetsområde i Re og Pr."""
+
+    def __init__(
+        self,
+        name: str,
+        kind: str,
+        scalar: Callable[..., float],
+        array: Callable[..., Any],
+        reynolds_range: Tuple[float, float],
+        prandtl_range: Tuple[float, float] = (0.0, math.inf),
+        description: str = ""
+    ) -> None:
+        if kind not in CORRELATION_KINDS:
+            raise ValueError(f"Ukjent korrelasjonstype: {kind}")
+        self.name = name
+        self.kind = kind
+        self.scalar = scalar
+        self.array = array
+        self.reynolds_range = reynolds_range
+        self.prandtl_range = prandtl_range
+        self.description = description
+
+    def valid(self, reynolds, prandtl=None):
+        """Sann der Re (og Pr, hvis gitt) ligger innenfor det oppgitte gyldighetsområdet."""
+        inside = (reynolds >= self.reynolds_range[0]) & (reynolds <= self.reynolds_range[1])
+        if prandtl is not None:
+            inside = inside & (prandtl >= self.prandtl_range[0]) & (prandtl <= self.prandtl_range[1])
+        return inside
+
+
+CORRELATION_KINDS = ("nusselt", "friction")
+NUSSELT_CORRELATIONS: Dict[str, Correlation] = {}
+FRICTION_CORRELATIONS: Dict[str, Correlation] = {}
+DEFAULT_NUSSELT = "parallel-plates"
+DEFAULT_FRICTION = "parallel-plates"
+
+
+def register_correlation(correlation: Correlation) -> Correlation:
+    """Legger til (eller erstatter) en korrelasjon i registeret for sin type."""
+    registry = NUSSELT_CORRELATIONS if correlation.kind == "nusselt" else FRICTION_CORRELATIONS
+    registry[correlation.name] = correlation
+    return correlation
+
+
+def get_correlation(kind: str, name: str) -> Correlation:
+    """Slår opp en registrert korrelasjon; ValueError med gyldige navn hvis den ikke finnes."""
+    registry = NUSSELT_CORRELATIONS if kind == "nusselt" else FRICTION_CORRELATIONS
+    if kind not in CORRELATION_KINDS or name not in registry:
+        raise ValueError(f"Ukjent {kind}-korrelasjon: {name} (gyldige: {', '.join(registry)})")
+    return registry[name]
+
+
+def _blend_array(reynolds, laminar, turbulent):
+    """Laminær under RE_LAMINAR, turbulent over RE_TURBULENT, lineær interpolasjon imellom."""
+    weight = (reynolds - RE_LAMINAR) / (RE_TURBULENT - RE_LAMINAR)
+    return np.where(
+        reynolds < RE_LAMINAR, laminar,
+        np.where(reynolds <= RE_TURBULENT, laminar + weight * (turbulent - laminar), turbulent)
+    )
+
+def _blend(reynolds: float, laminar: float, turbulent: Callable[[], float]) -> float:
+    """Skalar _blend_array; den turbulente grenen beregnes bare når den brukes."""
+    regime = flow_regime_from_re(reynolds)
+    if regime == "Laminær":
+        return laminar
+    if regime == "Overgangsstrømning":
+        return laminar + (reynolds - RE_LAMINAR) / (RE_TURBULENT - RE_LAMINAR) * (turbulent() - laminar)
+    return turbulent()
+
+def _laminar_friction(reynolds: float, friction_re: float) -> float:
+    return friction_re / reynolds if reynolds > 0 else float('nan')
+
+def _invalid_re(reynolds):
+    """0, eller nan der Re <= 0 (friksjonsfaktoren er udefinert uten strømning)."""
+    return np.where(reynolds <= 0, np.nan, 0.0)
+
+def _or(value, default):
+    return default if value is None else value
+
+# Petukhov-friksjon og Gnielinski-Nu (gyldig 3000 < Re < 5e6, 0.5 < Pr < 2000)
+# Skalar- og arrayformene gir begge nan for Re <= 0
+def petukhov_friction(reynolds: float) -> float:
+    if reynolds <= 0:
+        return float('nan')
+    return (0.79 * math.log(reynolds) - 1.64)**-2
+
+def petukhov_friction_array(reynolds):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (0.79 * np.log(reynolds) - 1.64)**-2 + _invalid_re(reynolds)
+
+def gnielinski_nusselt(reynolds: float, prandtl: float) -> float:
+    if reynolds <= 0:
+        return float('nan')
+    f = petukhov_friction(reynolds)
+    return (f/8) * (reynolds - 1000) * prandtl / (1 + 12.7 * math.sqrt(f/8) * (prandtl**(2/3) - 1))
+
+def gnielinski_nusselt_array(reynolds, prandtl):
+    f = petukhov_friction_array(reynolds)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (f/8) * (reynolds - 1000) * prandtl / (1 + 12.7 * np.sqrt(f/8) * (prandtl**(2/3) - 1))
+
+# Blasius (glatte rør, Re < 1e5)
+def blasius_friction(reynolds: float) -> float:
+    if reynolds <= 0:
+        return float('nan')
+    return 0.316 * reynolds**-0.25
+
+def blasius_friction_array(reynolds):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return 0.316 * reynolds**-0.25 + _invalid_re(reynolds)
+
+# Shah og London, fullt utviklet laminær strømning i rektangulære kanaler (α = høyde / bredde <= 1)
+def rectangular_nusselt(aspect_ratio):
+    a = np.where(aspect_ratio > 1, 1 / np.maximum(aspect_ratio, 1), aspect_ratio)
+    return 7.541 * (1 - 2.610*a + 4.970*a**2 - 5.119*a**3 + 2.702*a**4 - 0.548*a**5)
+
+def rectangular_friction_re(aspect_ratio):
+    a = np.where(aspect_ratio > 1, 1 / np.maximum(aspect_ratio, 1), aspect_ratio)
+    return F_RE_LAMINAR * (1 - 1.3553*a + 1.9467*a**2 - 1.7012*a**3 + 0.9564*a**4 - 0.2537*a**5)
+
+# Martin (1996) for vinkelkorrugerte (chevron) plater; angle er vinkelen mellom korrugeringen og
+# hovedstrømningsretningen i grader. Viskositetsforholdet (μ/μ_vegg)^(1/6) settes til 1.
+def martin_friction(reynolds: float, angle: float) -> float:
+    if reynolds <= 0:
+        return float('nan')
+    phi = math.radians(angle)
+    xi_0 = 64 / reynolds if reynolds < 2000 else (1.8 * math.log(reynolds) - 1.5)**-2
+    xi_1 = 597 / reynolds + 3.85 if reynolds < 2000 else 39 * reynolds**-0.289
+    c = math.cos(phi)
+    inverse_root = c / math.sqrt(0.18 * math.tan(phi) + 0.36 * math.sin(phi) + xi_0 / c) + (1 - c) / math.sqrt(3.8 * xi_1)
+    return inverse_root**-2
+
+def martin_friction_array(reynolds, angle: float):
+    phi = math.radians(angle)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        xi_0 = np.where(reynolds < 2000, 64 / reynolds, (1.8 * np.log(reynolds) - 1.5)**-2)
+        xi_1 = np.where(reynolds < 2000, 597 / reynolds + 3.85, 39 * reynolds**-0.289)
+        c = math.cos(phi)
+        inverse_root = c / np.sqrt(0.18 * math.tan(phi) + 0.36 * math.sin(phi) + xi_0 / c) + (1 - c) / np.sqrt(3.8 * xi_1)
+        return inverse_root**-2 + _invalid_re(reynolds)
+
+def martin_nusselt(reynolds: float, prandtl: float, angle: float) -> float:
+    if reynolds <= 0:
+        return float('nan')
+    return 0.122 * prandtl**(1/3) * (martin_friction(reynolds, angle) * reynolds**2 * math.sin(2 * math.radians(angle)))**0.374
+
+def martin_nusselt_array(reynolds, prandtl, angle: float):
+    with np.errstate(invalid="ignore"):
+        return 0.122 * prandtl**(1/3) * (martin_friction_array(reynolds, angle) * reynolds**2 * math.sin(2 * math.radians(angle)))**0.374
+
+
+register_correlation(Correlation(
+    "parallel-plates", "nusselt",
+    lambda re, pr, channel, laminar=None: nusselt_number(re, pr, flow_regime_from_re(re), _or(laminar, NU_LAMINAR)),
+    lambda re, pr, channel, laminar=None: nusselt_number_array(re, pr, _or(laminar, NU_LAMINAR)),
+    (0.0, 5e6), (0.5, 2000.0),
+    "Parallelle plater: Shah-London laminær, Gnielinski turbulent, lineær overgang (standard)"
+))
+register_correlation(Correlation(
+    "shah-london", "nusselt",
+    lambda re, pr, channel, laminar=None: _or(laminar, NU_LAMINAR),
+    lambda re, pr, channel, laminar=None: np.zeros(np.shape(re)) + _or(laminar, NU_LAMINAR),
+    (0.0, RE_LAMINAR),
+    description="Fullt utviklet laminær strømning mellom parallelle plater, Nu = 7.54"
+))
+register_correlation(Correlation(
+    "gnielinski", "nusselt",
+    lambda re, pr, channel, laminar=None: gnielinski_nusselt(re, pr),
+    lambda re, pr, channel, laminar=None: gnielinski_nusselt_array(re, pr),
+    (3000.0, 5e6), (0.5, 2000.0),
+    "Gnielinski med Petukhov-friksjon i hele området"
+))
+register_correlation(Correlation(
+    "rectangular-duct", "nusselt",
+    lambda re, pr, channel, laminar=None: _blend(re, _or(laminar, float(rectangular_nusselt(channel.aspect_ratio))), lambda: gnielinski_nusselt(re, pr)),
+    lambda re, pr, channel, laminar=None: _blend_array(re, _or(laminar, rectangular_nusselt(channel.aspect_ratio)), gnielinski_nusselt_array(re, pr)),
+    (0.0, 5e6), (0.5, 2000.0),
+    "Shah-London for rektangulære kanaler (sideforhold), Gnielinski turbulent"
+))
+register_correlation(Correlation(
+    "circular-tube", "nusselt",
+    lambda re, pr, channel, laminar=None: nusselt_number(re, pr, flow_regime_from_re(re), _or(laminar, 3.66)),
+    lambda re, pr, channel, laminar=None: nusselt_number_array(re, pr, _or(laminar, 3.66)),
+    (0.0, 5e6), (0.5, 2000.0),
+    "Sirkulært rør: Nu = 3.66 laminær, Gnielinski turbulent (som i milestone01/02)"
+))
+register_correlation(Correlation(
+    "parallel-plates", "friction",
+    lambda re, channel, laminar=None: friction_factor(re, flow_regime_from_re(re), laminar),
+    lambda re, channel, laminar=None: friction_factor_array(re, laminar),
+    (0.0, 5e6),
+    description="Parallelle plater: 96/Re laminær, Petukhov turbulent, lineær overgang (standard)"
+))
+register_correlation(Correlation(
+    "shah-london", "friction",
+    lambda re, channel, laminar=None: _or(laminar, _laminar_friction(re, F_RE_LAMINAR)),
+    lambda re, channel, laminar=None: np.zeros(np.shape(re)) + (F_RE_LAMINAR / re + _invalid_re(re) if laminar is None else laminar),
+    (0.0, RE_LAMINAR),
+    description="Fullt utviklet laminær strømning mellom parallelle plater, f = 96/Re"
+))
+register_correlation(Correlation(
+    "petukhov", "friction",
+    lambda re, channel, laminar=None: petukhov_friction(re),
+    lambda re, channel, laminar=None: petukhov_friction_array(re),
+    (3000.0, 5e6),
+    description="Petukhov for glatte kanaler"
+))
+register_correlation(Correlation(
+    "blasius", "friction",
+    lambda re, channel, laminar=None: blasius_friction(re),
+    lambda re, channel, laminar=None: blasius_friction_array(re),
+    (4000.0, 1e5),
+    description="Blasius for glatte rør"
+))
+register_correlation(Correlation(
+    "rectangular-duct", "friction",
+    lambda re, channel, laminar=None: _blend(re, _or(laminar, _laminar_friction(re, float(rectangular_friction_re(channel.aspect_ratio)))), lambda: petukhov_friction(re)),
+    lambda re, channel, laminar=None: _blend_array(re, _or(laminar, rectangular_friction_re(channel.aspect_ratio) / re), petukhov_friction_array(re)) + _invalid_re(re),
+    (0.0, 5e6),
+    description="Shah-London for rektangulære kanaler (sideforhold), Petukhov turbulent"
+))
+register_correlation(Correlation(
+    "circular-tube", "friction",
+    lambda re, channel, laminar=None: _blend(re, _or(laminar, _laminar_friction(re, 64)), lambda: blasius_friction(re)),
+    lambda re, channel, laminar=None: _blend_array(re, _or(laminar, 64 / re), blasius_friction_array(re)) + _invalid_re(re),
+    (0.0, 1e5),
+    description="Sirkulært rør: 64/Re laminær, Blasius turbulent (som i milestone01/02)"
+))
+for _angle in (30, 45, 60):
+    register_correlation(Correlation(
+        f"martin-chevron-{_angle}", "nusselt",
+        lambda re, pr, channel, laminar=None, angle=_angle: martin_nusselt(re, pr, angle),
+        lambda re, pr, channel, laminar=None, angle=_angle: martin_nusselt_array(re, pr, angle),
+        (200.0, 10000.0), (0.7, 100.0),
+        f"Martin (1996) for chevronplater, {_angle}° korrugeringsvinkel"
+    ))
+    register_correlation(Correlation(
+        f"martin-chevron-{_angle}", "friction",
+        lambda re, channel, laminar=None, angle=_angle: martin_friction(re, angle),
+        lambda re, channel, laminar=None, angle=_angle: martin_friction_array(re, angle),
+        (200.0, 10000.0),
+        description=f"Martin (1996) for chevronplater, {_angle}° korrugeringsvinkel"
+    ))
@@ -0,0 +1,122 @@
+from typing import Any, Dict, Mapping, Optional
+import numpy as np
+from models import SimulationInput
+from moistair import AirProperties
+from batch import columns_from_input, evaluate_batch, select_rows
+from solvers import safeguarded_newton
+
+# Veggtemperatur [°C] under denne regnes som frostfare
+FROST_LIMIT = 0.0
+
+# Største bypassandel det letes etter; mer enn dette regnes som uoppnåelig
+BYPASS_MAX = 0.999
+
+# Magnus-konstanter for metningstrykk over is (rimfrostpunkt)
+ICE_A = 22.46
+ICE_B = 272.62
+
+
+def frost_point_array(p_w):
+    """Rimfrostpunkt (°C) fra partialtrykk vanndamp (Pa), over is (nan der p_w <= 0)."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_ratio = np.log(np.where(p_w > 0, p_w, np.nan) / AirProperties.P_WS_0)
+    return ICE_B * log_ratio / (ICE_A - log_ratio)
+
+
+def minimum_wall_temperature(
+    evaluated: Mapping[str, Any],
+    temperature_exhaust,
+    temperature_supply,
+    exhaust_side: int = 1
+):
+    """
+    Laveste platetemperatur på avtrekkssiden, fra ε-NTU-resultatene (evaluate_batch).
+    I den kalde enden møter avtrekket ved utløpstemperaturen tilluft ved innløpstemperaturen;
+    veggen ligger der mellom de to lufttemperaturene etter motstandene:
+    T_v = T_a,ut - (T_a,ut - T_t,inn) R_a / R_total.
+    Eksakt for motstrøm og for kryssstrøm med blandet avtrekk. For kryssstrøm uten blanding er
+    det lokale hjørnet kaldere enn middelutløpet; bruk en margin i frost_limit der.
+    """
+    if exhaust_side not in (1, 2):
+        raise ValueError("exhaust_side må være 1 eller 2")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        q = np.sign(temperature_exhaust - temperature_supply) * evaluated["q_actual"]
+        t_cold = temperature_exhaust - q / evaluated[f"c_{exhaust_side}"]
+        return t_cold - (t_cold - temperature_supply) * evaluated[f"r_conv_{exhaust_side}"] / evaluated["r_total"]
+
+
+def frost_screening(
+    base: SimulationInput,
+    overrides: Optional[Mapping[str, Any]] = None,
+    exhaust_side: int = 1,
+    hours=1.0,
+    frost_limit: float = FROST_LIMIT,
+    tolerance: float = 1e-6,
+    max_iterations: int = 50
+) -> Dict[str, Any]:
+    """
+    Frostscreening over en værserie: værdata gis som overrides for tilluftssiden, f.eks.
+    {"airstream_2.temperature_c": t_ute, "airstream_2.phi": phi_ute}, én rad per time
+    (hours er varigheten av hver rad). For hver rad estimeres laveste platetemperatur på
+    avtrekkssiden (minimum_wall_temperature). Timen flagges når veggen er under frost_limit
+    og under avtrekkets rimfrostpunkt (fukt avsettes som rim).
+    For de flaggede timene finnes bypassandelen b på tilluften (tilluftsstrømmen gjennom
+    veksleren er (1 - b) ṁ) som løfter veggen til min(frost_limit, rimfrostpunkt), med sikret
+    Newton-iterasjon (solvers.safeguarded_newton), vektorisert over timene. Timer uten frost
+    får b = 0; timer som ikke kan avrimes med BYPASS_MAX gir nan.
+    Returnerer wall_temperature, frost_point, frost, frost_hours, bypass_fraction og bypass_feasible.
+    """
+    if exhaust_side not in (1, 2):
+        raise ValueError("exhaust_side må være 1 eller 2")
+    exhaust, supply = f"airstream_{exhaust_side}", f"airstream_{3 - exhaust_side}"
+    columns = columns_from_input(base)
+    columns.update(overrides or {})
+
+    def wall_temperature(cols: Mapping[str, Any]):
+        evaluated = evaluate_batch(cols, base.flow_arrangement, base.effectiveness_backend, base.number_of_passes)
+        return minimum_wall_temperature(
+            evaluated, cols[f"{exhaust}.temperature_c"], cols[f"{supply}.temperature_c"], exhaust_side
+        )
+
+    t_wall = np.asarray(wall_temperature(columns), dtype=float)
+    p_w = AirProperties.calc_vapor_partial_pressure(
+        np.asarray(columns[f"{exhaust}.phi"], dtype=float),
+        AirProperties.calc_saturation_vapor_pressure(np.asarray(columns[f"{exhaust}.temperature_c"], dtype=float))
+    )
+    frost_point = frost_point_array(p_w)
+    shape = np.broadcast_shapes(t_wall.shape, np.shape(frost_point), np.shape(hours))
+    t_wall, frost_point = np.broadcast_to(t_wall, shape), np.broadcast_to(frost_point, shape)
+    frost = (t_wall < frost_limit) & (t_wall < frost_point)
+
+    bypass = np.zeros(shape)
+    rows = np.flatnonzero(frost)
+    if rows.size:
+        frost_columns = select_rows(columns, shape, rows)
+        target = np.fmin(frost_limit, frost_point.reshape(-1)[rows])
+
+        def residual(fraction, active):
+            cols = select_rows(frost_columns, rows.shape, active)
+            cols[f"{supply}.mass_flow_rate"] = (1 - fraction) * cols[f"{supply}.mass_flow_rate"]
+            return wall_temperature(cols) - target[active]
+
+        everything = np.arange(rows.size)
+        feasible = residual(np.full(rows.size, BYPASS_MAX), everything) >= 0
+
+        def derivative(fraction, r, active, step=1e-6):
+            up, down = np.minimum(fraction + step, BYPASS_MAX), np.maximum(fraction - step, 0.0)
+            return (residual(up, active) - residual(down, active)) / (up - down)
+
+        fraction, _, _ = safeguarded_newton(
+            residual, derivative, 0.0, BYPASS_MAX, np.full(rows.size, 0.5 * BYPASS_MAX),
+            tolerance, max_iterations, active=feasible
+        )
+        bypass.reshape(-1)[rows] = np.where(feasible, fraction, np.nan)
+
+    return {
+        "wall_temperature": t_wall,
+        "frost_point": frost_point,
+        "frost": frost,
+        "frost_hours": float(np.sum(np.where(frost, hours, 0.0))),
+        "bypass_fraction": bypass,
+        "bypass_feasible": np.isfinite(bypass),
+    }
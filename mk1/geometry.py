@@ -0,0 +1,109 @@
+import weakref
+from typing import Any, Tuple
+from heatecxhanger import PlateHeatExchanger
+from models import ExchangerInput
+
+
+class ExchangerGeometry:
+    """
+    Uforanderlig og hashbar varmevekslergeometri.
+    Alle avledede størrelser (antall kanaler, arealer, volum, hydraulisk diameter) beregnes
+    én gang ved konstruksjon, med formlene i PlateHeatExchanger. Objektet har de samme
+    attributtnavnene som PlateHeatExchanger og kan brukes som nøkkel i dict/lru_cache
+    for mellomresultater per geometri.
+    """
+    INPUTS = (
+        "width",
+        "length",
+        "plate_thickness",
+        "thermal_conductivity_plate",
+        "number_of_plates",
+        "channel_height",
+    )
+    DERIVED = (
+        "number_of_channels_side_1",
+        "number_of_channels_side_2",
+        "area_heat_total",
+        "area_heat_1",
+        "area_heat_2",
+        "area_flow_1",
+        "area_flow_2",
+        "volume_channel",
+        "volume_total_1",
+        "volume_total_2",
+        "hydraulic_diameter",
+        "aspect_ratio",
+        "area_plate",
+    )
+    __slots__ = INPUTS + DERIVED + ("_key", "_hash", "__weakref__")
+
+    _interned: "weakref.WeakValueDictionary[Tuple[Any, ...], ExchangerGeometry]" = weakref.WeakValueDictionary()
+
+    def __init__(
+        self,
+        width: float,
+        length: float,
+        plate_thickness: float,
+        thermal_conductivity_plate: float,
+        number_of_plates: int,
+        channel_height: float
+    ) -> None:
+        key = (
+            float(width),
+            float(length),
+            float(plate_thickness),
+            float(thermal_conductivity_plate),
+            int(number_of_plates),
+            float(channel_height),
+        )
+        phex = PlateHeatExchanger(*key)
+        for name, value in zip(self.INPUTS, key):
+            object.__setattr__(self, name, value)
+        for name in self.DERIVED:
+            object.__setattr__(self, name, getattr(phex, name))
+        object.__setattr__(self, "_key", key)
+        object.__setattr__(self, "_hash", hash(key))
+
+    @classmethod
+    def intern(cls, *args: Any, **kwargs: Any) -> "ExchangerGeometry":
+        """Returnerer den kanoniske instansen for disse verdiene (samme objekt for like geometrier)."""
+        candidate = cls(*args, **kwargs)
+        return cls._interned.setdefault(candidate._key, candidate)
+
+    @classmethod
+    def from_input(cls, exchanger: ExchangerInput) -> "ExchangerGeometry":
+        """Internert geometri fra et ExchangerInput-objekt."""
+        return cls.intern(**exchanger.model_dump())
+
+    @property
+    def key(self) -> Tuple[Any, ...]:
+        """Inndataverdiene som tuple; bestemmer likhet og hash."""
+        return self._key
+
+    def to_exchanger(self) -> PlateHeatExchanger:
+        """Lager et (muterbart) PlateHeatExchanger-objekt med samme geometri."""
+        return PlateHeatExchanger(*self._key)
+
+    def to_dict(self) -> dict:
+        return dict(zip(self.INPUTS, self._key))
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError("ExchangerGeometry er uforanderlig")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError("ExchangerGeometry er uforanderlig")
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, ExchangerGeometry):
+            return NotImplemented
+        return self is other or self._key == other._key
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __reduce__(self):
+        return (self.__class__, self._key)
+
+    def __repr__(self) -> str:
+        values = ", ".join(f"{name}={value!r}" for name, value in zip(self.INPUTS, self._key))
+        return f"ExchangerGeometry({values})"
@@ -1,9 +1,11 @@
 
-from flowcorrelations import flow_side_results
+from flowcorrelations import DEFAULT_FRICTION, DEFAULT_NUSSELT, FlowResults, flow_side_results, flow_side_arrays
 import math
-from typing import TYPE_CHECKING
+import numpy as np
+from effectiveness import NUMERICAL_ARRANGEMENTS, arrangement_effectiveness, crossflow_unmixed_table
+from typing import TYPE_CHECKING, Any, Dict
 from models import HeatExchangerParameters, HeatExchangerResults
-from definitions import FlowArrangement
+from definitions import EffectivenessBackend, FlowArrangement
 
 if TYPE_CHECKING:
     from moistair import AirStream
@@ -26,12 +28,14 @@ class PlateHeatExchanger:
         self.number_of_plates = number_of_plates           # Antall plater (starter med stor N)
         self.channel_height = channel_height  # Kanalhøyde [m] (typisk verdi)
 
+    # Heltallsdivisjon i stedet for math.ceil/floor slik at geometrien også kan
+    # bygges med numpy-arrays (se calculate_parameters_array).
     @property
     def number_of_channels_side_1(self) -> int:
-        return math.ceil((self.number_of_plates + 1) / 2)
+        return (self.number_of_plates + 2) // 2
     @property
     def number_of_channels_side_2(self) -> int:
-        return math.floor((self.number_of_plates + 1) / 2)
+        return (self.number_of_plates + 1) // 2
     @property
     def area_heat_total(self) -> float:
         return self.number_of_plates * 2 * self.width * self.length
@@ -61,39 +65,67 @@ class PlateHeatExchanger:
     def hydraulic_diameter(self) -> float:
         return 2 * (self.width * self.channel_height) / (self.width + self.channel_height)
     @property
+    def aspect_ratio(self) -> float:
+        return self.channel_height / self.width
+    @property
     def area_plate(self) -> float:
         return 2 * self.width * self.length
 
+    def calculate_side(
+        self,
+        airstream: 'AirStream',
+        side: int,
+        developing_flow: bool = False,
+        nusselt_correlation: str = DEFAULT_NUSSELT,
+        friction_correlation: str = DEFAULT_FRICTION
+    ) -> FlowResults:
+        """
+        Beregner strømningstall for én side (1 eller 2) av veksleren.
+        developing_flow: bruk innløpsområdets korrelasjoner for laminær strømning.
+        nusselt_correlation/friction_correlation: navn i korrelasjonsregisteret (flowcorrelations).
+        """
+        return flow_side_results(
+            mass_flow_rate=airstream.m_dot,
+            density=airstream.rho,
+            dynamic_viscosity=airstream.dynamic_viscosity,
+            specific_heat_capacity=airstream.cp,
+            thermal_conductivity=airstream.k,
+            flow_area=self.area_flow_1 if side == 1 else self.area_flow_2,
+            hydraulic_diameter=self.hydraulic_diameter,
+            length=self.length,
+            developing_flow=developing_flow,
+            nusselt_correlation=nusselt_correlation,
+            friction_correlation=friction_correlation,
+            aspect_ratio=self.aspect_ratio
+        )
+
     def calculate_parameters(
         self,
         airstream_1: 'AirStream',
-        airstream_2: 'AirStream'
+        airstream_2: 'AirStream',
+        developing_flow: bool = False,
+        nusselt_correlation: str = DEFAULT_NUSSELT,
+        friction_correlation: str = DEFAULT_FRICTION
     ) -> HeatExchangerParameters:
         """
         Beregner og returnerer et HeatExchangerParameters-objekt for gitte luftstrømmer.
         """
-        side1 = flow_side_results(
-            mass_flow_rate=airstream_1.m_dot,
-            density=airstream_1.rho,
-            dynamic_viscosity=airstream_1.dynamic_viscosity,
-            specific_heat_capacity=airstream_1.cp,
-            thermal_conductivity=airstream_1.k,
-            flow_area=self.area_flow_1,
-            hydraulic_diameter=self.hydraulic_diameter,
-            length=self.length
-        )
-        side2 = flow_side_results(
-            mass_flow_rate=airstream_2.m_dot,
-            density=airstream_2.rho,
-            dynamic_viscosity=airstream_2.dynamic_viscosity,
-            specific_heat_capacity=airstream_2.cp,
-            thermal_conductivity=airstream_2.k,
-            flow_area=self.area_flow_2,
-            hydraulic_diameter=self.hydraulic_diameter,
-            length=self.length
-        )
-        h_1 = side1["heat_transfer_coefficient"]
-        h_2 = side2["heat_transfer_coefficient"]
+        side1 = self.calculate_side(airstream_1, 1, developing_flow, nusselt_correlation, friction_correlation)
+        side2 = self.calculate_side(airstream_2, 2, developing_flow, nusselt_correlation, friction_correlation)
+        return self.combine_sides(side1, side2, airstream_1, airstream_2)
+
+    def combine_sides(
+        self,
+        side1: FlowResults,
+        side2: FlowResults,
+        airstream_1: 'AirStream',
+        airstream_2: 'AirStream'
+    ) -> HeatExchangerParameters:
+        """
+        Setter sammen resultatene for hver side til motstander, U-verdi og NTU.
+        """
+        h_1 = side1.heat_transfer_coefficient
+        h_2 = side2.heat_transfer_coefficient
         area_heat_1 = self.area_heat_1
         area_heat_2 = self.area_heat_2
         r_conv_1 = 1 / (h_1 * area_heat_1)
@@ -106,29 +138,29 @@ class PlateHeatExchanger:
         c_min = min(c_1, c_2)
         c_max = max(c_1, c_2)
         ntu = u_value * area_heat_1 / c_min
-        v_1 = side1["velocity"]
-        v_2 = side2["velocity"]
+        v_1 = side1.velocity
+        v_2 = side2.velocity
         t_res_1 = self.length / v_1
         t_res_2 = self.length / v_2
         return HeatExchangerParameters(
             h_1=h_1,
-            re_1=side1["reynolds_number"],
-            nu_1=side1["nusselt_number"],
+            re_1=side1.reynolds_number,
+            nu_1=side1.nusselt_number,
             v_1=v_1,
-            q_vol_1=side1["volumetric_flow_rate"],
-            g_1=side1["mass_flux"],
-            delta_p_1=side1["pressure_drop"],
-            f_1=side1["friction_factor"],
-            flow_regime_1=side1["flow_regime"],
+            q_vol_1=side1.volumetric_flow_rate,
+            g_1=side1.mass_flux,
+            delta_p_1=side1.pressure_drop,
+            f_1=side1.friction_factor,
+            flow_regime_1=side1.flow_regime,
             h_2=h_2,
-            re_2=side2["reynolds_number"],
-            nu_2=side2["nusselt_number"],
+            re_2=side2.reynolds_number,
+            nu_2=side2.nusselt_number,
             v_2=v_2,
-            q_vol_2=side2["volumetric_flow_rate"],
-            g_2=side2["mass_flux"],
-            delta_p_2=side2["pressure_drop"],
-            f_2=side2["friction_factor"],
-            flow_regime_2=side2["flow_regime"],
+            q_vol_2=side2.volumetric_flow_rate,
+            g_2=side2.mass_flux,
+            delta_p_2=side2.pressure_drop,
+            f_2=side2.friction_factor,
+            flow_regime_2=side2.flow_regime,
             r_conv_1=r_conv_1,
             r_conv_2=r_conv_2,
             r_cond=r_cond,
@@ -148,14 +180,23 @@ class PlateHeatExchanger:
         params: HeatExchangerParameters,
         airstream_1: 'AirStream',
         airstream_2: 'AirStream',
-        flow_arrangement: "FlowArrangement"
+        flow_arrangement: "FlowArrangement",
+        effectiveness_backend: "EffectivenessBackend" = EffectivenessBackend.CORRELATION,
+        number_of_passes: int = 1
     ) -> HeatExchangerResults:
         """
         Beregner effekt, effektivitet og andre resultater basert på NTU og strømningstype.
+        Med EffectivenessBackend.EXACT_TABLE brukes den tabulerte eksakte løsningen for kryssstrøm.
+        Blandet kryssstrøm og flerpass motstrøms kryssstrøm slås opp i numerisk beregnede tabeller.
         """
         c_r = params.c_min / params.c_max
         ntu = params.ntu
-        if flow_arrangement == FlowArrangement.CROSS_FLOW:
+        if flow_arrangement in NUMERICAL_ARRANGEMENTS:
+            c_min_side_1 = airstream_1.m_dot * airstream_1.cp <= airstream_2.m_dot * airstream_2.cp
+            effectiveness = float(arrangement_effectiveness(flow_arrangement, ntu, c_r, c_min_side_1, number_of_passes))
+        elif flow_arrangement == FlowArrangement.CROSS_FLOW and effectiveness_backend == EffectivenessBackend.EXACT_TABLE:
+            effectiveness = float(crossflow_unmixed_table()(ntu, c_r))
+        elif flow_arrangement == FlowArrangement.CROSS_FLOW:
             effectiveness = 1 - math.exp((1/c_r) * ntu**0.22 * (math.exp(-c_r * ntu**0.78) - 1))
         elif flow_arrangement == FlowArrangement.COUNTER_FLOW:
             if c_r == 1:
@@ -173,3 +214,135 @@ class PlateHeatExchanger:
             q_max=q_max,
             q_actual=q_actual
         )
+
+    def calculate_parameters_array(
+        self,
+        air_1: Dict[str, Any],
+        air_2: Dict[str, Any],
+        mass_flow_rate_1,
+        mass_flow_rate_2,
+        developing_flow=False,
+        nusselt_correlation: str = DEFAULT_NUSSELT,
+        friction_correlation: str = DEFAULT_FRICTION
+    ) -> Dict[str, np.ndarray]:
+        """
+        Vektorisert calculate_parameters. Geometriattributtene kan være numpy-arrays.
+        air_1/air_2 er dicts med density, dynamic_viscosity, specific_heat_capacity og
+        thermal_conductivity (samme navn som i AirProperties). developing_flow kan være en bool-array;
+        korrelasjonene er ett navn for hele batchen.
+        Returnerer en dict med samme nøkler som HeatExchangerParameters, pluss c_1 og c_2 og
+        correlation_valid_1/2 (sann der de valgte korrelasjonene brukes innenfor gyldighetsområdet).
+        """
+        sides = []
+        for air, mass_flow_rate, flow_area in ((air_1, mass_flow_rate_1, self.area_flow_1), (air_2, mass_flow_rate_2, self.area_flow_2)):
+            sides.append(flow_side_arrays(
+                mass_flow_rate=mass_flow_rate,
+                density=air["density"],
+                dynamic_viscosity=air["dynamic_viscosity"],
+                specific_heat_capacity=air["specific_heat_capacity"],
+                thermal_conductivity=air["thermal_conductivity"],
+                flow_area=flow_area,
+                hydraulic_diameter=self.hydraulic_diameter,
+                length=self.length,
+                developing_flow=developing_flow,
+                nusselt_correlation=nusselt_correlation,
+                friction_correlation=friction_correlation,
+                aspect_ratio=self.aspect_ratio
+            ))
+        side1, side2 = sides
+        h_1 = side1["heat_transfer_coefficient"]
+        h_2 = side2["heat_transfer_coefficient"]
+        area_heat_1 = self.area_heat_1
+        area_heat_2 = self.area_heat_2
+        with np.errstate(divide="ignore", invalid="ignore"):
+            r_conv_1 = 1 / (h_1 * area_heat_1)
+            r_conv_2 = 1 / (h_2 * area_heat_2)
+            r_cond = self.plate_thickness / (self.thermal_conductivity_plate * area_heat_1)
+            r_total = r_conv_1 + r_cond + r_conv_2
+            u_value = 1 / (r_total * area_heat_1)
+            c_1 = mass_flow_rate_1 * air_1["specific_heat_capacity"]
+            c_2 = mass_flow_rate_2 * air_2["specific_heat_capacity"]
+            c_min = np.minimum(c_1, c_2)
+            c_max = np.maximum(c_1, c_2)
+            ntu = u_value * area_heat_1 / c_min
+            t_res_1 = self.length / side1["velocity"]
+            t_res_2 = self.length / side2["velocity"]
+        params = {}
+        for suffix, side in (("1", side1), ("2", side2)):
+            params["h_" + suffix] = side["heat_transfer_coefficient"]
+            params["re_" + suffix] = side["reynolds_number"]
+            params["nu_" + suffix] = side["nusselt_number"]
+            params["v_" + suffix] = side["velocity"]
+            params["q_vol_" + suffix] = side["volumetric_flow_rate"]
+            params["g_" + suffix] = side["mass_flux"]
+            params["delta_p_" + suffix] = side["pressure_drop"]
+            params["f_" + suffix] = side["friction_factor"]
+            params["flow_regime_" + suffix] = side["flow_regime"]
+            params["correlation_valid_" + suffix] = side["correlation_valid"]
+        params.update(
+            r_conv_1=r_conv_1,
+            r_conv_2=r_conv_2,
+            r_cond=r_cond,
+            r_total=r_total,
+            u_value=u_value,
+            ntu=ntu,
+            c_min=c_min,
+            c_max=c_max,
+            c_1=c_1,
+            c_2=c_2,
+            area_heat_1=area_heat_1,
+            area_heat_2=area_heat_2,
+            t_res_1=t_res_1,
+            t_res_2=t_res_2
+        )
+        return params
+
+    @staticmethod
+    def effectiveness_array(
+        ntu,
+        c_r,
+        flow_arrangement: "FlowArrangement",
+        effectiveness_backend: "EffectivenessBackend" = EffectivenessBackend.CORRELATION,
+        number_of_passes: int = 1,
+        c_min_side_1=True
+    ):
+        """
+        Vektorisert effektivitet for gitte NTU og C_r (samme uttrykk som calculate_results).
+        c_min_side_1 (sann der C_1 <= C_2) trengs for de usymmetriske arrangementene.
+        """
+        if flow_arrangement in NUMERICAL_ARRANGEMENTS:
+            return arrangement_effectiveness(flow_arrangement, ntu, c_r, c_min_side_1, number_of_passes)
+        if flow_arrangement == FlowArrangement.CROSS_FLOW and effectiveness_backend == EffectivenessBackend.EXACT_TABLE:
+            return crossflow_unmixed_table()(ntu, c_r)
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            if flow_arrangement == FlowArrangement.CROSS_FLOW:
+                return 1 - np.exp((1/c_r) * ntu**0.22 * (np.exp(-c_r * ntu**0.78) - 1))
+            elif flow_arrangement == FlowArrangement.COUNTER_FLOW:
+                numerator = 1 - np.exp(-ntu * (1 - c_r))
+                denominator = 1 - c_r * np.exp(-ntu * (1 - c_r))
+                return np.where(c_r == 1, ntu / (1 + ntu), numerator / denominator)
+        raise ValueError(f"Ukjent strømningsarrangement: {flow_arrangement}")
+
+    @staticmethod
+    def calculate_results_array(
+        params: Dict[str, Any],
+        temperature_1,
+        temperature_2,
+        flow_arrangement: "FlowArrangement",
+        effectiveness_backend: "EffectivenessBackend" = EffectivenessBackend.CORRELATION,
+        number_of_passes: int = 1
+    ) -> Dict[str, np.ndarray]:
+        """
+        Vektorisert calculate_results. Tar inn dict fra calculate_parameters_array og
+        innløpstemperaturene, returnerer dict med samme nøkler som HeatExchangerResults.
+        """
+        c_r = params["c_min"] / params["c_max"]
+        effectiveness = PlateHeatExchanger.effectiveness_array(
+            params["ntu"], c_r, flow_arrangement, effectiveness_backend, number_of_passes, params["c_1"] <= params["c_2"]
+        )
+        q_max = params["c_min"] * np.abs(temperature_1 - temperature_2)
+        return {
+            "effectiveness": effectiveness,
+            "q_max": q_max,
+            "q_actual": effectiveness * q_max
+        }
@@ -0,0 +1,137 @@
+from typing import Any, Dict, Optional
+import numpy as np
+from definitions import EffectivenessBackend, FlowArrangement
+from models import SimulationInput
+from heatecxhanger import PlateHeatExchanger
+from batch import evaluate_input_batch
+from solvers import safeguarded_newton
+
+# Største NTU det letes etter; mål som ikke nås her regnes som uoppnåelige
+NTU_SEARCH_MAX = 50.0
+
+
+def effectiveness_from_outlet(
+    target_temperature,
+    side: int,
+    temperature_1,
+    temperature_2,
+    c_1,
+    c_2
+):
+    """
+    Effektiviteten som gir ønsket utløpstemperatur på side 1 eller 2:
+    ε = C_side |T_inn - T_ut| / (C_min |T_1 - T_2|), med fortegn slik at mål i feil
+    retning (varmes der den skal kjøles) gir negativ ε.
+    """
+    c_min = np.minimum(c_1, c_2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if side == 1:
+            return c_1 * (temperature_1 - target_temperature) / (c_min * (temperature_1 - temperature_2))
+        if side == 2:
+            return c_2 * (target_temperature - temperature_2) / (c_min * (temperature_1 - temperature_2))
+    raise ValueError("side må være 1 eller 2")
+
+
+def _counter_flow_ntu(effectiveness, c_r) -> np.ndarray:
+    """Lukket form for motstrøm; nan der 0 < ε < 1 ikke er oppfylt."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ntu = np.where(
+            np.abs(1 - c_r) < 1e-9,
+            effectiveness / (1 - effectiveness),
+            np.log((1 - c_r * effectiveness) / (1 - effectiveness)) / (1 - c_r)
+        )
+    return np.where((effectiveness > 0) & (effectiveness < 1), ntu, np.nan)
+
+
+def required_ntu(
+    effectiveness,
+    c_r,
+    flow_arrangement: FlowArrangement,
+    effectiveness_backend: EffectivenessBackend = EffectivenessBackend.CORRELATION,
+    number_of_passes: int = 1,
+    c_min_side_1=True,
+    tolerance: float = 1e-10,
+    max_iterations: int = 60
+) -> np.ndarray:
+    """
+    NTU som gir ønsket effektivitet, vektorisert over alle argumentene.
+    Motstrøm løses med lukket form. Øvrige arrangementer løses med sikret Newton-iterasjon
+    (solvers.safeguarded_newton), siden ε(NTU) er monoton. Den deriverte tas
+    med sentraldifferanse, slik at alle effektivitetsmodellene (korrelasjon og tabeller) kan brukes.
+    Uoppnåelige mål (ε <= 0 eller større enn ε ved NTU_SEARCH_MAX) gir nan.
+    """
+    effectiveness, c_r, c_min_side_1 = np.broadcast_arrays(
+        np.asarray(effectiveness, dtype=float), np.asarray(c_r, dtype=float), np.asarray(c_min_side_1, dtype=bool)
+    )
+    if flow_arrangement == FlowArrangement.COUNTER_FLOW:
+        return _counter_flow_ntu(effectiveness, c_r)
+
+    shape = effectiveness.shape
+    effectiveness, c_r, c_min_side_1 = [v.reshape(-1) for v in (effectiveness, c_r, c_min_side_1)]
+
+    def evaluate(ntu, rows):
+        return PlateHeatExchanger.effectiveness_array(
+            ntu, c_r[rows], flow_arrangement, effectiveness_backend, number_of_passes, c_min_side_1[rows]
+        )
+
+    def derivative(ntu, residual, rows):
+        step = 1e-6 * np.maximum(ntu, 1e-3)
+        down = np.maximum(ntu - step, 0.0)
+        return (evaluate(ntu + step, rows) - evaluate(down, rows)) / (ntu + step - down)
+
+    everything = np.arange(effectiveness.size)
+    feasible = (effectiveness > 0) & (evaluate(np.full(effectiveness.size, NTU_SEARCH_MAX), everything) >= effectiveness)
+    # Startverdi: motstrømsløsningen (nedre grense for nødvendig NTU i de andre arrangementene)
+    ntu = _counter_flow_ntu(effectiveness, c_r)
+    ntu = np.where(np.isfinite(ntu) & (ntu > 0) & (ntu < NTU_SEARCH_MAX), ntu, NTU_SEARCH_MAX / 2)
+    ntu, _, _ = safeguarded_newton(
+        lambda ntu, rows: evaluate(ntu, rows) - effectiveness[rows], derivative,
+        0.0, NTU_SEARCH_MAX, ntu, tolerance, max_iterations, active=feasible
+    )
+    return np.where(feasible, ntu, np.nan).reshape(shape)
+
+
+def required_size(
+    base: SimulationInput,
+    target_effectiveness=None,
+    target_outlet_temperature_1=None,
+    target_outlet_temperature_2=None,
+    u_value: Optional[Any] = None
+) -> Dict[str, np.ndarray]:
+    """
+    Nødvendig NTU, UA og varmeflate (area_heat_1) for å nå målet, med strømmene og
+    innløpstemperaturene i base. Nøyaktig ett av målene oppgis; det kan være en array slik
+    at mange driftspunkter løses samtidig. U-verdien hentes fra base hvis den ikke er gitt
+    (den antas uendret når flaten endres). Returnerer også antall plater med bredden og
+    lengden i base, og feasible (False der målet ikke kan nås).
+    """
+    targets = [t is not None for t in (target_effectiveness, target_outlet_temperature_1, target_outlet_temperature_2)]
+    if sum(targets) != 1:
+        raise ValueError("Oppgi nøyaktig ett mål: effektivitet eller utløpstemperatur på side 1 eller 2")
+    evaluated = evaluate_input_batch(base)
+    c_1, c_2 = evaluated["c_1"], evaluated["c_2"]
+    t_1, t_2 = base.airstream_1.temperature_c, base.airstream_2.temperature_c
+    if target_effectiveness is not None:
+        effectiveness = np.asarray(target_effectiveness, dtype=float)
+    elif target_outlet_temperature_1 is not None:
+        effectiveness = effectiveness_from_outlet(np.asarray(target_outlet_temperature_1, dtype=float), 1, t_1, t_2, c_1, c_2)
+    else:
+        effectiveness = effectiveness_from_outlet(np.asarray(target_outlet_temperature_2, dtype=float), 2, t_1, t_2, c_1, c_2)
+
+    c_min = np.minimum(c_1, c_2)
+    ntu = required_ntu(
+        effectiveness, c_min / np.maximum(c_1, c_2), base.flow_arrangement,
+        base.effectiveness_backend, base.number_of_passes, c_1 <= c_2
+    )
+    u_value = evaluated["u_value"] if u_value is None else np.asarray(u_value, dtype=float)
+    ua = ntu * c_min
+    area = ua / u_value
+    plate_area = base.exchanger.width * base.exchanger.length
+    return {
+        "effectiveness": effectiveness,
+        "ntu": ntu,
+        "ua": ua,
+        "area": area,
+        "number_of_plates": np.where(np.isfinite(area), np.ceil(np.where(np.isfinite(area), area, 0.0) / plate_area), np.nan),
+        "feasible": np.isfinite(ntu),
+    }
@@ -0,0 +1,270 @@
+from typing import Any, Callable, Dict
+import numpy as np
+from scipy.linalg import solve_banded
+from definitions import ManifoldLayout
+from models import SimulationInput
+from flowcorrelations import DEFAULT_FRICTION, Channel, apparent_friction_factor_array, flow_side_arrays, get_correlation
+from heatecxhanger import PlateHeatExchanger
+from batch import air_property_arrays, evaluate_input_batch
+
+# Standard trykkgjenvinning i innløpsfordeleren og trykktap i utløpsfordeleren, som
+# multiplikatorer på ρ/2 Δ(v^2) (Bernoulli-gjenvinning inn, full impulsbalanse ut)
+MOMENTUM_INLET = 1.0
+MOMENTUM_OUTLET = 2.0
+
+# Minste strømning i en fordeler- eller kanalseksjon; unngår Re = 0 i friksjonskorrelasjonen
+MIN_FLOW = 1e-12
+
+# Antall steg i opptrappingen av impulsleddene (se solve_manifold)
+CONTINUATION_STEPS = 10
+CONTINUATION_TOLERANCE = 1e-3
+
+# Friksjonskorrelasjon for fordelerrørene
+HEADER_FRICTION = "circular-tube"
+
+
+def _pressure_drop(
+    mass_flow_rate, density, dynamic_viscosity, flow_area, hydraulic_diameter, length,
+    developing_flow=False, friction_correlation=DEFAULT_FRICTION, aspect_ratio=0.0
+):
+    """Trykkfallet fra flow_side_arrays uten de øvrige strømningstallene (brukes i Newton-løkken)."""
+    friction = get_correlation("friction", friction_correlation)
+    velocity = mass_flow_rate / (density * flow_area)
+    reynolds = density * velocity * hydraulic_diameter / dynamic_viscosity
+    friction_laminar = apparent_friction_factor_array(reynolds, hydraulic_diameter, length) if developing_flow else None
+    with np.errstate(divide="ignore", invalid="ignore"):
+        f = friction.array(reynolds, Channel(hydraulic_diameter, length, aspect_ratio), friction_laminar)
+    return f * (length / hydraulic_diameter) * (density * velocity**2) / 2
+
+
+def _accumulate(values: np.ndarray, port_first: bool) -> np.ndarray:
+    """
+    Summerer seksjonsverdier fra porten fram til hver kanal. Seksjonen ved porten for kanal 0
+    (hhv. siste kanal) er selve porten og teller ikke med.
+    """
+    values = values.copy()
+    if port_first:
+        values[0] = 0.0
+        return np.cumsum(values)
+    values[-1] = 0.0
+    return np.cumsum(values[::-1])[::-1]
+
+
+def _banded_jacobian(function: Callable[[np.ndarray], np.ndarray], x: np.ndarray) -> np.ndarray:
+    """
+    Tridiagonal Jacobi-matrise på solve_banded-form (3, n) med sentraldifferanser. Hver
+    tredje ukjent forstyrres samtidig, så det trengs seks funksjonskall uansett n.
+    """
+    n = x.size
+    banded = np.zeros((3, n))
+    step = 1e-6 * np.maximum(np.abs(x), 1e-9)
+    for color in range(3):
+        columns = np.arange(color, n, 3)
+        perturbation = np.zeros(n)
+        perturbation[columns] = step[columns]
+        delta = function(x + perturbation) - function(x - perturbation)
+        for band, offset in ((0, -1), (1, 0), (2, 1)):
+            rows = columns + offset
+            valid = (rows >= 0) & (rows < n)
+            banded[band, columns[valid]] = delta[rows[valid]] / (2 * step[columns[valid]])
+    return banded
+
+
+def solve_manifold(
+    total_mass_flow: float,
+    channel_pressure_drop: Callable[[np.ndarray], np.ndarray],
+    header_friction: Callable[[np.ndarray], np.ndarray],
+    n_channels: int,
+    layout: ManifoldLayout,
+    density: float,
+    header_area: float,
+    momentum_inlet: float = MOMENTUM_INLET,
+    momentum_outlet: float = MOMENTUM_OUTLET,
+    tolerance: float = 1e-10,
+    max_iterations: int = 50,
+    continuation_steps: int = CONTINUATION_STEPS
+) -> Dict[str, Any]:
+    """
+    Løser strømningsfordelingen over n_channels parallelle kanaler mellom en innløps- og en
+    utløpsfordeler. channel_pressure_drop(m) og header_friction(F) er elementvise
+    trykkfallsfunksjoner for én kanal og én fordelerseksjon (mellom to nabokanaler).
+    Innløpsfordeleren har porten ved kanal 0; utløpsporten ligger ved kanal 0 (U) eller ved
+    siste kanal (Z). Alle kanaler har samme trykkfall mellom portene:
+        Δp_inn,i + Δp_kanal(m_i) + Δp_ut,i = p_0
+    Ukjente er strømmene F_1..F_{n-1} i innløpsfordeleren (F_i = sum_{k>=i} m_k), slik at
+    massebalansen er oppfylt av seg selv. Differansen mellom to nabokanaler avhenger bare av
+    nabostrømmene, så Newton-systemet er tridiagonalt og hvert steg koster O(n).
+    Med store impulsledd har systemet flere løsninger, så impulskoeffisientene trappes opp
+    fra null (ren friksjon, entydig) i continuation_steps steg med forrige løsning som start.
+    Returnerer channel_mass_flow, inlet_pressure (p_0 = totalt trykkfall), header_pressure_inlet,
+    header_pressure_outlet (relativt utløpsporten), iterations (totalt) og converged.
+    """
+    total = float(total_mass_flow)
+    z_type = layout == ManifoldLayout.Z_TYPE
+    # Dynamisk trykk ρ/2 v^2 = F^2 / (2 ρ A^2) i fordelerne
+    dynamic = 1 / (2 * density * header_area**2)
+
+    def friction(flow):
+        return header_friction(np.maximum(flow, MIN_FLOW))
+
+    def section_flows(inner):
+        flow_in = np.concatenate(([total], inner))
+        # Z-utløpet: seksjonen mellom kanal i og i + 1 fører sum_{k<=i} m_k = M - F_{i+1}
+        flow_out = total - np.append(inner, 0.0) if z_type else flow_in
+        channel = np.maximum(flow_in - np.append(inner, 0.0), MIN_FLOW)
+        return flow_in, flow_out, channel
+
+    def residual(inner, k_in, k_out):
+        # Trykkfall mellom portene i kanal i minus i kanal i - 1, i = 1..n-1
+        flow_in, flow_out, channel = section_flows(inner)
+        squared_in = np.diff(flow_in**2)
+        difference = friction(flow_in[1:]) + k_in * dynamic * squared_in
+        if z_type:
+            difference -= friction(flow_out[:-1]) + k_out * dynamic * np.diff(flow_out**2)
+        else:
+            difference += friction(flow_out[1:]) - k_out * dynamic * squared_in
+        return difference + np.diff(channel_pressure_drop(channel))
+
+    inner = total * (1 - np.arange(1, n_channels) / n_channels)
+    iterations = 0
+    converged = n_channels == 1
+    steps = 1 if momentum_inlet == 0 and momentum_outlet == 0 else continuation_steps + 1
+    for fraction in (np.linspace(0.0, 1.0, steps) if n_channels > 1 else ()):
+        k_in, k_out = fraction * momentum_inlet, fraction * momentum_outlet
+        # Mellomstegene trenger bare å holde løsningen på riktig gren
+        stage_tolerance = tolerance if fraction == 1.0 else max(tolerance, CONTINUATION_TOLERANCE)
+        function = lambda x: residual(x, k_in, k_out)
+        converged = False
+        for _ in range(max_iterations):
+            iterations += 1
+            step = solve_banded((1, 1), _banded_jacobian(function, inner), -function(inner))
+            # Demping slik at ingen kanalstrøm blir negativ
+            channel = section_flows(inner)[2]
+            change = np.concatenate(([0.0], step)) - np.append(step, 0.0)
+            shrinking = change < 0
+            limit = np.min(-0.9 * channel[shrinking] / change[shrinking], initial=1.0)
+            inner = inner + min(1.0, limit) * step
+            if np.max(np.abs(step)) <= stage_tolerance * total:
+                converged = True
+                break
+
+    flow_in, flow_out, channel = section_flows(inner)
+    m = flow_in - np.append(inner, 0.0)
+    drop_in = _accumulate(friction(flow_in), True) - momentum_inlet * dynamic * (total**2 - flow_in**2)
+    rise_out = _accumulate(friction(flow_out), not z_type) + momentum_outlet * dynamic * (total**2 - flow_out**2)
+    p_0 = float(np.mean(drop_in + channel_pressure_drop(channel) + rise_out))
+    return {
+        "channel_mass_flow": m,
+        "inlet_pressure": p_0,
+        "header_pressure_inlet": p_0 - drop_in,
+        "header_pressure_outlet": rise_out,
+        "iterations": iterations,
+        "converged": converged,
+    }
+
+
+def maldistribution(
+    base: SimulationInput,
+    header_diameter_1: float,
+    header_diameter_2: float,
+    layout_1: ManifoldLayout = ManifoldLayout.U_TYPE,
+    layout_2: ManifoldLayout = ManifoldLayout.U_TYPE,
+    momentum_inlet: float = MOMENTUM_INLET,
+    momentum_outlet: float = MOMENTUM_OUTLET,
+    tolerance: float = 1e-10,
+    max_iterations: int = 50,
+    continuation_steps: int = CONTINUATION_STEPS
+) -> Dict[str, Any]:
+    """
+    Strømningsfordeling over kanalene på begge sider og samlet varmeovergang og effektivitet.
+    Fordelerne antas sirkulære med diameter header_diameter_1/2, og seksjonen mellom to
+    nabokanaler på samme side er 2 * (kanalhøyde + platetykkelse) lang. Luftegenskapene tas
+    ved innløpstemperaturen, som i calculate_parameters.
+    Platepakken deles i én delveksler per kanal på side 1; side 2-strømmen interpoleres til
+    samme posisjon i pakken. Hver delveksler får h, U, NTU og ε fra kanalstrømmene sine, og
+    varmestrømmene summeres. Returnerer per side channel_mass_flow_1/2, delta_p_1/2 (trykkfall
+    fra innløps- til utløpsport) og flow_ratio_1/2 ((største - minste kanalstrøm) / middelstrøm),
+    samt h_1/h_2 (arealmidlet), u_value, effectiveness, q_actual, q_uniform (jevn fordeling)
+    og converged.
+    """
+    exchanger = base.exchanger
+    phex = PlateHeatExchanger(**exchanger.model_dump())
+    pitch = 2 * (exchanger.channel_height + exchanger.plate_thickness)
+    channel_area = exchanger.width * exchanger.channel_height
+    sides = {}
+    for side, stream, diameter, layout, n_channels in (
+        (1, base.airstream_1, header_diameter_1, layout_1, phex.number_of_channels_side_1),
+        (2, base.airstream_2, header_diameter_2, layout_2, phex.number_of_channels_side_2),
+    ):
+        air = air_property_arrays(stream.temperature_c, stream.phi, stream.pressure)
+        header_area = np.pi * diameter**2 / 4
+
+        def channel_pressure_drop(m, air=air):
+            return _pressure_drop(
+                m, air["density"], air["dynamic_viscosity"], channel_area, phex.hydraulic_diameter, exchanger.length,
+                base.developing_flow, base.friction_correlation, phex.aspect_ratio
+            )
+
+        def header_friction(flow, air=air, header_area=header_area, diameter=diameter):
+            # Fordelerne er sirkulære rør, ikke plater
+            return _pressure_drop(
+                flow, air["density"], air["dynamic_viscosity"], header_area, diameter, pitch,
+                friction_correlation=HEADER_FRICTION
+            )
+
+        solution = solve_manifold(
+            stream.mass_flow_rate, channel_pressure_drop, header_friction,
+            n_channels, layout, float(air["density"]), header_area,
+            momentum_inlet, momentum_outlet, tolerance, max_iterations, continuation_steps
+        )
+        m = solution["channel_mass_flow"]
+        sides[side] = {
+            "solution": solution,
+            "h": flow_side_arrays(
+                np.maximum(m, MIN_FLOW), air["density"], air["dynamic_viscosity"], air["specific_heat_capacity"],
+                air["thermal_conductivity"], channel_area, phex.hydraulic_diameter, exchanger.length, base.developing_flow,
+                base.nusselt_correlation, base.friction_correlation, phex.aspect_ratio
+            )["heat_transfer_coefficient"],
+            "cp": float(air["specific_heat_capacity"]),
+        }
+
+    m_1 = sides[1]["solution"]["channel_mass_flow"]
+    m_2 = sides[2]["solution"]["channel_mass_flow"]
+    n_1, n_2 = m_1.size, m_2.size
+    position_1 = (np.arange(n_1) + 0.5) / n_1
+    position_2 = (np.arange(n_2) + 0.5) / n_2
+    # Side 2 fordelt på delvekslerne langs side 1, skalert slik at totalstrømmen bevares
+    m_2_paired = np.interp(position_1, position_2, m_2)
+    m_2_paired *= m_2.sum() / m_2_paired.sum()
+    h_2_paired = np.interp(position_1, position_2, sides[2]["h"])
+    h_1 = sides[1]["h"]
+
+    area = phex.area_heat_1 / n_1
+    u_local = 1 / (1 / h_1 + exchanger.plate_thickness / exchanger.thermal_conductivity_plate + 1 / h_2_paired)
+    c_1 = m_1 * sides[1]["cp"]
+    c_2 = m_2_paired * sides[2]["cp"]
+    c_min, c_max = np.minimum(c_1, c_2), np.maximum(c_1, c_2)
+    effectiveness_local = PlateHeatExchanger.effectiveness_array(
+        u_local * area / c_min, c_min / c_max, base.flow_arrangement,
+        base.effectiveness_backend, base.number_of_passes, c_1 <= c_2
+    )
+    delta_t = abs(base.airstream_1.temperature_c - base.airstream_2.temperature_c)
+    q_actual = float(np.sum(effectiveness_local * c_min * delta_t))
+
+    uniform = evaluate_input_batch(base)
+    result = {}
+    for side, m in ((1, m_1), (2, m_2)):
+        solution = sides[side]["solution"]
+        result["channel_mass_flow_" + str(side)] = m
+        result["delta_p_" + str(side)] = solution["inlet_pressure"]
+        result["flow_ratio_" + str(side)] = float((m.max() - m.min()) / m.mean())
+    result.update(
+        h_1=float(np.mean(h_1)),
+        h_2=float(np.mean(sides[2]["h"])),
+        u_value=float(np.mean(u_local)),
+        effectiveness=q_actual / (float(uniform["c_min"]) * delta_t),
+        q_actual=q_actual,
+        q_uniform=float(uniform["q_actual"]),
+        converged=bool(sides[1]["solution"]["converged"] and sides[2]["solution"]["converged"]),
+    )
+    return result
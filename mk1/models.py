@@ -1,5 +1,6 @@
-from pydantic import BaseModel
-from definitions import FlowArrangement
+from pydantic import BaseModel, field_validator
+from definitions import EffectivenessBackend, FlowArrangement
+from flowcorrelations import DEFAULT_FRICTION, DEFAULT_NUSSELT, get_correlation
 
 class AirStreamInput(BaseModel):
     mass_flow_rate: float
@@ -75,6 +76,24 @@ class SimulationInput(BaseModel):
     airstream_2: AirStreamInput
     exchanger: ExchangerInput
     flow_arrangement: FlowArrangement
+    effectiveness_backend: EffectivenessBackend = EffectivenessBackend.CORRELATION
+    # Antall pass på side 2 (brukes av FlowArrangement.COUNTER_CROSS_FLOW)
+    number_of_passes: int = 1
+    # Innløpsområdets korrelasjoner (utviklende strømning) for laminær Nu og friksjonsfaktor
+    developing_flow: bool = False
+    # Navn i korrelasjonsregisteret (flowcorrelations.NUSSELT_CORRELATIONS/FRICTION_CORRELATIONS)
+    nusselt_correlation: str = DEFAULT_NUSSELT
+    friction_correlation: str = DEFAULT_FRICTION
+
+    @field_validator("nusselt_correlation")
+    @classmethod
+    def _known_nusselt(cls, value: str) -> str:
+        return get_correlation("nusselt", value).name
+
+    @field_validator("friction_correlation")
+    @classmethod
+    def _known_friction(cls, value: str) -> str:
+        return get_correlation("friction", value).name
 
 class SimulationResult(BaseModel):
     airstream_1: AirStreamInput
@@ -1,6 +1,8 @@
-from typing import Any, Dict
+from typing import Any, Dict, Sequence
 from pydantic import BaseModel, Field
 import math
+import numpy as np
+from solvers import safeguarded_newton
 
 class AirStreamInputModel(BaseModel):
     mass_flow_rate: float = Field(
@@ -73,12 +75,67 @@ class AirProperties:
         relative_humidity = p_w / p_ws if p_ws > 0 else 0.0
         return AirProperties(temperature_c=temperature_c, relative_humidity=relative_humidity, pressure=pressure)
 
+    @staticmethod
+    def from_dew_point(temperature_c: float, dew_point: float, pressure: float) -> 'AirProperties':
+        """Opprett AirProperties fra temperatur (C), duggpunkt (C) og trykk (Pa)."""
+        if dew_point > temperature_c:
+            raise ValueError("Duggpunktet kan ikke være høyere enn temperaturen")
+        relative_humidity = AirProperties.calc_relative_humidity_from_dew_point(temperature_c, dew_point)
+        return AirProperties(temperature_c=temperature_c, relative_humidity=relative_humidity, pressure=pressure)
+
+    @staticmethod
+    def from_wet_bulb(temperature_c: float, wet_bulb: float, pressure: float) -> 'AirProperties':
+        """Opprett AirProperties fra temperatur (C), våttemperatur (C) og trykk (Pa)."""
+        if wet_bulb > temperature_c:
+            raise ValueError("Våttemperaturen kan ikke være høyere enn temperaturen")
+        x = AirProperties.calc_humidity_ratio_from_wet_bulb(temperature_c, wet_bulb, pressure)
+        if x < 0:
+            raise ValueError("Våttemperaturen er for lav for denne temperaturen (negativt fuktighetsforhold)")
+        relative_humidity = AirProperties.calc_relative_humidity(temperature_c, x, pressure)
+        return AirProperties(temperature_c=temperature_c, relative_humidity=relative_humidity, pressure=pressure)
+
+    @staticmethod
+    def from_enthalpy_x(enthalpy: float, humidity_ratio: float, pressure: float) -> 'AirProperties':
+        """Opprett AirProperties fra entalpi (J/kg tørr luft), fuktighetsforhold og trykk (Pa)."""
+        temperature_c = AirProperties.calc_temperature_from_enthalpy(enthalpy, humidity_ratio)
+        relative_humidity = AirProperties.calc_relative_humidity(temperature_c, humidity_ratio, pressure)
+        return AirProperties(temperature_c=temperature_c, relative_humidity=relative_humidity, pressure=pressure)
+
+    # Array-varianter av konstruktørene over: returnerer inndataene til AirProperties
+    # (temperature_c, relative_humidity, pressure) pluss humidity_ratio som arrays, klare for
+    # batch.air_property_arrays eller airstream_*-kolonnene i evaluate_batch. Ugyldige
+    # kombinasjoner (duggpunkt/våttemperatur over temperaturen, negativ x) gir nan.
+
+    @staticmethod
+    def from_dew_point_array(temperature_c, dew_point, pressure) -> Dict[str, Any]:
+        temperature_c, dew_point, pressure = np.broadcast_arrays(*[np.asarray(v, dtype=float) for v in (temperature_c, dew_point, pressure)])
+        relative_humidity = np.where(
+            dew_point <= temperature_c, AirProperties.calc_relative_humidity_from_dew_point(temperature_c, dew_point), np.nan
+        )
+        x = AirProperties.calc_humidity_ratio(relative_humidity * AirProperties.calc_saturation_vapor_pressure(temperature_c), pressure)
+        return {"temperature_c": temperature_c, "relative_humidity": relative_humidity, "humidity_ratio": x, "pressure": pressure}
+
+    @staticmethod
+    def from_wet_bulb_array(temperature_c, wet_bulb, pressure) -> Dict[str, Any]:
+        temperature_c, wet_bulb, pressure = np.broadcast_arrays(*[np.asarray(v, dtype=float) for v in (temperature_c, wet_bulb, pressure)])
+        x = AirProperties.calc_humidity_ratio_from_wet_bulb(temperature_c, wet_bulb, pressure)
+        x = np.where((wet_bulb <= temperature_c) & (x >= 0), x, np.nan)
+        relative_humidity = AirProperties.calc_relative_humidity(temperature_c, x, pressure)
+        return {"temperature_c": temperature_c, "relative_humidity": relative_humidity, "humidity_ratio": x, "pressure": pressure}
+
+    @staticmethod
+    def from_enthalpy_x_array(enthalpy, humidity_ratio, pressure) -> Dict[str, Any]:
+        enthalpy, x, pressure = np.broadcast_arrays(*[np.asarray(v, dtype=float) for v in (enthalpy, humidity_ratio, pressure)])
+        temperature_c = AirProperties.calc_temperature_from_enthalpy(enthalpy, x)
+        relative_humidity = AirProperties.calc_relative_humidity(temperature_c, x, pressure)
+        return {"temperature_c": temperature_c, "relative_humidity": relative_humidity, "humidity_ratio": x, "pressure": pressure}
+
     @staticmethod
     def from_dict(data: Dict[str, Any]) -> 'AirProperties':
         """Lag AirProperties fra dict eller Pydantic-modell."""
         return AirProperties(
             temperature_c=data["temperature_c"],
-            relative_humidity=data["relative_humidity"],
+            relative_humidity=data["relative_humidity"] if "relative_humidity" in data else data["phi"],
             pressure=data["pressure"]
         )
 
@@ -98,6 +155,49 @@ class AirProperties:
         p_da = pressure - p_w
         return 0.622 * p_w / p_da
 
+    @staticmethod
+    def calc_relative_humidity(temperature_c: float, x: float, pressure: float) -> float:
+        """Relativ fuktighet (0-1) fra temperatur, fuktighetsforhold og trykk; inversen av calc_humidity_ratio."""
+        p_w = pressure * x / (0.622 + x)
+        return p_w / AirProperties.calc_saturation_vapor_pressure(temperature_c)
+
+    @staticmethod
+    def calc_relative_humidity_from_dew_point(temperature_c: float, dew_point: float) -> float:
+        """Relativ fuktighet fra duggpunkt: p_w er metningstrykket ved duggpunktet (invers av calc_dew_point)."""
+        return AirProperties.calc_saturation_vapor_pressure(dew_point) / AirProperties.calc_saturation_vapor_pressure(temperature_c)
+
+    @staticmethod
+    def calc_humidity_ratio_from_wet_bulb(temperature_c: float, wet_bulb: float, pressure: float) -> float:
+        """
+        Fuktighetsforhold fra våttemperatur (adiabatisk metning), med entalpimodellen i calc_enthalpy
+        og vann tilført ved våttemperaturen (4186 J/kgK):
+            h(T, x) + (x_s - x) c_w T_wb = h(T_wb, x_s),  x_s = x ved metning og T_wb.
+        Likningen er lineær i x og løses eksplisitt.
+        """
+        c_w = 4186.0
+        x_s = AirProperties.calc_humidity_ratio(AirProperties.calc_saturation_vapor_pressure(wet_bulb), pressure)
+        h_wb = AirProperties.calc_enthalpy(wet_bulb, x_s)
+        return (h_wb - 1005.0 * temperature_c - x_s * c_w * wet_bulb) / (2501000 + 1860 * temperature_c - c_w * wet_bulb)
+
+    @staticmethod
+    def calc_wet_bulb_temperature(temperature_c, x, pressure, tolerance: float = 1e-9, max_iterations: int = 50):
+        """
+        Våttemperatur (°C) fra temperatur, fuktighetsforhold og trykk, vektorisert.
+        calc_humidity_ratio_from_wet_bulb er stigende i T_wb, og roten ligger mellom T - 100 og T;
+        den finnes med sikret Newton (steg utenfor intervallet erstattes av halvering).
+        """
+        temperature_c, x, pressure = np.broadcast_arrays(*[np.asarray(v, dtype=float) for v in (temperature_c, x, pressure)])
+        flat_t, flat_x, flat_p = [v.reshape(-1) for v in (temperature_c, x, pressure)]
+        residual = lambda t_wb, rows: AirProperties.calc_humidity_ratio_from_wet_bulb(flat_t[rows], t_wb, flat_p[rows]) - flat_x[rows]
+        derivative = lambda t_wb, r, rows, step=1e-5: (residual(t_wb + step, rows) - residual(t_wb - step, rows)) / (2 * step)
+        lower, upper = temperature_c - 100.0, temperature_c
+        # Startverdi: våttemperaturen ligger mellom duggpunktet og T, typisk nærmere T
+        dew_point = AirProperties.calc_dew_point_array(pressure * x / (0.622 + x))
+        t_wb = 0.6 * temperature_c + 0.4 * dew_point
+        t_wb = np.where(np.isfinite(t_wb) & (t_wb > lower) & (t_wb < upper), t_wb, temperature_c - 1.0)
+        t_wb, _, _ = safeguarded_newton(residual, derivative, lower, upper, t_wb, tolerance, max_iterations)
+        return t_wb
+
     @staticmethod
     def calc_density(pressure: float, temperature_c: float, x: float) -> float:
         """Beregner tetthet (kg/m³) for fuktig luft."""
@@ -135,6 +235,22 @@ class AirProperties:
         h_v = 2501000 + 1860 * temperature_c
         return h_da + x * h_v
 
+    @staticmethod
+    def calc_temperature_from_enthalpy(enthalpy: float, x: float) -> float:
+        """
+        Inversen av calc_enthalpy: temperatur (°C) fra entalpi (J/kg tørr luft) og
+        fuktighetsforhold. Entalpien er lineær i T for gitt x, så inversen er eksakt.
+        """
+        cp_da = 1005.0
+        return (enthalpy - 2501000 * x) / (cp_da + 1860 * x)
+
+    @staticmethod
+    def calc_dew_point_array(p_w):
+        """Vektorisert calc_dew_point (nan der p_w <= 0)."""
+        with np.errstate(divide="ignore", invalid="ignore"):
+            log_ratio = np.log(np.where(p_w > 0, p_w, np.nan) / AirProperties.P_WS_0)
+        return AirProperties.TETENS_B * log_ratio / (AirProperties.TETENS_A - log_ratio)
+
     @staticmethod
     def calc_dew_point(p_w: float) -> float:
         """Beregner duggpunkt (°C) fra partialtrykk vanndamp (Pa)."""
@@ -244,6 +360,107 @@ class AirStream:
         """Duggpunkt (°C) for denne strømmen."""
         return self.air.dew_point
 
+    @staticmethod
+    def mix(streams: Sequence['AirStream']) -> 'AirStream':
+        """Adiabatisk blanding av luftstrømmer (se mix_arrays); eventuelt kondensat følger ikke med strømmen."""
+        mixed = mix_arrays(
+            [s.mass_flow_rate for s in streams],
+            [s.temperature_c for s in streams],
+            [s.humidity_ratio for s in streams],
+            [s.pressure for s in streams]
+        )
+        air = AirProperties.from_temp_pressure_x(
+            float(mixed["temperature_c"]), float(mixed["pressure"]), float(mixed["humidity_ratio"])
+        )
+        return AirStream(mass_flow_rate=float(mixed["mass_flow_rate"]), air_properties=air)
+
+    # Korte navn brukt av heatecxhanger og report
+    @property
+    def m_dot(self) -> float:
+        return self.mass_flow_rate
+    @property
+    def phi(self) -> float:
+        return self.relative_humidity
+    @property
+    def rho(self) -> float:
+        return self.density
+    @property
+    def cp(self) -> float:
+        return self.specific_heat_capacity
+    @property
+    def k(self) -> float:
+        return self.thermal_conductivity
+
+def mix_arrays(
+    mass_flow_rates, temperatures_c, humidity_ratios, pressures, axis: int = 0,
+    tolerance: float = 1e-9, max_iterations: int = 50
+) -> Dict[str, Any]:
+    """
+    Adiabatisk blanding av N strømmer med masse-, fukt- og entalpibalanse, vektorisert.
+    Strømmene ligger langs axis (lister med én verdi/array per strøm går også); de øvrige
+    aksene kringkastes, f.eks. timer x spjeldstillinger i bypass-studier. mass_flow_rates er
+    fuktig luft; fuktighetsforhold og entalpi (per kg tørr luft) vektes med tørrluftstrømmen
+    m / (1 + x). Temperaturen finnes fra blandingens entalpi med calc_temperature_from_enthalpy;
+    trykket er massevektet middel.
+    Blir blandingen overmettet (f.eks. mettet kald og varm luft), skilles overskuddsvannet ut
+    som tåke/kondensat ved blandingstemperaturen (4186 J/kgK, som i
+    calc_humidity_ratio_from_wet_bulb): luften blir mettet, og temperaturen løser
+    h(T, x_s(T)) + (x - x_s(T)) c_w T = h_blanding med sikret Newton mellom den overmettede
+    temperaturen og duggpunktet.
+    Returnerer mass_flow_rate (luften, uten kondensatet), temperature_c, humidity_ratio,
+    pressure, enthalpy (luften), condensate (kg/s vann skilt ut) og saturated (bool)
+    (tilstanden er nan der total massestrøm er 0).
+    """
+    c_w = 4186.0
+    arguments = (mass_flow_rates, temperatures_c, humidity_ratios, pressures)
+    # Lister stables langs axis etter at alle elementene er kringkastet til felles form
+    shape = np.broadcast_shapes(*[np.shape(v) for values in arguments if isinstance(values, (list, tuple)) for v in values])
+
+    def stack(values):
+        if isinstance(values, (list, tuple)):
+            return np.stack([np.broadcast_to(np.asarray(v, dtype=float), shape) for v in values], axis=axis)
+        return np.asarray(values, dtype=float)
+
+    m, t, x, p = np.broadcast_arrays(*[stack(v) for v in arguments])
+    dry = m / (1 + x)
+    mass = np.sum(m, axis=axis)
+    dry_mass = np.sum(dry, axis=axis)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        weight = lambda values, w, total: np.sum(w * values, axis=axis) / np.where(total > 0, total, np.nan)
+        humidity_ratio = weight(x, dry, dry_mass)
+        enthalpy = weight(AirProperties.calc_enthalpy(t, x), dry, dry_mass)
+        pressure = weight(p, m, mass)
+        temperature = AirProperties.calc_temperature_from_enthalpy(enthalpy, humidity_ratio)
+        saturation = lambda temperature_c: AirProperties.calc_humidity_ratio(
+            AirProperties.calc_saturation_vapor_pressure(temperature_c), pressure
+        )
+        saturated = humidity_ratio > saturation(temperature)
+        if np.any(saturated):
+            # Restfunksjonen er stigende i T, negativ ved den overmettede temperaturen og
+            # positiv ved duggpunktet (der x_s = x)
+            flat_x, flat_h, flat_p = [np.broadcast_to(v, saturated.shape).reshape(-1) for v in (humidity_ratio, enthalpy, pressure)]
+
+            def residual(temperature_c, rows):
+                x_s = AirProperties.calc_humidity_ratio(AirProperties.calc_saturation_vapor_pressure(temperature_c), flat_p[rows])
+                return AirProperties.calc_enthalpy(temperature_c, x_s) + (flat_x[rows] - x_s) * c_w * temperature_c - flat_h[rows]
+
+            derivative = lambda t, r, rows, step=1e-5: (residual(t + step, rows) - residual(t - step, rows)) / (2 * step)
+            upper = np.where(saturated, AirProperties.calc_dew_point_array(pressure * humidity_ratio / (0.622 + humidity_ratio)), temperature)
+            fogged, _, _ = safeguarded_newton(
+                residual, derivative, temperature, upper, temperature, tolerance, max_iterations, active=saturated
+            )
+            temperature = np.where(saturated, fogged, temperature)
+        humidity_out = np.where(saturated, saturation(temperature), humidity_ratio)
+        return {
+            "mass_flow_rate": np.where(saturated, dry_mass * (1 + humidity_out), mass),
+            "temperature_c": temperature,
+            "humidity_ratio": humidity_out,
+            "pressure": pressure,
+            "enthalpy": AirProperties.calc_enthalpy(temperature, humidity_out),
+            "condensate": np.where(saturated, dry_mass * (humidity_ratio - humidity_out), 0.0),
+            "saturated": saturated,
+        }
+
 if __name__ == "__main__":  
     """Eksempel på bruk av AirStreamInputModel som input og AirStream/AirStreamModel for resultat.
     Sammenligner med reelle verdier for fuktig luft (kilde: standardtabeller)."""
@@ -0,0 +1,140 @@
+import time
+from typing import Any, Dict, Mapping, Optional
+import numpy as np
+from definitions import FlowArrangement
+from models import SimulationInput
+from moistair import AirProperties
+from flowcorrelations import RE_LAMINAR, RE_TURBULENT
+from batch import air_property_arrays, columns_from_input, evaluate_batch, select_rows
+from condensation import WET_DRY_ARRANGEMENTS, wet_dry_cells
+from counterflow import counter_flow_bvp
+
+# Nivåene i evaluate_multifidelity, kodet som indeks (som FLOW_REGIMES)
+FIDELITY_LEVELS = ("epsilon-ntu", "counter-flow-bvp", "wet-dry-cells")
+
+# Grenser for feilindikatorene: en indikator lik grensen gir score 1, og score > 1 eskalerer
+PROPERTY_VARIATION_LIMIT = 0.15   # Relativ endring i viskositet, varmeledning og tetthet mellom innløpstemperaturene
+REGIME_MARGIN = 0.1               # Relativ avstand (i ln Re) til RE_LAMINAR/RE_TURBULENT
+REGIME_SCORE_MAX = 10.0           # Score inne i overgangsområdet
+NTU_LIMIT = 4.0                   # Over dette er korrelasjonen for kryssstrøm og antagelsen om konstante egenskaper mest følsom
+CONDENSATION_SCALE = 5.0          # [K] score 1 når duggpunktet på varm side er lik kald innløpstemperatur
+
+
+def error_indicators(columns: Mapping[str, Any], evaluated: Mapping[str, Any]) -> Dict[str, np.ndarray]:
+    """
+    Skalerte feilindikatorer for ε-NTU-resultatet (1 ved grensen, større er mer usikkert):
+    property_variation (egenskapsendring over temperaturspennet), regime (nærhet til
+    regimegrensene, REGIME_SCORE_MAX inne i overgangsområdet), ntu og condensation
+    (1 + (duggpunkt på varm side - kald innløpstemperatur) / CONDENSATION_SCALE, minst 0; over 1
+    kan den varme strømmen kondensere).
+    """
+    t_1 = np.asarray(columns["airstream_1.temperature_c"], dtype=float)
+    t_2 = np.asarray(columns["airstream_2.temperature_c"], dtype=float)
+    variation = 0.0
+    for side, t_own, t_other in (("1", t_1, t_2), ("2", t_2, t_1)):
+        pressure = columns[f"airstream_{side}.pressure"]
+        x = air_property_arrays(t_own, columns[f"airstream_{side}.phi"], pressure)["humidity_ratio"]
+        for name, prop in (
+            ("dynamic_viscosity", AirProperties.calc_dynamic_viscosity),
+            ("thermal_conductivity", AirProperties.calc_thermal_conductivity),
+        ):
+            variation = np.maximum(variation, np.abs(prop(t_other) / prop(t_own) - 1))
+        density = AirProperties.calc_density(pressure, t_other, x) / AirProperties.calc_density(pressure, t_own, x)
+        variation = np.maximum(variation, np.abs(density - 1))
+
+    regime = 0.0
+    for side in ("1", "2"):
+        re = np.asarray(evaluated["re_" + side], dtype=float)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            distance = np.minimum(np.abs(np.log(re / RE_LAMINAR)), np.abs(np.log(re / RE_TURBULENT)))
+        distance = np.where((re >= RE_LAMINAR) & (re <= RE_TURBULENT), 0.0, distance)
+        regime = np.maximum(regime, REGIME_MARGIN / np.maximum(distance, REGIME_MARGIN / REGIME_SCORE_MAX))
+
+    warm = t_1 >= t_2
+    p_w = {
+        side: AirProperties.calc_vapor_partial_pressure(
+            np.asarray(columns[f"airstream_{side}.phi"], dtype=float),
+            AirProperties.calc_saturation_vapor_pressure(np.asarray(columns[f"airstream_{side}.temperature_c"], dtype=float))
+        )
+        for side in ("1", "2")
+    }
+    dew_point_warm = AirProperties.calc_dew_point_array(np.where(warm, p_w["1"], p_w["2"]))
+    condensation = np.maximum(np.nan_to_num(1 + (dew_point_warm - np.where(warm, t_2, t_1)) / CONDENSATION_SCALE, nan=0.0), 0.0)
+    return {
+        "property_variation": variation / PROPERTY_VARIATION_LIMIT,
+        "regime": regime,
+        "ntu": np.asarray(evaluated["ntu"], dtype=float) / NTU_LIMIT,
+        "condensation": condensation,
+    }
+
+
+def evaluate_multifidelity(
+    base: SimulationInput,
+    overrides: Optional[Mapping[str, Any]] = None,
+    rank_by: str = "effectiveness",
+    top: int = 0
+) -> Dict[str, Any]:
+    """
+    Evaluerer alle kandidatene med ε-NTU (evaluate_batch), og kjører en detaljert løser bare
+    for radene der en feilindikator (error_indicators) er over 1, samt de top beste radene
+    etter rank_by (høyest først). Detaljert løser per rad:
+      - wet_dry_cells der kondensasjon er mulig (motstrøm og kryssstrøm),
+      - ellers counter_flow_bvp for motstrøm og wet_dry_cells (diskretisert) for kryssstrøm.
+    Øvrige arrangementer har ingen detaljert løser og beholder ε-NTU.
+    Returnerer temperature_out_1/2, q_actual (alltid positiv, inkl. latent varme fra
+    wet_dry_cells) og effectiveness (følbar varme / q_max, som i evaluate_batch), fidelity (indeks i FIDELITY_LEVELS),
+    error_score (største indikator), indicators, escalated og timing ({nivå: sekunder}).
+    """
+    columns = columns_from_input(base)
+    columns.update(overrides or {})
+    timing = {name: 0.0 for name in FIDELITY_LEVELS}
+    start = time.perf_counter()
+    evaluated = evaluate_batch(columns, base.flow_arrangement, base.effectiveness_backend, base.number_of_passes)
+    t_1 = np.asarray(columns["airstream_1.temperature_c"], dtype=float)
+    t_2 = np.asarray(columns["airstream_2.temperature_c"], dtype=float)
+    q = np.asarray(evaluated["q_actual"], dtype=float)
+    shape = q.shape
+    direction = np.sign(t_1 - t_2)
+    result = {
+        "temperature_out_1": np.broadcast_to(t_1 - direction * q / evaluated["c_1"], shape).copy(),
+        "temperature_out_2": np.broadcast_to(t_2 + direction * q / evaluated["c_2"], shape).copy(),
+        "q_actual": q.copy(),
+        "effectiveness": np.asarray(evaluated["effectiveness"], dtype=float).copy(),
+    }
+    indicators = {name: np.broadcast_to(value, shape) for name, value in error_indicators(columns, evaluated).items()}
+    error_score = np.max(np.stack(list(indicators.values())), axis=0)
+    escalated = error_score > 1
+    if top > 0:
+        ranking = np.argsort(-np.nan_to_num(np.broadcast_to(evaluated[rank_by], shape).reshape(-1), nan=-np.inf), kind="stable")
+        escalated.reshape(-1)[ranking[:top]] = True
+    timing["epsilon-ntu"] = time.perf_counter() - start
+
+    fidelity = np.zeros(shape, dtype=np.int64)
+    if base.flow_arrangement in WET_DRY_ARRANGEMENTS:
+        wet = escalated & (indicators["condensation"] > 1)
+        if base.flow_arrangement == FlowArrangement.COUNTER_FLOW:
+            tiers = (("counter-flow-bvp", counter_flow_bvp, escalated & ~wet), ("wet-dry-cells", wet_dry_cells, wet))
+        else:
+            tiers = (("wet-dry-cells", wet_dry_cells, escalated),)
+        q_max = np.broadcast_to(evaluated["q_max"], shape).reshape(-1)
+        for name, solver, selected in tiers:
+            rows = np.flatnonzero(selected)
+            if not rows.size:
+                continue
+            start = time.perf_counter()
+            detailed = solver(base, select_rows(columns, shape, rows))
+            for key in ("temperature_out_1", "temperature_out_2"):
+                result[key].reshape(-1)[rows] = detailed[key]
+            result["q_actual"].reshape(-1)[rows] = np.abs(detailed["q_actual"])
+            with np.errstate(divide="ignore", invalid="ignore"):
+                result["effectiveness"].reshape(-1)[rows] = np.abs(detailed.get("q_sensible", detailed["q_actual"])) / q_max[rows]
+            fidelity.reshape(-1)[rows] = FIDELITY_LEVELS.index(name)
+            timing[name] = time.perf_counter() - start
+    return {
+        **result,
+        "fidelity": fidelity,
+        "error_score": error_score,
+        "indicators": indicators,
+        "escalated": escalated,
+        "timing": timing,
+    }
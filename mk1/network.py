@@ -0,0 +1,312 @@
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+import numpy as np
+from definitions import EffectivenessBackend, FlowArrangement
+from flowcorrelations import DEFAULT_FRICTION, DEFAULT_NUSSELT
+from moistair import AirProperties, mix_arrays
+from heatecxhanger import PlateHeatExchanger
+from batch import EXCHANGER_FIELDS, evaluate_batch
+
+# Tilstanden til en luftstrøm (kant i nettverket): dict med disse nøklene, verdiene er
+# skalarer eller arrays over tidssteg som lar seg kringkaste mot hverandre.
+STATE_FIELDS = ("mass_flow_rate", "temperature_c", "humidity_ratio", "pressure")
+
+# Absolutt del av konvergenskravet per felt (se Network.solve)
+STATE_SCALES = {"mass_flow_rate": 1e-3, "temperature_c": 1.0, "humidity_ratio": 1e-3, "pressure": 1.0}
+
+
+def outlet_temperatures(q_actual, temperature_1, temperature_2, c_1, c_2) -> Tuple[Any, Any]:
+    """
+    Utløpstemperaturer fra ε-NTU-resultatet. q_actual er alltid positiv og går fra den
+    varme til den kalde siden; side uten strømning (C = 0) beholder innløpstemperaturen.
+    """
+    sign = np.sign(temperature_1 - temperature_2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out_1 = np.where(c_1 > 0, temperature_1 - sign * q_actual / c_1, temperature_1)
+        out_2 = np.where(c_2 > 0, temperature_2 + sign * q_actual / c_2, temperature_2)
+    return out_1, out_2
+
+
+class Unit(ABC):
+    """
+    Node i nettverket. inlets/outlets er navn på kantene (luftstrømmene) enheten leser og
+    skriver. evaluate får tilstandene til innløpene og returnerer tilstandene til utløpene;
+    underklasser må implementere den (ellers feiler opprettelsen).
+    """
+    inlets: Tuple[str, ...] = ()
+    outlets: Tuple[str, ...] = ()
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    @abstractmethod
+    def evaluate(self, states: Mapping[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        ...
+
+
+class Source(Unit):
+    """Randbetingelse: en luftstrøm inn i nettverket (f.eks. uteluft eller avtrekk per time)."""
+
+    def __init__(self, name: str, outlet: str, mass_flow_rate, temperature_c, phi, pressure=101325.0) -> None:
+        super().__init__(name)
+        self.outlets = (outlet,)
+        self.state = {
+            "mass_flow_rate": np.asarray(mass_flow_rate, dtype=float),
+            "temperature_c": np.asarray(temperature_c, dtype=float),
+            "humidity_ratio": AirProperties.calc_humidity_ratio(
+                np.asarray(phi, dtype=float) * AirProperties.calc_saturation_vapor_pressure(np.asarray(temperature_c, dtype=float)),
+                np.asarray(pressure, dtype=float)
+            ),
+            "pressure": np.asarray(pressure, dtype=float),
+        }
+
+    def evaluate(self, states):
+        return {self.outlets[0]: self.state}
+
+
+class Splitter(Unit):
+    """
+    Deler én strøm i flere med samme tilstand (spjeld/bypass). fractions gir andelen til
+    hvert utløp unntatt det siste, som får resten; andelene kan være arrays over tidssteg.
+    """
+
+    def __init__(self, name: str, inlet: str, outlets: Sequence[str], fractions: Sequence[Any]) -> None:
+        super().__init__(name)
+        if len(outlets) < 2 or len(fractions) != len(outlets) - 1:
+            raise ValueError("En splitter trenger minst to utløp og én andel per utløp unntatt det siste")
+        self.inlets = (inlet,)
+        self.outlets = tuple(outlets)
+        self.fractions = [np.asarray(f, dtype=float) for f in fractions]
+
+    def evaluate(self, states):
+        inlet = states[self.inlets[0]]
+        fractions = self.fractions + [1 - sum(self.fractions)]
+        return {outlet: {**inlet, "mass_flow_rate": inlet["mass_flow_rate"] * f} for outlet, f in zip(self.outlets, fractions)}
+
+
+class Mixer(Unit):
+    """
+    Blander strømmer adiabatisk med moistair.mix_arrays (masse-, fukt- og entalpibalanse).
+    Vann som skilles ut ved overmetning forlater nettverket; condensate og saturated fra
+    siste evaluering lagres i results.
+    """
+
+    def __init__(self, name: str, inlets: Sequence[str], outlet: str) -> None:
+        super().__init__(name)
+        if len(inlets) < 2:
+            raise ValueError("En mikser trenger minst to innløp")
+        self.inlets = tuple(inlets)
+        self.outlets = (outlet,)
+        self.results: Dict[str, np.ndarray] = {}
+
+    def evaluate(self, states):
+        streams = [states[name] for name in self.inlets]
+        mixed = mix_arrays(*[[s[key] for s in streams] for key in STATE_FIELDS])
+        self.results = {"condensate": mixed["condensate"], "saturated": mixed["saturated"]}
+        mass = mixed["mass_flow_rate"]
+        # Ingen strømning: behold tilstanden til første innløp
+        return {self.outlets[0]: {key: np.where(mass > 0, mixed[key], streams[0][key]) for key in STATE_FIELDS}}
+
+
+class ExchangerUnit(Unit):
+    """
+    Platevarmeveksler i nettverket, beregnet med evaluate_batch (tørr varmeoverføring:
+    fuktighetsforhold og trykk går uendret gjennom; trykkfallet rapporteres i results).
+    Siste resultat fra evaluate_batch lagres i results.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        exchanger: PlateHeatExchanger,
+        inlet_1: str,
+        inlet_2: str,
+        outlet_1: str,
+        outlet_2: str,
+        flow_arrangement: FlowArrangement = FlowArrangement.COUNTER_FLOW,
+        effectiveness_backend: EffectivenessBackend = EffectivenessBackend.CORRELATION,
+        number_of_passes: int = 1,
+        developing_flow: bool = False,
+        nusselt_correlation: str = DEFAULT_NUSSELT,
+        friction_correlation: str = DEFAULT_FRICTION
+    ) -> None:
+        super().__init__(name)
+        self.inlets = (inlet_1, inlet_2)
+        self.outlets = (outlet_1, outlet_2)
+        self.flow_arrangement = flow_arrangement
+        self.effectiveness_backend = effectiveness_backend
+        self.number_of_passes = number_of_passes
+        self.options = {
+            "developing_flow": developing_flow,
+            "nusselt_correlation": nusselt_correlation,
+            "friction_correlation": friction_correlation,
+        }
+        self.geometry = {f"exchanger.{name}": getattr(exchanger, name) for name in EXCHANGER_FIELDS}
+        self.results: Dict[str, np.ndarray] = {}
+
+    def evaluate(self, states):
+        columns = dict(self.geometry)
+        columns.update(self.options)
+        for side, name in zip(("1", "2"), self.inlets):
+            s = states[name]
+            columns[f"airstream_{side}.mass_flow_rate"] = s["mass_flow_rate"]
+            columns[f"airstream_{side}.temperature_c"] = s["temperature_c"]
+            columns[f"airstream_{side}.phi"] = AirProperties.calc_relative_humidity(s["temperature_c"], s["humidity_ratio"], s["pressure"])
+            columns[f"airstream_{side}.pressure"] = s["pressure"]
+        self.results = evaluate_batch(columns, self.flow_arrangement, self.effectiveness_backend, self.number_of_passes)
+        s_1, s_2 = states[self.inlets[0]], states[self.inlets[1]]
+        out_1, out_2 = outlet_temperatures(
+            self.results["q_actual"], s_1["temperature_c"], s_2["temperature_c"], self.results["c_1"], self.results["c_2"]
+        )
+        return {self.outlets[0]: {**s_1, "temperature_c": out_1}, self.outlets[1]: {**s_2, "temperature_c": out_2}}
+
+
+class Network:
+    """
+    Nettverk av enheter (vekslere, miksere, splittere, kilder) koblet med navngitte
+    luftstrømmer. Hver strøm skrives av nøyaktig én enhet og leses av høyst én; strømmer
+    som ingen leser er nettverkets utløp.
+    Rekkefølgen bestemmes én gang: enheter beregnes når alle innløpene er kjent. Står det
+    fast (resirkulasjon), rives løkken opp ved å gjette innløpene til én enhet (tear streams),
+    og disse løses med Newton-iterasjon.
+    """
+
+    def __init__(self, units: Sequence[Unit]) -> None:
+        self.units = list(units)
+        producers: Dict[str, Unit] = {}
+        consumers: Dict[str, Unit] = {}
+        for unit in self.units:
+            for name in unit.outlets:
+                if name in producers:
+                    raise ValueError(f"Strømmen {name} skrives av både {producers[name].name} og {unit.name}")
+                producers[name] = unit
+            for name in unit.inlets:
+                if name in consumers:
+                    raise ValueError(f"Strømmen {name} leses av både {consumers[name].name} og {unit.name}")
+                consumers[name] = unit
+        missing = [name for name in consumers if name not in producers]
+        if missing:
+            raise ValueError(f"Strømmer uten kilde: {', '.join(missing)}")
+        self.order, self.tears = self._schedule()
+
+    def _schedule(self) -> Tuple[List[Unit], List[str]]:
+        """Beregningsrekkefølge og strømmene som må rives opp for å bryte løkker."""
+        remaining = list(self.units)
+        known: set = set()
+        order: List[Unit] = []
+        tears: List[str] = []
+        while remaining:
+            ready = [unit for unit in remaining if all(name in known for name in unit.inlets)]
+            if not ready:
+                # Riv opp innløpene til enheten med færrest ukjente innløp
+                unit = min(remaining, key=lambda u: sum(name not in known for name in u.inlets))
+                torn = [name for name in unit.inlets if name not in known]
+                tears.extend(torn)
+                known.update(torn)
+                ready = [unit]
+            for unit in ready:
+                remaining.remove(unit)
+                order.append(unit)
+                known.update(unit.outlets)
+        return order, tears
+
+    @property
+    def outlets(self) -> List[str]:
+        """Strømmer som forlater nettverket."""
+        consumed = {name for unit in self.units for name in unit.inlets}
+        return [name for unit in self.units for name in unit.outlets if name not in consumed]
+
+    def _sweep(self, guesses: Mapping[str, Dict[str, Any]]) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Dict[str, Any]]]:
+        """Én gjennomregning i rekkefølge; returnerer (alle strømmer, beregnede verdier for tear-strømmene)."""
+        states: Dict[str, Dict[str, Any]] = dict(guesses)
+        computed: Dict[str, Dict[str, Any]] = {}
+        for unit in self.order:
+            for name, state in unit.evaluate(states).items():
+                if name in guesses:
+                    computed[name] = state
+                else:
+                    states[name] = state
+        states.update(computed)
+        return states, computed
+
+    def _initial_guess(self, shape) -> Dict[str, Dict[str, Any]]:
+        """Startverdi for tear-strømmene: middel av kildene."""
+        sources = [unit.state for unit in self.units if isinstance(unit, Source)]
+        if not sources:
+            raise ValueError("Nettverket har løkker, men ingen kilder å starte fra")
+        mean = {key: np.broadcast_to(sum(s[key] for s in sources) / len(sources), shape).astype(float) for key in STATE_FIELDS}
+        return {name: dict(mean) for name in self.tears}
+
+    def solve(
+        self,
+        initial: Optional[Mapping[str, Mapping[str, Any]]] = None,
+        tolerance: float = 1e-8,
+        max_iterations: int = 30
+    ) -> Dict[str, Any]:
+        """
+        Løser alle strømtilstander, vektorisert over tidssteg. Uten løkker er én
+        gjennomregning nok. Med løkker løses residualet r(X) = beregnet(X) - X for alle
+        tear-variabler X (fire felt per tear-strøm) med Newton. Tidsstegene er uavhengige,
+        så Jacobi-matrisen er blokkdiagonal: én liten k x k-blokk per tidssteg, funnet med
+        k ekstra gjennomregninger (foroverdifferanser) og løst batchvis med np.linalg.solve.
+        Konvergenskrav per felt: |r| <= tolerance * (|X| + STATE_SCALES).
+        initial kan gi startverdier for tear-strømmene.
+        Returnerer streams ({strøm: tilstand}), units ({vekslernavn: evaluate_batch-resultat, miksernavn: kondensat}),
+        tears, iterations og converged (per tidssteg).
+        """
+        if not self.tears:
+            states, _ = self._sweep({})
+            return self._result(states, [], 0, np.array(True))
+
+        shape = np.broadcast_shapes(
+            *[np.shape(v) for unit in self.units if isinstance(unit, Source) for v in unit.state.values()],
+            *[np.shape(f) for unit in self.units if isinstance(unit, Splitter) for f in unit.fractions]
+        )
+        guesses = self._initial_guess(shape)
+        for name, state in (initial or {}).items():
+            guesses[name].update({key: np.broadcast_to(np.asarray(v, dtype=float), shape) for key, v in state.items()})
+        keys = [(name, field) for name in self.tears for field in STATE_FIELDS]
+        scales = np.array([STATE_SCALES[field] for _, field in keys]).reshape((-1,) + (1,) * len(shape))
+
+        def unpack(x: np.ndarray) -> Dict[str, Dict[str, Any]]:
+            result: Dict[str, Dict[str, Any]] = {name: {} for name in self.tears}
+            for (name, field), value in zip(keys, x):
+                result[name][field] = value
+            return result
+
+        def residual(x: np.ndarray) -> Tuple[np.ndarray, Dict[str, Dict[str, Any]]]:
+            states, computed = self._sweep(unpack(x))
+            r = np.stack([np.broadcast_to(computed[name][field], shape) for name, field in keys]) - x
+            return r, states
+
+        x = np.stack([guesses[name][field] for name, field in keys])
+        converged = np.zeros(shape, dtype=bool)
+        iterations = 0
+        for iterations in range(1, max_iterations + 1):
+            r, states = residual(x)
+            converged = np.all(np.abs(r) <= tolerance * (np.abs(x) + scales), axis=0)
+            if np.all(converged):
+                break
+            k = len(keys)
+            jacobian = np.empty(shape + (k, k))
+            for j in range(k):
+                step = 1e-7 * (np.abs(x[j]) + scales[j])
+                perturbed = x.copy()
+                perturbed[j] = x[j] + step
+                r_j, _ = residual(perturbed)
+                jacobian[..., :, j] = np.moveaxis((r_j - r) / step, 0, -1)
+            delta = np.linalg.solve(jacobian, -np.moveaxis(r, 0, -1)[..., None])[..., 0]
+            x = x + np.where(converged, 0.0, np.moveaxis(delta, -1, 0))
+        else:
+            r, states = residual(x)
+            converged = np.all(np.abs(r) <= tolerance * (np.abs(x) + scales), axis=0)
+        return self._result(states, self.tears, iterations, converged)
+
+    def _result(self, states, tears, iterations, converged) -> Dict[str, Any]:
+        return {
+            "streams": states,
+            "units": {unit.name: unit.results for unit in self.order if isinstance(unit, (ExchangerUnit, Mixer))},
+            "tears": list(tears),
+            "iterations": iterations,
+            "converged": converged,
+        }
@@ -0,0 +1,73 @@
+import struct
+from typing import Dict, Tuple
+import numpy as np
+from models import SimulationInput
+from batch import evaluate_input_batch
+
+# Binærformat (little-endian), lest av templates/webapp.html:
+#   b"PHXT", uint16 versjon, uint16 (ubrukt), uint16 n_m1, n_m2, n_t1, n_t2
+#   float32-akser: m1[n_m1], m2[n_m2], t1[n_t1], t2[n_t2]
+#   float32 effectiveness[n_m1, n_m2, n_t1, n_t2]
+#   float32 delta_p_1[n_m1, n_t1], delta_p_2[n_m2, n_t2]
+# Headeren er 16 byte slik at alle float32-blokker er 4-byte-justert.
+TABLE_MAGIC = b"PHXT"
+TABLE_VERSION = 1
+_HEADER = struct.Struct("<4sHHHHHH")
+
+
+def build_performance_table(
+    input_data: SimulationInput,
+    n_mass: int = 9,
+    n_temperature: int = 7,
+    mass_span: Tuple[float, float] = (0.4, 2.5),
+    temperature_span: float = 30.0
+) -> bytes:
+    """
+    Lager en kompakt ytelsestabell for geometrien, fuktigheten og trykket i input_data.
+    Massestrømmene varieres geometrisk fra mass_span[0] til mass_span[1] ganger dagens verdi,
+    temperaturene lineært ± temperature_span rundt dagens verdi.
+    Trykkfallet på hver side avhenger bare av egen massestrøm og temperatur og lagres 2D.
+    """
+    axes = []
+    for stream in (input_data.airstream_1, input_data.airstream_2):
+        axes.append(stream.mass_flow_rate * np.geomspace(mass_span[0], mass_span[1], n_mass))
+    for stream in (input_data.airstream_1, input_data.airstream_2):
+        axes.append(np.linspace(stream.temperature_c - temperature_span, stream.temperature_c + temperature_span, n_temperature))
+    m1, m2, t1, t2 = np.meshgrid(*axes, indexing="ij")
+    result = evaluate_input_batch(input_data, {
+        "airstream_1.mass_flow_rate": m1,
+        "airstream_2.mass_flow_rate": m2,
+        "airstream_1.temperature_c": t1,
+        "airstream_2.temperature_c": t2,
+    })
+    blocks = [
+        *axes,
+        result["effectiveness"],
+        result["delta_p_1"][:, 0, :, 0],
+        result["delta_p_2"][0, :, 0, :],
+    ]
+    header = _HEADER.pack(TABLE_MAGIC, TABLE_VERSION, 0, n_mass, n_mass, n_temperature, n_temperature)
+    return header + b"".join(np.ascontiguousarray(block, dtype="<f4").tobytes() for block in blocks)
+
+
+def read_performance_table(data: bytes) -> Dict[str, np.ndarray]:
+    """Leser en tabell laget av build_performance_table."""
+    magic, version, _, n_m1, n_m2, n_t1, n_t2 = _HEADER.unpack_from(data)
+    if magic != TABLE_MAGIC or version != TABLE_VERSION:
+        raise ValueError("Ukjent tabellformat")
+    shapes = {
+        "mass_flow_rate_1": (n_m1,),
+        "mass_flow_rate_2": (n_m2,),
+        "temperature_c_1": (n_t1,),
+        "temperature_c_2": (n_t2,),
+        "effectiveness": (n_m1, n_m2, n_t1, n_t2),
+        "delta_p_1": (n_m1, n_t1),
+        "delta_p_2": (n_m2, n_t2),
+    }
+    table = {}
+    offset = _HEADER.size
+    for name, shape in shapes.items():
+        count = int(np.prod(shape))
+        table[name] = np.frombuffer(data, dtype="<f4", count=count, offset=offset).reshape(shape)
+        offset += 4 * count
+    return table
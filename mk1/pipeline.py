@@ -0,0 +1,160 @@
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set
+from moistair import AirProperties, AirStream
+from heatecxhanger import PlateHeatExchanger
+from geometry import ExchangerGeometry
+from models import SimulationInput
+from simulation_output import SimulationOutput
+
+
+class Node:
+    """
+    Én avledet størrelse i beregningsgrafen.
+    fields: inndatafelter ("seksjon.felt") noden leser direkte.
+    depends_on: andre noder den bygger på.
+    compute: funksjon som får (inndata, {nodenavn: verdi}) og returnerer nodens verdi.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        compute: Callable[[Dict[str, Any], Dict[str, Any]], Any],
+        fields: Sequence[str] = (),
+        depends_on: Sequence[str] = ()
+    ) -> None:
+        self.name = name
+        self.compute = compute
+        self.fields = tuple(fields)
+        self.depends_on = tuple(depends_on)
+
+
+def flatten_input(input_data: SimulationInput) -> Dict[str, Any]:
+    """Flater ut SimulationInput til {"seksjon.felt": verdi}; toppnivåfelter beholder navnet."""
+    flat = {}
+    for key, value in input_data.model_dump().items():
+        if isinstance(value, dict):
+            for field, field_value in value.items():
+                flat[f"{key}.{field}"] = field_value
+        else:
+            flat[key] = value
+    return flat
+
+
+def _exchanger_fields() -> List[str]:
+    return [f"exchanger.{name}" for name in ExchangerGeometry.INPUTS]
+
+
+def _geometry(data: Dict[str, Any], values: Dict[str, Any]) -> ExchangerGeometry:
+    return ExchangerGeometry.intern(**{name.split(".")[1]: data[name] for name in _exchanger_fields()})
+
+
+def _air(side: str) -> Callable[[Dict[str, Any], Dict[str, Any]], AirProperties]:
+    def compute(data: Dict[str, Any], values: Dict[str, Any]) -> AirProperties:
+        return AirProperties(
+            temperature_c=data[f"airstream_{side}.temperature_c"],
+            relative_humidity=data[f"airstream_{side}.phi"],
+            pressure=data[f"airstream_{side}.pressure"]
+        )
+    return compute
+
+
+def _stream(side: str) -> Callable[[Dict[str, Any], Dict[str, Any]], AirStream]:
+    def compute(data: Dict[str, Any], values: Dict[str, Any]) -> AirStream:
+        return AirStream(mass_flow_rate=data[f"airstream_{side}.mass_flow_rate"], air_properties=values[f"air_{side}"])
+    return compute
+
+
+def _side(side: str) -> Callable[[Dict[str, Any], Dict[str, Any]], Any]:
+    def compute(data: Dict[str, Any], values: Dict[str, Any]) -> Any:
+        # ExchangerGeometry har de samme attributtene som PlateHeatExchanger
+        return PlateHeatExchanger.calculate_side(
+            values["geometry"], values[f"stream_{side}"], int(side),
+            data["developing_flow"], data["nusselt_correlation"], data["friction_correlation"]
+        )
+    return compute
+
+
+def _parameters(data: Dict[str, Any], values: Dict[str, Any]) -> Any:
+    return PlateHeatExchanger.combine_sides(values["geometry"], values["side_1"], values["side_2"], values["stream_1"], values["stream_2"])
+
+
+def _results(data: Dict[str, Any], values: Dict[str, Any]) -> Any:
+    return PlateHeatExchanger.calculate_results(
+        values["parameters"], values["stream_1"], values["stream_2"],
+        data["flow_arrangement"], data["effectiveness_backend"], data["number_of_passes"]
+    )
+
+
+# Modellvalg som påvirker sideberegningene
+_SIDE_OPTIONS = ("developing_flow", "nusselt_correlation", "friction_correlation")
+
+# Standardgrafen: geometri -> strømningsareal/Dh; tilstand -> luftegenskaper;
+# egenskaper + geometri -> sideresultater; sider -> U/NTU -> ε/q.
+DEFAULT_NODES = (
+    Node("geometry", _geometry, fields=_exchanger_fields()),
+    Node("air_1", _air("1"), fields=("airstream_1.temperature_c", "airstream_1.phi", "airstream_1.pressure")),
+    Node("air_2", _air("2"), fields=("airstream_2.temperature_c", "airstream_2.phi", "airstream_2.pressure")),
+    Node("stream_1", _stream("1"), fields=("airstream_1.mass_flow_rate",), depends_on=("air_1",)),
+    Node("stream_2", _stream("2"), fields=("airstream_2.mass_flow_rate",), depends_on=("air_2",)),
+    Node("side_1", _side("1"), fields=_SIDE_OPTIONS, depends_on=("geometry", "stream_1")),
+    Node("side_2", _side("2"), fields=_SIDE_OPTIONS, depends_on=("geometry", "stream_2")),
+    Node("parameters", _parameters, depends_on=("geometry", "side_1", "side_2", "stream_1", "stream_2")),
+    Node("results", _results, fields=("flow_arrangement", "effectiveness_backend", "number_of_passes"), depends_on=("parameters", "stream_1", "stream_2")),
+)
+
+
+class IncrementalSimulation:
+    """
+    Holder forrige evaluering og beregner bare nodene som påvirkes av endrede inndatafelter.
+    Nodene må være oppgitt i topologisk rekkefølge (avhengigheter før nodene som bruker dem).
+    """
+
+    def __init__(self, nodes: Sequence[Node] = DEFAULT_NODES) -> None:
+        self.nodes = list(nodes)
+        known: Set[str] = set()
+        for node in self.nodes:
+            unknown = [name for name in node.depends_on if name not in known]
+            if unknown:
+                raise ValueError(f"Node {node.name} avhenger av ukjente eller senere noder: {', '.join(unknown)}")
+            known.add(node.name)
+        self.data: Dict[str, Any] = {}
+        self.values: Dict[str, Any] = {}
+        self.last_recomputed: List[str] = []
+
+    def changed_fields(self, input_data: SimulationInput) -> Set[str]:
+        """Felter som er forskjellige fra forrige evaluering."""
+        flat = flatten_input(input_data)
+        return {name for name, value in flat.items() if name not in self.data or self.data[name] != value}
+
+    def invalidated_nodes(self, changed: Iterable[str]) -> Set[str]:
+        """Nodene som må beregnes på nytt når feltene i changed er endret."""
+        changed = set(changed)
+        invalid: Set[str] = set()
+        for node in self.nodes:
+            if node.name not in self.values or changed.intersection(node.fields) or invalid.intersection(node.depends_on):
+                invalid.add(node.name)
+        return invalid
+
+    def evaluate(self, input_data: SimulationInput, changed: Optional[Iterable[str]] = None) -> SimulationOutput:
+        """
+        Evaluerer grafen for input_data. Er changed ikke oppgitt, finnes endringene ved å
+        sammenligne med forrige evaluering. Feiler en node, beholdes forrige tilstand.
+        """
+        flat = flatten_input(input_data)
+        changed = self.changed_fields(input_data) if changed is None else set(changed)
+        invalid = self.invalidated_nodes(changed)
+        # Beregn i en kopi; tilstanden oppdateres først når alle nodene har lyktes, slik at en
+        # feil ikke etterlater inndata som ser uendret ut sammen med gamle verdier
+        values = dict(self.values)
+        recomputed = []
+        for node in self.nodes:
+            if node.name in invalid:
+                values[node.name] = node.compute(flat, values)
+                recomputed.append(node.name)
+        self.data, self.values, self.last_recomputed = flat, values, recomputed
+        return SimulationOutput(
+            airstream_1=input_data.airstream_1,
+            airstream_2=input_data.airstream_2,
+            exchanger=input_data.exchanger,
+            parameters=self.values["parameters"],
+            results=self.values["results"]
+        )
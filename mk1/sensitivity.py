@@ -0,0 +1,145 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Mapping, Optional, Sequence
+import numpy as np
+from scipy.stats import qmc
+from definitions import EffectivenessBackend, FlowArrangement
+from models import SimulationInput
+from batch import columns_from_input, evaluate_batch
+from uncertainty import transform_unit, validate_distributions
+
+# Utdata det beregnes Sobol-indekser for som standard
+SENSITIVITY_OUTPUTS = ("u_value", "effectiveness")
+
+
+def _evaluate_chunk(
+    base_columns: Dict[str, Any],
+    flow_arrangement: FlowArrangement,
+    effectiveness_backend: EffectivenessBackend,
+    number_of_passes: int,
+    distributions: Mapping[str, Sequence[Any]],
+    a: np.ndarray,
+    b: np.ndarray,
+    outputs: Sequence[str]
+) -> Dict[str, np.ndarray]:
+    """
+    Evaluerer én blokk av Saltelli-utvalget: radene i A, B og alle AB_i (A med kolonne i fra B)
+    stables til ett batch med n * (d + 2) punkter. Returnerer {utdata: array med form (d + 2, n)}
+    i rekkefølgen A, B, AB_1, ..., AB_d.
+    """
+    n, d = a.shape
+    ab = np.repeat(a[None, :, :], d, axis=0)
+    ab[np.arange(d), :, np.arange(d)] = b.T
+    unit = np.concatenate([a[None], b[None], ab]).reshape(-1, d)
+    columns = dict(base_columns)
+    columns.update(transform_unit(unit, distributions))
+    evaluated = evaluate_batch(columns, flow_arrangement, effectiveness_backend, number_of_passes)
+    return {name: np.broadcast_to(evaluated[name], (len(unit),)).reshape(d + 2, n) for name in outputs}
+
+
+def _indices(f_a: np.ndarray, f_b: np.ndarray, f_ab: np.ndarray):
+    """
+    Førsteordens (Saltelli 2010) og totale (Jansen) indekser. f_a, f_b har form (..., n),
+    f_ab form (..., d, n); ledende akser brukes for bootstrap-utvalg.
+    """
+    variance = np.var(np.concatenate([f_a, f_b], axis=-1), axis=-1)[..., None]
+    first = np.mean(f_b[..., None, :] * (f_ab - f_a[..., None, :]), axis=-1) / variance
+    total = 0.5 * np.mean((f_a[..., None, :] - f_ab) ** 2, axis=-1) / variance
+    return first, total, variance[..., 0]
+
+
+def sobol_indices(
+    base: SimulationInput,
+    distributions: Mapping[str, Sequence[Any]],
+    n_samples: int = 4096,
+    outputs: Sequence[str] = SENSITIVITY_OUTPUTS,
+    seed: int = 0,
+    chunk_size: int = 4096,
+    n_workers: Optional[int] = None,
+    n_bootstrap: int = 200,
+    confidence: float = 0.95
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Sobol-indekser for outputs over området beskrevet av distributions (som i
+    uncertainty.propagate). A og B er et scramblet Sobol-utvalg med n_samples punkter;
+    totalt evalueres n_samples * (d + 2) punkter, blokkvis med chunk_size rader fra A/B.
+    Med n_workers > 1 fordeles blokkene på en prosesspool.
+    Returnerer {utdata: {"first_order", "total_order", "first_order_ci", "total_order_ci",
+    "variance", "n_valid"}}, der indeksene er {felt: verdi} og konfidensintervallene
+    {felt: (nedre, øvre)} fra bootstrap over radene.
+    """
+    validate_distributions(distributions)
+    fields = list(distributions)
+    d = len(fields)
+    sampler = qmc.Sobol(d=2 * d, scramble=True, seed=seed)
+    unit = sampler.random(n_samples)
+    a, b = unit[:, :d], unit[:, d:]
+
+    base_columns = columns_from_input(base)
+    starts = range(0, n_samples, chunk_size)
+    arguments = [
+        (base_columns, base.flow_arrangement, base.effectiveness_backend, base.number_of_passes, distributions, a[i:i + chunk_size], b[i:i + chunk_size], outputs)
+        for i in starts
+    ]
+    if n_workers is not None and n_workers > 1:
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            chunks = list(pool.map(_evaluate_chunk, *zip(*arguments)))
+    else:
+        chunks = [_evaluate_chunk(*args) for args in arguments]
+
+    rng = np.random.default_rng(seed)
+    alpha = (1 - confidence) / 2
+    result = {}
+    for name in outputs:
+        values = np.concatenate([chunk[name] for chunk in chunks], axis=1)
+        valid = np.all(np.isfinite(values), axis=0)
+        f_a, f_b, f_ab = values[0, valid], values[1, valid], values[2:, valid]
+        first, total, variance = _indices(f_a, f_b, f_ab)
+
+        n_valid = f_a.size
+        first_boot = np.empty((n_bootstrap, d))
+        total_boot = np.empty((n_bootstrap, d))
+        for k in range(n_bootstrap):
+            rows = rng.integers(0, n_valid, n_valid)
+            first_boot[k], total_boot[k], _ = _indices(f_a[rows], f_b[rows], f_ab[:, rows])
+        first_ci = np.quantile(first_boot, [alpha, 1 - alpha], axis=0)
+        total_ci = np.quantile(total_boot, [alpha, 1 - alpha], axis=0)
+
+        result[name] = {
+            "first_order": dict(zip(fields, first.tolist())),
+            "total_order": dict(zip(fields, total.tolist())),
+            "first_order_ci": {field: (float(first_ci[0, i]), float(first_ci[1, i])) for i, field in enumerate(fields)},
+            "total_order_ci": {field: (float(total_ci[0, i]), float(total_ci[1, i])) for i, field in enumerate(fields)},
+            "variance": float(variance),
+            "n_valid": int(n_valid),
+        }
+    return result
+
+
+if __name__ == "__main__":
+    import time
+    from models import AirStreamInput, ExchangerInput
+
+    base = SimulationInput(
+        airstream_1=AirStreamInput(mass_flow_rate=0.5, temperature_c=80.0, phi=0.3, pressure=101325),
+        airstream_2=AirStreamInput(mass_flow_rate=0.6, temperature_c=20.0, phi=0.5, pressure=101325),
+        exchanger=ExchangerInput(
+            width=1.4, length=1.4, plate_thickness=0.0005,
+            thermal_conductivity_plate=15.0, number_of_plates=30, channel_height=0.005
+        ),
+        flow_arrangement=FlowArrangement.COUNTER_FLOW
+    )
+    start = time.perf_counter()
+    indices = sobol_indices(base, {
+        "airstream_1.mass_flow_rate": ("uniform", 0.2, 1.5),
+        "airstream_2.mass_flow_rate": ("uniform", 0.2, 1.5),
+        "airstream_1.temperature_c": ("uniform", 20.0, 90.0),
+        "airstream_2.temperature_c": ("uniform", -20.0, 20.0),
+        "exchanger.channel_height": ("uniform", 0.003, 0.008),
+        "exchanger.plate_thickness": ("uniform", 0.0003, 0.001),
+    }, n_samples=8192)
+    print(f"{time.perf_counter() - start:.2f} s")
+    for name, result in indices.items():
+        print(name)
+        for field in result["first_order"]:
+            lo, hi = result["first_order_ci"][field]
+            print(f"  {field:<28} S1={result['first_order'][field]:6.3f} [{lo:6.3f}, {hi:6.3f}]  ST={result['total_order'][field]:6.3f}")
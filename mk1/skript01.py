@@ -15,13 +15,18 @@ def do_simulation(input_data: SimulationInput) -> SimulationOutput:
     
     exchanger_data = input_data.exchanger.model_dump()
     phex = PlateHeatExchanger(**exchanger_data)
-    params = phex.calculate_parameters(airstream_1, airstream_2)
+    params = phex.calculate_parameters(
+        airstream_1, airstream_2, input_data.developing_flow,
+        input_data.nusselt_correlation, input_data.friction_correlation
+    )
     
     results = PlateHeatExchanger.calculate_results(
         params, 
         airstream_1, 
         airstream_2, 
-        input_data.flow_arrangement
+        input_data.flow_arrangement,
+        input_data.effectiveness_backend,
+        input_data.number_of_passes
     )
     
     return SimulationOutput(
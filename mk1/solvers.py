@@ -0,0 +1,47 @@
+from typing import Callable, Optional, Tuple
+import numpy as np
+
+
+def safeguarded_newton(
+    residual: Callable[[np.ndarray, np.ndarray], np.ndarray],
+    derivative: Callable[[np.ndarray, np.ndarray, np.ndarray], np.ndarray],
+    lower,
+    upper,
+    guess,
+    tolerance: float,
+    max_iterations: int,
+    active=None
+) -> Tuple[np.ndarray, np.ndarray, int]:
+    """
+    Sikret Newton-iterasjon for mange uavhengige likninger r(x) = 0 samtidig, der r er
+    stigende i x og roten ligger i [lower, upper]. Intervallet strammes inn med fortegnet til
+    r; Newton-steg som ikke er endelige eller som havner utenfor intervallet erstattes av
+    halvering. Intervallendene godtas, siden Newton-steget fra en rot som nettopp er blitt
+    intervallende havner på roten igjen.
+    lower, upper og guess kringkastes til felles form. residual(x, rows) og
+    derivative(x, r, rows) kalles bare for radene som ikke har konvergert, der rows er flat
+    indeks i den felles formen. En rad har konvergert når steget er mindre enn tolerance
+    eller r = 0, og tas da ut av iterasjonen. active (bool) velger radene som løses
+    (standard: alle); de øvrige beholder guess.
+    Returnerer (x, converged, iterations).
+    """
+    lower, upper, guess = np.broadcast_arrays(*[np.asarray(v, dtype=float) for v in (lower, upper, guess)])
+    shape = guess.shape
+    x, lower, upper = [np.array(v).reshape(-1) for v in (guess, lower, upper)]
+    converged = np.zeros(x.size, dtype=bool)
+    rows = np.flatnonzero(np.broadcast_to(True if active is None else active, shape))
+    iterations = 0
+    while rows.size and iterations < max_iterations:
+        iterations += 1
+        value, lo, hi = x[rows], lower[rows], upper[rows]
+        r = residual(value, rows)
+        lo, hi = np.where(r < 0, value, lo), np.where(r > 0, value, hi)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            newton = value - r / derivative(value, r, rows)
+        inside = np.isfinite(newton) & (newton >= lo) & (newton <= hi)
+        candidate = np.where(r == 0, value, np.where(inside, newton, 0.5 * (lo + hi)))
+        x[rows], lower[rows], upper[rows] = candidate, lo, hi
+        done = np.abs(candidate - value) <= tolerance
+        converged[rows[done]] = True
+        rows = rows[~done]
+    return x.reshape(shape), converged.reshape(shape), iterations
@@ -0,0 +1,241 @@
+import itertools
+import json
+from typing import Any, Dict, Mapping, Optional, Sequence, Tuple
+import numpy as np
+from definitions import FlowArrangement
+from models import SimulationInput
+from heatecxhanger import PlateHeatExchanger
+from batch import INPUT_FIELDS, columns_from_input, evaluate_batch, latin_hypercube
+
+# Utdata surrogatet rapporterer feilgrenser for
+SURROGATE_OUTPUTS = ("u_value", "effectiveness", "delta_p_1", "delta_p_2")
+
+# Størrelser som tilpasses med polynom (alle strengt positive, tilpasses i log-rom).
+# Effektiviteten tilpasses ikke direkte: den har en knekk der C_1 = C_2 (C_min bytter side),
+# så den beregnes fra tilpasset UA, C_1 og C_2 med den eksakte ε-NTU-sammenhengen.
+FITTED_QUANTITIES = ("u_value", "ua", "c_1", "c_2", "delta_p_1", "delta_p_2")
+
+
+def _monomial_exponents(n_dimensions: int, degree: int) -> np.ndarray:
+    """Alle eksponentkombinasjoner med total grad <= degree, form (n_terms, n_dimensions)."""
+    exponents = [
+        combo for combo in itertools.product(range(degree + 1), repeat=n_dimensions)
+        if sum(combo) <= degree
+    ]
+    return np.array(sorted(exponents, key=lambda e: (sum(e), e[::-1])), dtype=np.int64)
+
+
+class Surrogate:
+    """
+    Kompakt polynomsurrogat for PlateHeatExchanger innenfor et avgrenset område.
+    Inndata skaleres til [-1, 1] (i log-rom for strengt positive felter) og hvert utdata
+    er et polynom av total grad `degree` i de skalerte variablene.
+    """
+
+    def __init__(
+        self,
+        base: SimulationInput,
+        fields: Sequence[str],
+        lower: Sequence[float],
+        upper: Sequence[float],
+        log_inputs: Sequence[bool],
+        exponents: np.ndarray,
+        coefficients: Mapping[str, Sequence[float]],
+        error_bounds: Optional[Mapping[str, Mapping[str, float]]] = None
+    ) -> None:
+        self.base = base
+        self.fields = list(fields)
+        self.lower = np.asarray(lower, dtype=float)
+        self.upper = np.asarray(upper, dtype=float)
+        self.log_inputs = np.asarray(log_inputs, dtype=bool)
+        self.exponents = np.asarray(exponents, dtype=np.int64)
+        self.coefficients = {k: np.asarray(v, dtype=float) for k, v in coefficients.items()}
+        self.error_bounds = {k: dict(v) for k, v in (error_bounds or {}).items()}
+        self._lo = np.where(self.log_inputs, np.log(np.where(self.log_inputs, self.lower, 1.0)), self.lower)
+        self._hi = np.where(self.log_inputs, np.log(np.where(self.log_inputs, self.upper, 1.0)), self.upper)
+
+    @property
+    def flow_arrangement(self) -> FlowArrangement:
+        return self.base.flow_arrangement
+
+    def _scale(self, values: np.ndarray) -> np.ndarray:
+        """Skalerer inndata med form (n, n_fields) til [-1, 1]."""
+        values = np.where(self.log_inputs, np.log(np.where(self.log_inputs, values, 1.0)), values)
+        return 2 * (values - self._lo) / (self._hi - self._lo) - 1
+
+    def _design_matrix(self, scaled: np.ndarray) -> np.ndarray:
+        return np.prod(scaled[:, None, :] ** self.exponents[None, :, :], axis=2)
+
+    def predict_array(self, values) -> Dict[str, np.ndarray]:
+        """Evaluerer surrogatet for en matrise med form (n, n_fields) i rekkefølgen self.fields."""
+        values = np.atleast_2d(np.asarray(values, dtype=float))
+        basis = self._design_matrix(self._scale(values))
+        fitted = {name: np.exp(basis @ coefficients) for name, coefficients in self.coefficients.items()}
+        c_min = np.minimum(fitted["c_1"], fitted["c_2"])
+        c_max = np.maximum(fitted["c_1"], fitted["c_2"])
+        return {
+            "u_value": fitted["u_value"],
+            "effectiveness": PlateHeatExchanger.effectiveness_array(
+                fitted["ua"] / c_min, c_min / c_max, self.flow_arrangement,
+                self.base.effectiveness_backend, self.base.number_of_passes, fitted["c_1"] <= fitted["c_2"]
+            ),
+            "delta_p_1": fitted["delta_p_1"],
+            "delta_p_2": fitted["delta_p_2"],
+        }
+
+    def predict(self, columns: Mapping[str, Any]) -> Dict[str, np.ndarray]:
+        """Evaluerer surrogatet for {"seksjon.felt": verdi(er)}. Manglende felter hentes fra base."""
+        unknown = [name for name in columns if name not in self.fields]
+        if unknown:
+            raise ValueError(f"Surrogatet er ikke tilpasset for feltene: {', '.join(unknown)}")
+        base_columns = columns_from_input(self.base)
+        arrays = np.broadcast_arrays(*[np.asarray(columns.get(name, base_columns[name]), dtype=float) for name in self.fields])
+        shape = arrays[0].shape
+        prediction = self.predict_array(np.stack([a.ravel() for a in arrays], axis=1))
+        return {k: v.reshape(shape) for k, v in prediction.items()}
+
+    def in_domain(self, columns: Mapping[str, Any]) -> np.ndarray:
+        """Sann der alle oppgitte felter ligger innenfor tilpasningsområdet."""
+        inside = np.array(True)
+        for i, name in enumerate(self.fields):
+            if name in columns:
+                value = np.asarray(columns[name], dtype=float)
+                inside = inside & (value >= self.lower[i]) & (value <= self.upper[i])
+        return inside
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "base": self.base.model_dump(mode="json"),
+            "fields": self.fields,
+            "lower": self.lower.tolist(),
+            "upper": self.upper.tolist(),
+            "log_inputs": self.log_inputs.tolist(),
+            "exponents": self.exponents.tolist(),
+            "coefficients": {k: v.tolist() for k, v in self.coefficients.items()},
+            "error_bounds": self.error_bounds,
+        }
+
+    @staticmethod
+    def from_dict(data: Mapping[str, Any]) -> "Surrogate":
+        return Surrogate(
+            base=SimulationInput.model_validate(data["base"]),
+            fields=data["fields"],
+            lower=data["lower"],
+            upper=data["upper"],
+            log_inputs=data["log_inputs"],
+            exponents=np.array(data["exponents"], dtype=np.int64),
+            coefficients=data["coefficients"],
+            error_bounds=data.get("error_bounds"),
+        )
+
+    def save(self, path: str) -> None:
+        """Lagrer surrogatet som en liten JSON-fil."""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f)
+
+    @staticmethod
+    def load(path: str) -> "Surrogate":
+        with open(path, encoding="utf-8") as f:
+            return Surrogate.from_dict(json.load(f))
+
+
+def _error_bounds(predicted: np.ndarray, actual: np.ndarray) -> Dict[str, float]:
+    error = predicted - actual
+    relative = np.abs(error) / np.maximum(np.abs(actual), 1e-12)
+    return {
+        "max_abs_error": float(np.max(np.abs(error))),
+        "rmse": float(np.sqrt(np.mean(error**2))),
+        "p99_abs_error": float(np.percentile(np.abs(error), 99)),
+        "max_rel_error": float(np.max(relative)),
+        "p99_rel_error": float(np.percentile(relative, 99)),
+    }
+
+
+def build_surrogate(
+    base: SimulationInput,
+    bounds: Mapping[str, Tuple[float, float]],
+    n_samples: int = 4000,
+    degree: int = 3,
+    holdout_fraction: float = 0.2,
+    seed: int = 0
+) -> Surrogate:
+    """
+    Bygger et polynomsurrogat rundt base.
+    bounds: {"seksjon.felt": (nedre, øvre)} for feltene som varieres; resten holdes som i base.
+    Punktene trekkes med latin hypercube og evalueres med den fulle modellen (evaluate_batch).
+    En andel holdout_fraction holdes utenfor tilpasningen og brukes til å rapportere feilgrenser.
+    """
+    unknown = [name for name in bounds if name not in INPUT_FIELDS]
+    if unknown:
+        raise ValueError(f"Ukjente inndatafelter: {', '.join(unknown)}")
+    fields = list(bounds)
+    lower = np.array([bounds[name][0] for name in fields], dtype=float)
+    upper = np.array([bounds[name][1] for name in fields], dtype=float)
+    if np.any(upper <= lower):
+        raise ValueError("Øvre grense må være større enn nedre grense for alle felter")
+    log_inputs = lower > 0
+
+    rng = np.random.default_rng(seed)
+    unit = latin_hypercube(n_samples, len(fields), rng)
+    lo = np.where(log_inputs, np.log(np.where(log_inputs, lower, 1.0)), lower)
+    hi = np.where(log_inputs, np.log(np.where(log_inputs, upper, 1.0)), upper)
+    samples = lo + unit * (hi - lo)
+    samples = np.where(log_inputs, np.exp(samples), samples)
+    if "exchanger.number_of_plates" in fields:
+        column = fields.index("exchanger.number_of_plates")
+        samples[:, column] = np.round(samples[:, column])
+
+    columns = columns_from_input(base)
+    columns.update({name: samples[:, i] for i, name in enumerate(fields)})
+    evaluated = evaluate_batch(columns, base.flow_arrangement, base.effectiveness_backend, base.number_of_passes)
+    evaluated["ua"] = evaluated["u_value"] * evaluated["area_heat_1"]
+    targets = np.stack([np.broadcast_to(evaluated[name], (n_samples,)) for name in FITTED_QUANTITIES], axis=1)
+    reference = np.stack([evaluated[name] for name in SURROGATE_OUTPUTS], axis=1)
+    valid = np.all(np.isfinite(targets), axis=1) & np.all(targets > 0, axis=1) & np.all(np.isfinite(reference), axis=1)
+    samples, targets, reference = samples[valid], targets[valid], reference[valid]
+
+    n_holdout = int(round(holdout_fraction * len(samples)))
+    order = rng.permutation(len(samples))
+    test, train = order[:n_holdout], order[n_holdout:]
+
+    surrogate = Surrogate(
+        base=base,
+        fields=fields,
+        lower=lower,
+        upper=upper,
+        log_inputs=log_inputs,
+        exponents=_monomial_exponents(len(fields), degree),
+        coefficients={},
+    )
+    basis = surrogate._design_matrix(surrogate._scale(samples[train]))
+    coefficients = np.linalg.lstsq(basis, np.log(targets[train]), rcond=None)[0]
+    surrogate.coefficients = {name: coefficients[:, j] for j, name in enumerate(FITTED_QUANTITIES)}
+    if n_holdout > 0:
+        predicted = surrogate.predict_array(samples[test])
+        surrogate.error_bounds = {
+            name: _error_bounds(predicted[name], reference[test, j]) for j, name in enumerate(SURROGATE_OUTPUTS)
+        }
+    return surrogate
+
+
+if __name__ == "__main__":
+    from models import AirStreamInput, ExchangerInput
+
+    base = SimulationInput(
+        airstream_1=AirStreamInput(mass_flow_rate=0.5, temperature_c=80.0, phi=0.3, pressure=101325),
+        airstream_2=AirStreamInput(mass_flow_rate=0.6, temperature_c=20.0, phi=0.5, pressure=101325),
+        exchanger=ExchangerInput(
+            width=1.4, length=1.4, plate_thickness=0.0005,
+            thermal_conductivity_plate=15.0, number_of_plates=30, channel_height=0.005
+        ),
+        flow_arrangement=FlowArrangement.COUNTER_FLOW
+    )
+    surrogate = build_surrogate(base, {
+        "airstream_1.mass_flow_rate": (0.2, 1.0),
+        "airstream_2.mass_flow_rate": (0.2, 1.0),
+        "airstream_1.temperature_c": (20.0, 90.0),
+        "airstream_2.temperature_c": (-20.0, 20.0),
+        "exchanger.channel_height": (0.003, 0.008),
+    })
+    for name, bounds in surrogate.error_bounds.items():
+        print(f"{name:<15} " + "  ".join(f"{k}={v:.3g}" for k, v in bounds.items()))
@@ -0,0 +1,170 @@
+from typing import Any, Dict, Mapping, Optional, Tuple
+import numpy as np
+from scipy.linalg import expm
+from definitions import FlowArrangement
+from models import SimulationInput
+from heatecxhanger import PlateHeatExchanger
+from batch import EXCHANGER_FIELDS, columns_from_input, evaluate_batch
+
+# Standard antall celler langs hver strømningsretning
+N_CELLS = 10
+
+# Platemateriale (aluminium), brukes til platenes varmekapasitet
+PLATE_DENSITY = 2700.0          # [kg/m3]
+PLATE_SPECIFIC_HEAT = 900.0     # [J/kgK]
+
+TRANSIENT_ARRANGEMENTS = (FlowArrangement.COUNTER_FLOW, FlowArrangement.CROSS_FLOW)
+
+
+def _upstream(grid: Tuple[int, int], axis: int, reverse: bool) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Koblingen mellom cellene for én side (cellene nummerert radvis i grid):
+    U[j, k] = 1 når celle k ligger rett oppstrøms for celle j, og inlet[j] = 1 for cellene
+    ved innløpet. Strømmen går langs axis (baklengs hvis reverse).
+    """
+    index = np.arange(grid[0] * grid[1]).reshape(grid)
+    shift = 1 if reverse else -1
+    upstream = np.roll(index, -shift, axis=axis)
+    first = np.zeros(grid, dtype=bool)
+    first[(slice(None),) * axis + ((-1 if reverse else 0),)] = True
+    matrix = np.zeros((index.size, index.size))
+    matrix[index[~first], upstream[~first]] = 1.0
+    return matrix, first.reshape(-1).astype(float)
+
+
+def state_space(
+    evaluated: Mapping[str, Any],
+    columns: Mapping[str, Any],
+    grid: Tuple[int, int],
+    cross: bool,
+    plate_density: float = PLATE_DENSITY,
+    plate_specific_heat: float = PLATE_SPECIFIC_HEAT
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Lineær tilstandsmodell dx/dt = A x + B u for hver rad i batchen, med
+    x = [T_1 i cellene, platetemperaturene, T_2 i cellene] og u = [T_1,inn, T_2,inn].
+    Luften i hver celle har kapasiteten ρ c_p V / celler (V = volume_total_1/2, ρ c_p V = C V / V̇),
+    og T er cellens utløpstemperatur. Varmen fra luften til platen regnes som i
+    condensation: g (T_oppstrøms - T_plate) med g = C_bane (1 - d), d = exp(-NTU_celle), der
+    NTU_celle bruker konveksjon og halve platemotstanden på hver side. Da er stasjonærløsningen
+    den eksakte cellemarsjen, og modellen er energibevarende. Platen har kapasiteten
+    ρ_p c_p t (bredde x lengde x antall plater) / celler.
+    Returnerer A med form (..., 3n, 3n) og B med form (..., 3n, 2).
+    """
+    n = grid[0] * grid[1]
+    lanes = {"1": grid[1], "2": grid[0] if cross else 1}
+    phex = PlateHeatExchanger(**{name: columns[f"exchanger.{name}"] for name in EXCHANGER_FIELDS})
+    plate = plate_density * plate_specific_heat * phex.plate_thickness * phex.width * phex.length * phex.number_of_plates
+    c_plate = np.asarray(plate / n, dtype=float)[..., None, None]
+    couplings = {"1": _upstream(grid, 0, False), "2": _upstream(grid, 1, False) if cross else _upstream(grid, 0, True)}
+    volumes = {"1": phex.volume_total_1, "2": phex.volume_total_2}
+    identity = np.eye(n)
+    sides = {}
+    for side in ("1", "2"):
+        c_lane = evaluated["c_" + side] / lanes[side]
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            decay = np.exp(-1 / ((evaluated["r_conv_" + side] + 0.5 * evaluated["r_cond"]) * n * c_lane))
+            c_air = evaluated["c_" + side] * volumes[side] / evaluated["q_vol_" + side] / n
+        c_lane, decay, c_air = (np.asarray(v, dtype=float)[..., None, None] for v in (c_lane, decay, c_air))
+        upstream, inlet = couplings[side]
+        sides[side] = {
+            "air": (c_lane * decay * upstream - c_lane * identity) / c_air,
+            "air_wall": c_lane * (1 - decay) / c_air * identity,
+            "wall_air": c_lane * (1 - decay) / c_plate * upstream,
+            "wall": -c_lane * (1 - decay) / c_plate * identity,
+            "inlet_air": c_lane * decay / c_air * inlet[:, None],
+            "inlet_wall": c_lane * (1 - decay) / c_plate * inlet[:, None],
+        }
+    s1, s2 = sides["1"], sides["2"]
+    shape = np.broadcast_shapes(*[v.shape for s in sides.values() for v in s.values()])[:-2]
+    a = np.zeros(shape + (3 * n, 3 * n))
+    a[..., :n, :n] = s1["air"]
+    a[..., :n, n:2 * n] = s1["air_wall"]
+    a[..., n:2 * n, :n] = s1["wall_air"]
+    a[..., n:2 * n, n:2 * n] = s1["wall"] + s2["wall"]
+    a[..., n:2 * n, 2 * n:] = s2["wall_air"]
+    a[..., 2 * n:, n:2 * n] = s2["air_wall"]
+    a[..., 2 * n:, 2 * n:] = s2["air"]
+    b = np.zeros(shape + (3 * n, 2))
+    b[..., :n, 0:1] = s1["inlet_air"]
+    b[..., n:2 * n, 0:1] = s1["inlet_wall"]
+    b[..., n:2 * n, 1:2] = s2["inlet_wall"]
+    b[..., 2 * n:, 1:2] = s2["inlet_air"]
+    return a, b
+
+
+def transient_response(
+    base: SimulationInput,
+    inlet_temperature_1,
+    inlet_temperature_2,
+    time_step: float,
+    overrides: Optional[Mapping[str, Any]] = None,
+    n_cells: int = N_CELLS,
+    plate_density: float = PLATE_DENSITY,
+    plate_specific_heat: float = PLATE_SPECIFIC_HEAT
+) -> Dict[str, Any]:
+    """
+    Dynamisk respons på tidsserier for innløpstemperaturene (siste akse er tid, verdiene holdes
+    konstante gjennom hvert tidssteg); de øvrige aksene er scenarier og kringkastes mot
+    overrides som i evaluate_batch. h-verdier, kapasitetsstrømmer og volumstrømmer hentes fra
+    evaluate_batch med verdiene i base/overrides og holdes faste gjennom forløpet.
+    Tidsintegrasjonen er eksakt for stykkevis konstante innløp: x_{k+1} = Φ x_k + Γ u_k med
+    Φ = exp(A Δt) og Γ = ∫ exp(A s) ds B, begge fra én matriseeksponensial per scenario. Den er
+    stabil for alle Δt, også med den raske luftdynamikken. Starttilstanden er stasjonær for
+    de første innløpsverdiene.
+    Returnerer time, temperature_out_1/2 og wall_temperature_min (form (..., steg + 1)) og
+    wall_temperature (platetemperaturene i cellene ved slutten, form (..., *cellenett)).
+    """
+    if base.flow_arrangement not in TRANSIENT_ARRANGEMENTS:
+        raise ValueError(f"Transientmodellen støtter bare {', '.join(a.value for a in TRANSIENT_ARRANGEMENTS)}")
+    if time_step <= 0:
+        raise ValueError("time_step må være positiv")
+    columns = columns_from_input(base)
+    columns.update(overrides or {})
+    evaluated = evaluate_batch(columns, base.flow_arrangement, base.effectiveness_backend, base.number_of_passes)
+    cross = base.flow_arrangement == FlowArrangement.CROSS_FLOW
+    grid = (n_cells, n_cells) if cross else (n_cells, 1)
+    n = grid[0] * grid[1]
+    a, b = state_space(evaluated, columns, grid, cross, plate_density, plate_specific_heat)
+
+    inlet_1 = np.asarray(inlet_temperature_1, dtype=float)
+    inlet_2 = np.asarray(inlet_temperature_2, dtype=float)
+    inputs = np.stack(np.broadcast_arrays(inlet_1, inlet_2), axis=-1)
+    shape = np.broadcast_shapes(a.shape[:-2], inputs.shape[:-2])
+    inputs = np.broadcast_to(inputs, shape + inputs.shape[-2:])
+    steps = inputs.shape[-2]
+
+    # Φ og Γ fra eksponensialen av utvidet matrise [[A, B], [0, 0]] Δt
+    augmented = np.zeros(a.shape[:-2] + (3 * n + 2, 3 * n + 2))
+    augmented[..., :3 * n, :3 * n] = a
+    augmented[..., :3 * n, 3 * n:] = b
+    discrete = expm(augmented * time_step)
+    # Transponert, slik at tilstandene kan ligge som rader; uten egne batch-akser blir hvert
+    # steg én matrisemultiplikasjon for alle scenariene
+    phi_t = np.swapaxes(discrete[..., :3 * n, :3 * n], -1, -2)
+    gamma_t = np.swapaxes(discrete[..., :3 * n, 3 * n:], -1, -2)
+
+    index = np.arange(n).reshape(grid)
+    outlet_1 = index[-1, :]
+    outlet_2 = n * 2 + (index[:, -1] if cross else index[0, :])
+    state = np.linalg.solve(
+        np.broadcast_to(a, shape + a.shape[-2:]), -np.broadcast_to(b, shape + b.shape[-2:]) @ inputs[..., 0, :, None]
+    )[..., 0]
+    temperature_out_1 = np.empty(shape + (steps + 1,))
+    temperature_out_2 = np.empty(shape + (steps + 1,))
+    wall_min = np.empty(shape + (steps + 1,))
+    forcing = inputs @ gamma_t
+    for k in range(steps + 1):
+        temperature_out_1[..., k] = np.mean(state[..., outlet_1], axis=-1)
+        temperature_out_2[..., k] = np.mean(state[..., outlet_2], axis=-1)
+        wall_min[..., k] = np.min(state[..., n:2 * n], axis=-1)
+        if k < steps:
+            propagated = state @ phi_t if phi_t.ndim == 2 else (state[..., None, :] @ phi_t)[..., 0, :]
+            state = propagated + forcing[..., k, :]
+    return {
+        "time": time_step * np.arange(steps + 1),
+        "temperature_out_1": temperature_out_1,
+        "temperature_out_2": temperature_out_2,
+        "wall_temperature_min": wall_min,
+        "wall_temperature": state[..., n:2 * n].reshape(shape + grid),
+    }
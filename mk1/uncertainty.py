@@ -0,0 +1,232 @@
+from typing import Any, Dict, Mapping, Sequence, Tuple
+import numpy as np
+from scipy.special import ndtri
+from models import SimulationInput
+from batch import FACTOR_FIELDS, INPUT_FIELDS, columns_from_input, evaluate_batch, latin_hypercube
+
+# Utdata det lages usikkerhetsstatistikk for som standard
+UNCERTAINTY_OUTPUTS = ("effectiveness", "q_actual", "u_value", "delta_p_1", "delta_p_2")
+DEFAULT_PERCENTILES = (2.5, 5.0, 50.0, 95.0, 97.5)
+
+# Fordelinger: ("uniform", nedre, øvre), ("normal", middel, standardavvik),
+# ("triangular", nedre, modus, øvre)
+DISTRIBUTIONS = ("uniform", "normal", "triangular")
+
+
+def _from_unit(unit: np.ndarray, distribution: Sequence[Any]) -> np.ndarray:
+    """Transformerer uniforme trekk i (0, 1) til den oppgitte fordelingen (invers CDF)."""
+    kind, *parameters = distribution
+    if kind == "uniform":
+        lower, upper = parameters
+        return lower + unit * (upper - lower)
+    if kind == "normal":
+        mean, std = parameters
+        return mean + std * ndtri(unit)
+    if kind == "triangular":
+        lower, mode, upper = parameters
+        split = (mode - lower) / (upper - lower)
+        return np.where(
+            unit < split,
+            lower + np.sqrt(unit * (upper - lower) * (mode - lower)),
+            upper - np.sqrt((1 - unit) * (upper - lower) * (upper - mode))
+        )
+    raise ValueError(f"Ukjent fordeling: {kind}")
+
+
+class StreamingStatistics:
+    """
+    Løpende statistikk for en strøm av verdier med begrenset minnebruk.
+    Middelverdi og varians oppdateres blokkvis (Chan et al.), kvantiler estimeres fra et
+    histogram med fast antall binner som utvides ved behov (binnene slås sammen parvis når
+    området dobles). Feilen i kvantilene er høyst én binnebredde.
+    """
+
+    def __init__(self, n_bins: int = 4096) -> None:
+        if n_bins < 2 or n_bins % 2:
+            raise ValueError("n_bins må være et partall >= 2")
+        self.n_bins = n_bins
+        self.count = 0
+        self.invalid = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+        self._counts = np.zeros(n_bins, dtype=np.int64)
+        self._lower = None
+        self._width = None
+
+    def update(self, values: Any) -> None:
+        values = np.asarray(values, dtype=float).ravel()
+        finite = np.isfinite(values)
+        self.invalid += int(values.size - np.count_nonzero(finite))
+        values = values[finite]
+        if values.size == 0:
+            return
+        n = values.size
+        chunk_mean = float(values.mean())
+        chunk_m2 = float(((values - chunk_mean) ** 2).sum())
+        total = self.count + n
+        delta = chunk_mean - self.mean
+        self.mean += delta * n / total
+        self._m2 += chunk_m2 + delta**2 * self.count * n / total
+        self.count = total
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self._bin(values)
+
+    def _bin(self, values: np.ndarray) -> None:
+        if self._lower is None:
+            span = self.max - self.min
+            self._width = (span if span > 0 else max(abs(self.max), 1.0) * 1e-9) * (1 + 1e-9) / self.n_bins
+            self._lower = self.min
+        while self.min < self._lower or self.max >= self._lower + self.n_bins * self._width:
+            merged = self._counts.reshape(-1, 2).sum(axis=1)
+            self._counts = np.zeros(self.n_bins, dtype=np.int64)
+            if self.min < self._lower:
+                self._counts[self.n_bins // 2:] = merged
+                self._lower -= self.n_bins * self._width
+            else:
+                self._counts[:self.n_bins // 2] = merged
+            self._width *= 2
+        index = np.minimum(((values - self._lower) / self._width).astype(np.int64), self.n_bins - 1)
+        self._counts += np.bincount(index, minlength=self.n_bins)
+
+    @property
+    def std(self) -> float:
+        return float(np.sqrt(self._m2 / (self.count - 1))) if self.count > 1 else 0.0
+
+    def percentile(self, q: Any) -> np.ndarray:
+        """Estimert persentil (0-100), lineær interpolasjon innenfor binnene."""
+        if self.count == 0:
+            return np.full(np.shape(q), np.nan)
+        cumulative = np.concatenate(([0], np.cumsum(self._counts)))
+        edges = self._lower + self._width * np.arange(self.n_bins + 1)
+        value = np.interp(np.asarray(q, dtype=float) / 100 * self.count, cumulative, edges)
+        return np.clip(value, self.min, self.max)
+
+    def summary(self, percentiles: Sequence[float] = DEFAULT_PERCENTILES) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "invalid": self.invalid,
+            "mean": self.mean,
+            "std": self.std,
+            "min": self.min,
+            "max": self.max,
+            "percentiles": {float(q): float(v) for q, v in zip(percentiles, np.atleast_1d(self.percentile(percentiles)))},
+        }
+
+
+def transform_unit(unit: np.ndarray, distributions: Mapping[str, Sequence[Any]]) -> Dict[str, np.ndarray]:
+    """
+    Transformerer en matrise med uniforme trekk, form (n, len(distributions)), til
+    {"seksjon.felt": verdier}. number_of_plates avrundes til nærmeste heltall.
+    """
+    # Unngår 0 og 1 eksakt (uendelige verdier for normalfordelingen)
+    unit = np.clip(unit, 1e-12, 1 - 1e-12)
+    samples = {name: _from_unit(unit[:, i], distribution) for i, (name, distribution) in enumerate(distributions.items())}
+    if "exchanger.number_of_plates" in samples:
+        samples["exchanger.number_of_plates"] = np.maximum(np.round(samples["exchanger.number_of_plates"]), 1)
+    return samples
+
+
+def validate_distributions(distributions: Mapping[str, Sequence[Any]]) -> None:
+    unknown = [name for name in distributions if name not in INPUT_FIELDS + FACTOR_FIELDS]
+    if unknown:
+        raise ValueError(f"Ukjente inndatafelter: {', '.join(unknown)}")
+    for name, distribution in distributions.items():
+        if distribution[0] not in DISTRIBUTIONS:
+            raise ValueError(f"Ukjent fordeling for {name}: {distribution[0]}")
+
+
+def sample_inputs(
+    distributions: Mapping[str, Sequence[Any]],
+    n_samples: int,
+    rng: np.random.Generator,
+    method: str = "lhs"
+) -> Dict[str, np.ndarray]:
+    """Trekker n_samples verdier for hvert felt i distributions ("lhs" eller "random")."""
+    if method == "lhs":
+        unit = latin_hypercube(n_samples, len(distributions), rng)
+    elif method == "random":
+        unit = rng.random((n_samples, len(distributions)))
+    else:
+        raise ValueError(f"Ukjent trekkemetode: {method}")
+    return transform_unit(unit, distributions)
+
+
+def propagate(
+    base: SimulationInput,
+    distributions: Mapping[str, Sequence[Any]],
+    n_samples: int = 100_000,
+    outputs: Sequence[str] = UNCERTAINTY_OUTPUTS,
+    percentiles: Sequence[float] = DEFAULT_PERCENTILES,
+    method: str = "lhs",
+    seed: int = 0,
+    chunk_size: int = 100_000,
+    n_bins: int = 4096
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Monte Carlo-usikkerhetsanalyse rundt base.
+    distributions: {"seksjon.felt": fordeling} for feltene som er usikre (se DISTRIBUTIONS).
+    Feltene kan være INPUT_FIELDS eller FACTOR_FIELDS (multiplikator på egenskapsmodellene,
+    f.eks. ("normal", 1.0, 0.02) for 2 % usikkerhet). Utvalget trekkes og evalueres i
+    blokker på chunk_size, og statistikken oppdateres løpende slik at minnebruken er
+    uavhengig av n_samples. Med "lhs" er hver blokk et eget latin hypercube-utvalg.
+    Returnerer {utdata: {"mean", "std", "min", "max", "count", "invalid", "percentiles"}}.
+    """
+    validate_distributions(distributions)
+    rng = np.random.default_rng(seed)
+    base_columns = columns_from_input(base)
+    statistics = {name: StreamingStatistics(n_bins) for name in outputs}
+    remaining = n_samples
+    while remaining > 0:
+        n = min(chunk_size, remaining)
+        columns = dict(base_columns)
+        columns.update(sample_inputs(distributions, n, rng, method))
+        evaluated = evaluate_batch(columns, base.flow_arrangement, base.effectiveness_backend, base.number_of_passes)
+        for name in outputs:
+            statistics[name].update(np.broadcast_to(evaluated[name], (n,)))
+        remaining -= n
+    return {name: stats.summary(percentiles) for name, stats in statistics.items()}
+
+
+def relative_tolerances(base: SimulationInput, tolerances: Mapping[str, float]) -> Dict[str, Tuple[str, float, float]]:
+    """
+    Hjelpefunksjon: normalfordelinger rundt verdiene i base, med standardavvik gitt som
+    andel av verdien ({"exchanger.channel_height": 0.03} gir 3 %). Faktorfelter har middel 1.
+    """
+    columns = columns_from_input(base)
+    return {
+        name: ("normal", columns.get(name, 1.0), abs(columns.get(name, 1.0)) * tolerance)
+        for name, tolerance in tolerances.items()
+    }
+
+
+if __name__ == "__main__":
+    import time
+    from models import AirStreamInput, ExchangerInput
+    from definitions import FlowArrangement
+
+    base = SimulationInput(
+        airstream_1=AirStreamInput(mass_flow_rate=0.5, temperature_c=80.0, phi=0.3, pressure=101325),
+        airstream_2=AirStreamInput(mass_flow_rate=0.6, temperature_c=20.0, phi=0.5, pressure=101325),
+        exchanger=ExchangerInput(
+            width=1.4, length=1.4, plate_thickness=0.0005,
+            thermal_conductivity_plate=15.0, number_of_plates=30, channel_height=0.005
+        ),
+        flow_arrangement=FlowArrangement.COUNTER_FLOW
+    )
+    distributions = relative_tolerances(base, {
+        "exchanger.channel_height": 0.03,
+        "exchanger.plate_thickness": 0.05,
+        "airstream_1.mass_flow_rate": 0.05,
+        "airstream_2.mass_flow_rate": 0.05,
+        "property.dynamic_viscosity": 0.02,
+        "property.thermal_conductivity": 0.02,
+    })
+    start = time.perf_counter()
+    result = propagate(base, distributions, n_samples=1_000_000)
+    print(f"{time.perf_counter() - start:.2f} s")
+    for name, stats in result.items():
+        bands = "  ".join(f"p{q:g}={v:.4g}" for q, v in stats["percentiles"].items())
+        print(f"{name:<14} mean={stats['mean']:.4g} std={stats['std']:.3g}  {bands}")
@@ -1,14 +1,25 @@
 import json
-from flask import Flask, render_template, request, jsonify
+import os
+import secrets
+import threading
+import uuid
+from collections import OrderedDict
+from flask import Flask, Response, render_template, request, jsonify, session
 from moistair import AirStream
 from report import Report
 from heatecxhanger import PlateHeatExchanger, FlowArrangement
 from pydantic import ValidationError
 from models import SimulationInput
 from simulation_output import SimulationOutput
+from performancetable import build_performance_table
+from pipeline import DEFAULT_NODES, IncrementalSimulation, Node
+from flowcorrelations import DEFAULT_FRICTION, DEFAULT_NUSSELT, FRICTION_CORRELATIONS, NUSSELT_CORRELATIONS
 
 # --- Flask-app ---
 app = Flask(__name__)
+# Nøkkelen som signerer sesjonene; uten miljøvariabel lages en tilfeldig nøkkel per prosess
+# (sesjonene overlever da ikke omstart og deles ikke mellom flere arbeidsprosesser)
+app.secret_key = os.environ.get("VARMEVEKSLER_SECRET_KEY") or secrets.token_hex(32)
 
 # Standard inputdata
 DEFAULT_INPUT = {
@@ -32,7 +43,12 @@ DEFAULT_INPUT = {
         "number_of_plates": 30,
         "channel_height": 0.005
     },
-    "flow_arrangement": "counter-flow"
+    "flow_arrangement": "counter-flow",
+    "effectiveness_backend": "correlation",
+    "number_of_passes": 1,
+    "developing_flow": False,
+    "nusselt_correlation": DEFAULT_NUSSELT,
+    "friction_correlation": DEFAULT_FRICTION
 }
 
 # --- Simuleringsfunksjon ---
@@ -43,13 +59,18 @@ def do_simulation(input_data: dict) -> SimulationOutput:
     
     exchanger_data = validated.exchanger.model_dump()
     phex = PlateHeatExchanger(**exchanger_data)
-    params = phex.calculate_parameters(airstream_1, airstream_2)
+    params = phex.calculate_parameters(
+        airstream_1, airstream_2, validated.developing_flow,
+        validated.nusselt_correlation, validated.friction_correlation
+    )
     
     results = PlateHeatExchanger.calculate_results(
         params, 
         airstream_1, 
         airstream_2, 
-        validated.flow_arrangement
+        validated.flow_arrangement,
+        validated.effectiveness_backend,
+        validated.number_of_passes
     )
     
     return SimulationOutput(
@@ -61,6 +82,15 @@ def do_simulation(input_data: dict) -> SimulationOutput:
     )
 
 # --- Rapport som HTML ---
+def report_state(parameters, results):
+    """Kombiner parametre og resultater til én state-aktig objekt for rapporten."""
+    state = type('HeatExchangerState', (), {})()
+    for k, v in parameters.model_dump().items():
+        setattr(state, k, v)
+    for k, v in results.model_dump().items():
+        setattr(state, k, v)
+    return state
+
 def report_html(result: SimulationOutput, flow_arrangement: FlowArrangement) -> str:
     airstream_1 = AirStream.from_dict(result.airstream_1.model_dump())
     airstream_2 = AirStream.from_dict(result.airstream_2.model_dump())
@@ -68,16 +98,40 @@ def report_html(result: SimulationOutput, flow_arrangement: FlowArrangement) ->
     exchanger_data = result.exchanger.model_dump()
     phex = PlateHeatExchanger(**exchanger_data)
     
-    # Kombiner parametre og resultater til én state-aktig objekt for rapporten
-    state = type('HeatExchangerState', (), {})()
-    for k, v in result.parameters.model_dump().items():
-        setattr(state, k, v)
-    for k, v in result.results.model_dump().items():
-        setattr(state, k, v)
-    
+    state = report_state(result.parameters, result.results)
     report_string = Report.get_report_string(phex, state, airstream_1, airstream_2, flow_arrangement)
     return f"<pre>{report_string}</pre>"
 
+# --- Inkrementell beregning per økt ---
+# Hver nettleserøkt beholder forrige evaluering på serveren, slik at en endring i
+# ett felt bare beregner de nodene i pipeline-grafen som faktisk påvirkes.
+def _report_node(data, values) -> str:
+    state = report_state(values["parameters"], values["results"])
+    report_string = Report.get_report_string(
+        values["geometry"].to_exchanger(), state, values["stream_1"], values["stream_2"], FlowArrangement(data["flow_arrangement"])
+    )
+    return f"<pre>{report_string}</pre>"
+
+REPORT_NODES = DEFAULT_NODES + (
+    Node("report", _report_node, fields=("flow_arrangement",), depends_on=("geometry", "stream_1", "stream_2", "parameters", "results")),
+)
+MAX_SESSIONS = 256
+_sessions: "OrderedDict[str, tuple[IncrementalSimulation, threading.Lock]]" = OrderedDict()
+_sessions_lock = threading.Lock()
+
+def session_simulation() -> "tuple[IncrementalSimulation, threading.Lock]":
+    """Henter (eller lager) den inkrementelle simuleringen for gjeldende økt."""
+    if "sid" not in session:
+        session["sid"] = uuid.uuid4().hex
+    sid = session["sid"]
+    with _sessions_lock:
+        if sid not in _sessions:
+            _sessions[sid] = (IncrementalSimulation(REPORT_NODES), threading.Lock())
+            while len(_sessions) > MAX_SESSIONS:
+                _sessions.popitem(last=False)
+        _sessions.move_to_end(sid)
+        return _sessions[sid]
+
 @app.route("/", methods=["GET"])
 def index():
     try:
@@ -96,6 +150,8 @@ def index():
     return render_template(
         "webapp.html",
         input_data=DEFAULT_INPUT,
+        nusselt_correlations=list(NUSSELT_CORRELATIONS),
+        friction_correlations=list(FRICTION_CORRELATIONS),
         report_html=report,
         error=error
     )
@@ -103,14 +159,26 @@ def index():
 @app.route("/simulate", methods=["POST"])
 def simulate():
     try:
-        input_data = request.get_json()
-        result = do_simulation(input_data)
-        flow_arrangement_from_input = FlowArrangement(input_data["flow_arrangement"])
-        return jsonify({"report_html": report_html(result, flow_arrangement_from_input), "error": ""})
+        validated = SimulationInput(**request.get_json())
+        simulation, lock = session_simulation()
+        with lock:
+            simulation.evaluate(validated)
+            return jsonify({"report_html": simulation.values["report"], "error": ""})
     except ValidationError as e:
         return jsonify({"report_html": "", "error": e.json()})
     except Exception as e:
         return jsonify({"report_html": "", "error": str(e)})
 
+@app.route("/performance_table", methods=["POST"])
+def performance_table():
+    """Binær ytelsestabell for nåværende geometri, brukt til forhåndsvisning i nettleseren."""
+    try:
+        validated = SimulationInput(**request.get_json())
+        return Response(build_performance_table(validated), mimetype="application/octet-stream")
+    except ValidationError as e:
+        return jsonify({"error": e.json()}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
 if __name__ == "__main__":
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,42 @@
+# Tester for gradients (automatisk derivasjon)
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "mk1"))
+
+from autodiff import DIFFERENTIATED_OUTPUTS, gradients  # noqa: E402
+from batch import columns_from_input, evaluate_batch  # noqa: E402
+from definitions import EffectivenessBackend, FlowArrangement  # noqa: E402
+from models import SimulationInput  # noqa: E402
+from webapp import DEFAULT_INPUT  # noqa: E402
+
+FIELDS = (
+    "airstream_1.mass_flow_rate",
+    "airstream_2.temperature_c",
+    "exchanger.plate_thickness",
+    "exchanger.channel_height",
+)
+
+
+@pytest.mark.parametrize("flow_arrangement, backend", [
+    (FlowArrangement.COUNTER_FLOW, EffectivenessBackend.CORRELATION),
+    (FlowArrangement.CROSS_FLOW, EffectivenessBackend.CORRELATION),
+    (FlowArrangement.CROSS_FLOW, EffectivenessBackend.EXACT_TABLE),
+])
+def test_gradients_match_finite_differences(flow_arrangement, backend):
+    columns = columns_from_input(SimulationInput(**DEFAULT_INPUT))
+    result = gradients(columns, flow_arrangement, FIELDS, effectiveness_backend=backend)
+    # Punktet ligger ikke ved noen knekk, så sentraldifferanser er gyldige
+    assert not any(np.any(near) for near in result.kinks.values())
+    for name in FIELDS:
+        step = 1e-6 * max(abs(columns[name]), 1.0)
+        up, down = dict(columns), dict(columns)
+        up[name], down[name] = columns[name] + step, columns[name] - step
+        evaluated_up = evaluate_batch(up, flow_arrangement, backend)
+        evaluated_down = evaluate_batch(down, flow_arrangement, backend)
+        for output in DIFFERENTIATED_OUTPUTS:
+            difference = (evaluated_up[output] - evaluated_down[output]) / (2 * step)
+            assert result.gradients[output][name] == pytest.approx(difference, rel=1e-5, abs=1e-9)
@@ -0,0 +1,28 @@
+# Tester for evaluate_batch
+import copy
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "mk1"))
+
+from batch import evaluate_input_batch  # noqa: E402
+from models import SimulationInput  # noqa: E402
+from webapp import DEFAULT_INPUT, do_simulation  # noqa: E402
+
+
+@pytest.mark.parametrize("flow_arrangement", ["counter-flow", "cross-flow", "cross-flow-mixed-1", "counter-cross-flow"])
+def test_batch_matches_scalar_simulation(flow_arrangement):
+    data = copy.deepcopy(DEFAULT_INPUT)
+    data["flow_arrangement"] = flow_arrangement
+    flows = np.array([0.5, 1.0, 2.0]) * data["airstream_1"]["mass_flow_rate"]
+    batch = evaluate_input_batch(SimulationInput(**data), {"airstream_1.mass_flow_rate": flows})
+    for i, flow in enumerate(flows):
+        data["airstream_1"]["mass_flow_rate"] = float(flow)
+        scalar = do_simulation(data)
+        for name in ("effectiveness", "q_actual"):
+            assert batch[name][i] == pytest.approx(getattr(scalar.results, name), rel=1e-12)
+        for name in ("h_1", "h_2", "u_value", "ntu", "delta_p_1", "delta_p_2"):
+            assert batch[name][i] == pytest.approx(getattr(scalar.parameters, name), rel=1e-12)
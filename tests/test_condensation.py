@@ -0,0 +1,33 @@
+# Tester for våt/tørr-cellemodellen
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "mk1"))
+
+from condensation import wet_dry_cells  # noqa: E402
+from definitions import EffectivenessBackend, FlowArrangement  # noqa: E402
+from models import SimulationInput  # noqa: E402
+from webapp import DEFAULT_INPUT  # noqa: E402
+
+DRY_AIR = {"airstream_1.phi": 0.05, "airstream_2.phi": 0.05}
+
+
+@pytest.mark.parametrize("flow_arrangement", [FlowArrangement.COUNTER_FLOW, FlowArrangement.CROSS_FLOW])
+def test_dry_limit_reproduces_epsilon_ntu(flow_arrangement):
+    # Eksakt tabell for kryssstrøm; korrelasjonen er bare tilnærmet
+    base = SimulationInput(**DEFAULT_INPUT).model_copy(update={
+        "flow_arrangement": flow_arrangement, "effectiveness_backend": EffectivenessBackend.EXACT_TABLE
+    })
+    result = wet_dry_cells(base, DRY_AIR)
+    assert result["wet_fraction_1"] == 0 and result["wet_fraction_2"] == 0
+    assert result["q_actual"] == pytest.approx(result["q_dry"], rel=1e-3)
+
+
+@pytest.mark.parametrize("flow_arrangement", [FlowArrangement.COUNTER_FLOW, FlowArrangement.CROSS_FLOW])
+def test_condensing_energy_balance(flow_arrangement):
+    data = {**DEFAULT_INPUT, "flow_arrangement": flow_arrangement}
+    result = wet_dry_cells(SimulationInput(**data), {"airstream_1.phi": 0.9, "airstream_2.temperature_c": 0.0})
+    assert result["wet_fraction_1"] > 0 and result["condensate_1"] > 0
+    assert result["q_actual"] == pytest.approx(result["q_received"], rel=1e-6)
@@ -0,0 +1,23 @@
+# Tester for motstrømsmodellene med varierende egenskaper og varmeledning langs platen
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "mk1"))
+
+from counterflow import longitudinal_conduction  # noqa: E402
+from models import SimulationInput  # noqa: E402
+from webapp import DEFAULT_INPUT  # noqa: E402
+
+
+def test_zero_conduction_limit_reproduces_epsilon_ntu():
+    # Tynn plate: varmeledningen langs platen (λ ~ 1e-9) forsvinner
+    result = longitudinal_conduction(SimulationInput(**DEFAULT_INPUT), {"exchanger.plate_thickness": 1e-9})
+    assert result["conduction_parameter"] < 1e-8
+    assert result["effectiveness"] == pytest.approx(result["effectiveness_no_conduction"], rel=1e-5)
+
+
+def test_conduction_lowers_effectiveness():
+    result = longitudinal_conduction(SimulationInput(**DEFAULT_INPUT), {"exchanger.thermal_conductivity_plate": 200.0})
+    assert result["effectiveness"] < result["effectiveness_no_conduction"]
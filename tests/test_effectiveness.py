@@ -0,0 +1,57 @@
+# Tester for ε-NTU-tabellene og den numeriske effektiviteten
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "mk1"))
+
+import effectiveness  # noqa: E402
+from effectiveness import crossflow_unmixed_exact, crossflow_unmixed_table, numerical_effectiveness, numerical_table  # noqa: E402
+
+# Punkter mellom rutenettpunktene i tabellene
+NTU = np.array([0.37, 1.0, 2.51, 6.03])[:, None]
+C_R = np.array([0.13, 0.5, 0.87, 1.0])[None, :]
+
+
+def mixed_c_min(ntu, c_r):
+    """Kryssstrøm, C_min blandet og C_max ublandet."""
+    return 1 - np.exp(-(1 - np.exp(-c_r * ntu)) / c_r)
+
+
+def mixed_c_max(ntu, c_r):
+    """Kryssstrøm, C_max blandet og C_min ublandet."""
+    return (1 - np.exp(-c_r * (1 - np.exp(-ntu)))) / c_r
+
+
+@pytest.fixture
+def fresh_tables(tmp_path, monkeypatch):
+    # Tabellene bygges på nytt, ikke hentes fra en eldre cache
+    monkeypatch.setenv("VARMEVEKSLER_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(effectiveness, "_tables", {})
+
+
+def test_exact_crossflow_reference_values():
+    # Kays & London: ε = 0.476 ved NTU = 1, C_r = 1; C_r = 0 gir 1 - exp(-NTU)
+    assert crossflow_unmixed_exact(1.0, 1.0) == pytest.approx(0.4762, abs=1e-4)
+    assert crossflow_unmixed_exact(2.0, 0.0) == pytest.approx(1 - np.exp(-2.0), abs=1e-12)
+
+
+def test_crossflow_table_matches_exact_solution(fresh_tables):
+    assert crossflow_unmixed_table()(NTU, C_R) == pytest.approx(crossflow_unmixed_exact(NTU, C_R), abs=1e-4)
+
+
+@pytest.mark.parametrize("arrangement, c_min_side, closed_form", [
+    ("cross-flow-mixed-1", 1, mixed_c_min),
+    ("cross-flow-mixed-1", 2, mixed_c_max),
+    ("cross-flow-mixed-2", 1, mixed_c_max),
+    ("cross-flow-mixed-2", 2, mixed_c_min),
+])
+def test_numerical_mixed_crossflow_matches_closed_form(fresh_tables, arrangement, c_min_side, closed_form):
+    assert numerical_effectiveness(arrangement, NTU, C_R, c_min_side) == pytest.approx(closed_form(NTU, C_R), abs=1e-6)
+    assert numerical_table(arrangement, c_min_side)(NTU, C_R) == pytest.approx(closed_form(NTU, C_R), abs=2e-4)
+
+
+def test_numerical_unmixed_crossflow_matches_exact_solution():
+    assert numerical_effectiveness("cross-flow", NTU, C_R, 1) == pytest.approx(crossflow_unmixed_exact(NTU, C_R), abs=1e-6)
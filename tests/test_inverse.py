@@ -0,0 +1,43 @@
+# Tester for invers ε-NTU (nødvendig NTU og varmeflate)
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "mk1"))
+
+from batch import evaluate_input_batch  # noqa: E402
+from definitions import EffectivenessBackend, FlowArrangement  # noqa: E402
+from heatecxhanger import PlateHeatExchanger  # noqa: E402
+from inverse import required_ntu, required_size  # noqa: E402
+from models import SimulationInput  # noqa: E402
+from webapp import DEFAULT_INPUT  # noqa: E402
+
+
+@pytest.mark.parametrize("backend", list(EffectivenessBackend))
+@pytest.mark.parametrize("flow_arrangement", list(FlowArrangement))
+@pytest.mark.parametrize("c_min_side_1", [True, False])
+def test_required_ntu_round_trip(flow_arrangement, backend, c_min_side_1):
+    ntu = np.array([0.3, 1.0, 2.5, 6.0])[:, None]
+    c_r = np.array([0.1, 0.4, 1.0])[None, :]
+    target = PlateHeatExchanger.effectiveness_array(ntu, c_r, flow_arrangement, backend, 1, c_min_side_1)
+    solved = required_ntu(target, c_r, flow_arrangement, backend, 1, c_min_side_1)
+    assert solved == pytest.approx(np.broadcast_to(ntu, solved.shape), abs=1e-8)
+
+
+def test_unreachable_target_is_nan():
+    solved = required_ntu(np.array([0.0, 0.99]), 1.0, FlowArrangement.CROSS_FLOW)
+    assert np.all(np.isnan(solved))
+
+
+@pytest.mark.parametrize("flow_arrangement", ["counter-flow", "cross-flow"])
+def test_required_size_round_trip(flow_arrangement):
+    base = SimulationInput(**{**DEFAULT_INPUT, "flow_arrangement": flow_arrangement})
+    evaluated = evaluate_input_batch(base)
+    # Utløpstemperaturen på side 2 for den oppgitte veksleren må gi tilbake samme NTU og flate
+    outlet_2 = base.airstream_2.temperature_c + evaluated["q_actual"] / evaluated["c_2"]
+    size = required_size(base, target_outlet_temperature_2=outlet_2)
+    assert size["feasible"]
+    assert size["ntu"] == pytest.approx(evaluated["ntu"], rel=1e-8)
+    assert size["area"] == pytest.approx(evaluated["area_heat_1"], rel=1e-8)
@@ -0,0 +1,26 @@
+# Tester for IncrementalSimulation
+import copy
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "mk1"))
+
+from models import SimulationInput  # noqa: E402
+from pipeline import IncrementalSimulation  # noqa: E402
+from webapp import DEFAULT_INPUT  # noqa: E402
+
+
+def test_failed_evaluation_keeps_previous_state():
+    simulation = IncrementalSimulation()
+    simulation.evaluate(SimulationInput(**DEFAULT_INPUT))
+    data = copy.deepcopy(DEFAULT_INPUT)
+    data["airstream_1"]["mass_flow_rate"] = 0.0
+    failing = SimulationInput(**data)
+    with pytest.raises(ZeroDivisionError):
+        simulation.evaluate(failing)
+    # Samme inndata igjen må feile på nytt, ikke returnere resultatet fra forrige tilstand
+    with pytest.raises(ZeroDivisionError):
+        simulation.evaluate(failing)
+    assert simulation.changed_fields(failing) == {"airstream_1.mass_flow_rate"}